@@ -0,0 +1,90 @@
+"""
+Load test of the ASGI entry point (serving/asgi.py) against the Flask app under gunicorn, with sync and
+threaded workers: concurrent clients sending a few shots each, while `--slow-clients` other
+connections trickle in their requests a byte at a time (slow or idle keep-alive clients, which hold
+a sync worker for as long as they take). Run from the root of the repo:
+
+    $ python -m benchmarks.bench_asgi [--clients 8 32] [--slow-clients 0 4] [--duration 5]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from benchmarks.load import print_header, print_row, run_load, wait_until_up
+from benchmarks.serving import SERVING_DIR, SERVING_PYTHONPATH, make_model, make_shots, make_workdir
+
+
+SERVERS = {
+    "flask-sync": (["app:app"], {"GUNICORN_THREADS": "1"}),
+    "flask-gthread": (["app:app"], {"GUNICORN_THREADS": "8"}),
+    "asgi": (["-k", "uvicorn.workers.UvicornWorker", "asgi:app"], {}),
+}
+
+
+def start_server(args: list, env: dict, workdir, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_WORKERS=str(workers),
+               FLASK_LOG=str(workdir / "flask.log"), PYTHONPATH=SERVING_PYTHONPATH, **env)
+    return subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", str(SERVING_DIR / "gunicorn.conf.py"),
+                             "--chdir", str(workdir), "--timeout", "120", *args], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def slow_client(port: int, stop: threading.Event, interval: float = 0.2):
+    """Sends the headers of a request one byte every `interval` seconds until stopped"""
+    request = b"POST /predict HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n" + b"X-Padding: " + \
+        b"a" * 10_000
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        for i in range(len(request)):
+            if stop.wait(interval):
+                return
+            try:
+                sock.sendall(request[i:i + 1])
+            except OSError:
+                return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--slow-clients", type=int, nargs="+", default=[0, 4])
+    parser.add_argument("--shots", type=int, default=5, help="Shots per request")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per measurement")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=5097)
+    args = parser.parse_args()
+
+    workdir = make_workdir(make_model(["shotDistance"]))
+    url = f"http://127.0.0.1:{args.port}"
+    body = json.loads(make_shots(args.shots)[["shotDistance"]].to_json(orient="records"))
+
+    def send(session: requests.Session) -> bool:
+        r = session.post(f"{url}/predict", json=body, timeout=10)
+        return r.ok and "probabilities" in r.json()
+
+    print_header()
+    for name, (server_args, env) in SERVERS.items():
+        server = start_server(server_args, env, workdir, args.port, args.workers)
+        try:
+            wait_until_up(f"{url}/model_info")
+            for n_slow in args.slow_clients:
+                stop = threading.Event()
+                slow = [threading.Thread(target=slow_client, args=(args.port, stop), daemon=True)
+                        for _ in range(n_slow)]
+                for thread in slow:
+                    thread.start()
+                time.sleep(0.5)
+                for concurrency in args.clients:
+                    print_row(f"{name}/{n_slow}", concurrency, run_load(send, concurrency, args.duration))
+                stop.set()
+                for thread in slow:
+                    thread.join()
+        finally:
+            server.terminate()
+            server.wait()
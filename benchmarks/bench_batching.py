@@ -0,0 +1,64 @@
+"""
+Load test of /predict with and without micro-batching (PREDICT_BATCHING): many concurrent clients
+each sending a handful of shots, as dashboards do. Starts the app under gunicorn with threaded
+workers; run from the root of the repo:
+
+    $ python -m benchmarks.bench_batching [--clients 1 8 32 64] [--shots 5] [--duration 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import requests
+
+from benchmarks.load import print_header, print_row, run_load, wait_until_up
+from benchmarks.serving import SERVING_DIR, SERVING_PYTHONPATH, make_model, make_shots, make_workdir
+
+
+MODES = {
+    "unbatched": {"PREDICT_BATCHING": "0"},
+    "batched": {"PREDICT_BATCHING": "1"},
+}
+
+
+def start_server(env: dict, workdir, port: int, workers: int, threads: int) -> subprocess.Popen:
+    env = dict(os.environ, GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_WORKERS=str(workers),
+               GUNICORN_THREADS=str(threads), FLASK_LOG=str(workdir / "flask.log"),
+               PYTHONPATH=SERVING_PYTHONPATH, **env)
+    return subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", str(SERVING_DIR / "gunicorn.conf.py"),
+                             "--chdir", str(workdir), "app:app"], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--shots", type=int, default=5, help="Shots per request")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per measurement")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--port", type=int, default=5098)
+    args = parser.parse_args()
+
+    workdir = make_workdir(make_model(["shotDistance"]))
+    url = f"http://127.0.0.1:{args.port}"
+    body = json.loads(make_shots(args.shots)[["shotDistance"]].to_json(orient="records"))
+
+    def send(session: requests.Session) -> bool:
+        r = session.post(f"{url}/predict", json=body, timeout=10)
+        return r.ok and "probabilities" in r.json()
+
+    print_header()
+    for mode, env in MODES.items():
+        server = start_server(env, workdir, args.port, args.workers, args.threads)
+        try:
+            wait_until_up(f"{url}/batching")
+            for concurrency in args.clients:
+                print_row(mode, concurrency, run_load(send, concurrency, args.duration))
+            if mode == "batched":
+                print(requests.get(f"{url}/batching").json())
+        finally:
+            server.terminate()
+            server.wait()
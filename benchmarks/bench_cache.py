@@ -0,0 +1,52 @@
+"""
+/predict throughput on the dashboard's traffic pattern, with and without the prediction cache
+(PREDICT_CACHE_SIZE): each refresh re-sends every shot of the game so far plus a few new ones, with
+distances rounded to 0.1 ft. Measured with the logistic regression of the other benchmarks and with a
+random forest, whose predict_proba is much slower. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_cache [--refreshes 200]
+"""
+import argparse
+import time
+
+from sklearn.ensemble import RandomForestClassifier
+
+from benchmarks.serving import import_app, make_model, make_shots
+
+
+def run(client, bodies: list) -> float:
+    start = time.perf_counter()
+    for body in bodies:
+        client.post("/predict", data=body, content_type="application/json")
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--refreshes", type=int, default=200)
+    parser.add_argument("--shots-per-refresh", type=int, default=5)
+    args = parser.parse_args()
+
+    app = import_app()
+    client = app.app.test_client()
+    shots = make_shots(args.refreshes * args.shots_per_refresh)[["shotDistance"]]
+    bodies = [shots.iloc[:i * args.shots_per_refresh].to_json(orient="records")
+              for i in range(1, args.refreshes + 1)]
+
+    train = make_shots(5000)[["shotDistance"]]
+    models = {
+        "logistic": make_model(),
+        "forest": RandomForestClassifier(n_estimators=100, random_state=0).fit(
+            train, make_model().predict(train)),
+    }
+
+    print(f"{'model':>10} {'cache':>6} {'seconds':>9} {'refreshes/sec':>14} {'hit rate':>9}")
+    for name, model in models.items():
+        app.registry.add(app.model_key("bench", name, "1"), model)
+        app.registry.swap(app.model_key("bench", name, "1"))
+        for enabled in (False, True):
+            app.prediction_cache = app.PredictionCache() if enabled else None
+            seconds = run(client, bodies)
+            hit_rate = app.prediction_cache.stats()["hit_rate"] if enabled else None
+            print(f"{name:>10} {'on' if enabled else 'off':>6} {seconds:>9.3f} {args.refreshes / seconds:>14,.0f} "
+                  f"{'' if hit_rate is None else f'{hit_rate:.1%}':>9}")
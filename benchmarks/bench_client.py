@@ -0,0 +1,93 @@
+"""
+End-to-end throughput of `ServingClient.predict` against a local Flask stand-in of the service
+(serving/app.py with the synthetic model, served by werkzeug in a background thread), compared with
+the previous client: a plain `requests.post` of `to_json` records, re-parsed with `json.loads`.
+1% of the shots miss a feature. `--fail-rate` makes the stand-in answer that fraction of requests
+with a 503, which the pooled client retries. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_client [--rows 1000 100000 1000000] [--fail-rate 0.05]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+import numpy as np
+import requests
+from werkzeug.serving import make_server
+
+from ift6758.ift6758.client.serving_client import ServingClient
+from benchmarks.serving import import_app, make_shots
+
+
+FEATURES = ["shotDistance", "shotAngle"]
+
+
+def legacy_predict(base_url: str, X) -> dict:
+    """ServingClient.predict before the pooled client"""
+    X = X[FEATURES].dropna()
+    json_payload = X.to_json(orient='records')
+    r = requests.post(f"{base_url}/predict", json=json.loads(json_payload))
+    return r.json()
+
+
+def start_stand_in(port: int, fail_rate: float):
+    app = import_app(FEATURES)
+    rng = random.Random(0)
+
+    @app.app.before_request
+    def fail_sometimes():
+        if rng.random() < fail_rate:
+            return {"status": "failure", "message": "Service unavailable"}, 503
+
+    server = make_server("127.0.0.1", port, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--calls", type=int, default=5, help="predict calls per measurement")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=5098)
+    args = parser.parse_args()
+
+    server = start_stand_in(args.port, args.fail_rate)
+    base_url = f"http://127.0.0.1:{args.port}"
+    clients = {
+        "pooled": ServingClient("127.0.0.1", args.port, FEATURES),
+        "pooled+gzip": ServingClient("127.0.0.1", args.port, FEATURES, compress_min_bytes=64 * 2**10),
+        "pooled+chunks": ServingClient("127.0.0.1", args.port, FEATURES, chunk_rows=10_000),
+    }
+    senders = {"legacy": lambda X: legacy_predict(base_url, X)}
+    senders.update({name: client.predict for name, client in clients.items()})
+
+    print(f"{'rows':>10} {'client':>14} {'seconds':>9} {'rows/sec':>12} {'failed':>7} {'aligned':>8}")
+    try:
+        for n_rows in args.rows:
+            X = make_shots(n_rows)[FEATURES]
+            X.loc[X.sample(frac=0.01, random_state=0).index, "shotDistance"] = np.nan
+            for name, send in senders.items():
+                failed, aligned = 0, True
+                start = time.perf_counter()
+                for _ in range(args.calls):
+                    try:
+                        result = send(X)
+                    except Exception:
+                        failed += 1
+                        continue
+                    if "probabilities" in result:
+                        aligned = aligned and len(result["probabilities"]) == len(X)
+                    elif "probability" in result:
+                        aligned = aligned and result.index.equals(X.index)
+                    else:
+                        failed += 1
+                elapsed = (time.perf_counter() - start) / args.calls
+                print(f"{n_rows:>10} {name:>14} {elapsed:>9.3f} {n_rows / elapsed:>12,.0f} "
+                      f"{failed:>7} {str(aligned):>8}")
+    finally:
+        server.shutdown()
+        for client in clients.values():
+            client.close()
@@ -0,0 +1,67 @@
+"""
+Small-batch latency of the compiled NumPy scorers (serving/compiled.py) against scikit-learn's
+predict_proba, for logistic regressions on one and two features, alone and after scalers in a
+Pipeline (tests/test_compiled.py checks that they give the same probabilities). Also times /predict
+end to end (Flask test client) for a few shots with and without compilation. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_compiled [--batch-sizes 1 10 50 1000]
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import MaxAbsScaler, MinMaxScaler, StandardScaler
+
+from benchmarks.serving import import_app, make_model, make_shots
+
+
+FEATURES = ["shotDistance", "shotAngle"]
+
+
+def make_models() -> dict:
+    X = make_shots(5000)[FEATURES]
+    y = make_model().predict(X[["shotDistance"]])
+    return {
+        "logistic (1 feature)": make_model(),
+        "logistic (2 features)": LogisticRegression().fit(X, y),
+        "standard scaler + logistic": make_pipeline(StandardScaler(), LogisticRegression()).fit(X, y),
+        "min-max + max-abs + logistic": make_pipeline(MinMaxScaler(), MaxAbsScaler(), LogisticRegression()).fit(X, y),
+    }
+
+
+def us_per_call(predict_proba, X: np.ndarray, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        predict_proba(X)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 50, 1000])
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = import_app(["shotDistance"])
+
+    print(f"{'model':>30} {'rows':>5} {'sklearn us':>11} {'compiled us':>12} {'speedup':>8}")
+    for name, model in make_models().items():
+        scorer = app.registry.add(app.model_key("bench", name, "1"), model).scorer
+        assert scorer is not None, f"{name} was not compiled"
+        for n_rows in args.batch_sizes:
+            X = make_shots(n_rows)[FEATURES[:model.n_features_in_]].to_numpy()
+            sklearn_us = us_per_call(lambda rows: app.predict_proba(model, rows), X, args.calls)
+            compiled_us = us_per_call(lambda rows: app.predict_proba(scorer, rows), X, args.calls)
+            print(f"{name:>30} {n_rows:>5} {sklearn_us:>11.1f} {compiled_us:>12.1f} {sklearn_us / compiled_us:>7.1f}x")
+
+    client = app.app.test_client()
+    entry = app.registry.current()
+    scorer = entry.scorer
+    body = make_shots(10)[["shotDistance"]].to_json(orient="records")
+    print(f"\n/predict, 10 shots, {args.calls} calls:")
+    for label, entry.scorer in (("sklearn", None), ("compiled", scorer)):
+        elapsed = us_per_call(lambda data: client.post("/predict", data=data, content_type="application/json"),
+                              body, args.calls)
+        print(f"  {label:>8} {elapsed:>8.1f} us/request")
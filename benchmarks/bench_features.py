@@ -0,0 +1,51 @@
+"""
+Compares the row-wise and the column-wise implementations of `zoneshoot` on a multi-season shot
+frame. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_features [--shots 400000] [--csv path/to/dataframe_2016_to_2019.csv]
+
+When no CSV is given (or it does not exist) a synthetic frame with the same columns is used.
+"""
+import argparse
+from pathlib import Path
+import time
+
+import pandas as pd
+
+from ift6758.ift6758.client.game_client import zoneshoot
+from benchmarks.synthetic import make_shot_frame
+
+
+DEFAULT_CSV = Path(__file__).parent.parent / "ift6758" / "ift6758" / "data" / "dataframe_2016_to_2019.csv"
+FEATURE_COLUMNS = ['shotDistance', 'distanceFromLastEvent', 'rebound', 'speedFromLastEvent', 'shotAngle',
+                   'reboundAngleShot', 'offensivePressureTime']
+
+
+def load_frame(csv_path: Path, n_shots: int) -> pd.DataFrame:
+    if csv_path.exists():
+        df = pd.read_csv(csv_path)
+        return df.drop(columns=[c for c in FEATURE_COLUMNS if c in df.columns]).head(n_shots)
+    return make_shot_frame(n_shots)
+
+
+def shots_per_second(df: pd.DataFrame, legacy: bool) -> float:
+    start = time.perf_counter()
+    zoneshoot(df.copy(), legacy=legacy)
+    return len(df) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=400_000)
+    parser.add_argument("--legacy-shots", type=int, default=50_000,
+                        help="The row-wise path is timed on a prefix of the frame to keep the run short")
+    parser.add_argument("--csv", type=Path, default=DEFAULT_CSV)
+    args = parser.parse_args()
+
+    df = load_frame(args.csv, args.shots)
+    legacy = shots_per_second(df.head(args.legacy_shots), legacy=True)
+    vectorized = shots_per_second(df, legacy=False)
+
+    print(f"frame: {len(df)} shots")
+    print(f"row-wise    : {legacy:>14,.0f} shots/sec")
+    print(f"column-wise : {vectorized:>14,.0f} shots/sec ({vectorized / legacy:.0f}x)")
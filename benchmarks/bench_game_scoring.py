@@ -0,0 +1,93 @@
+"""
+Following a game as the dashboard does, one ping every `--step` plays, against a local Flask stand-in
+of the service (serving/app.py with the synthetic model, served by werkzeug in a background thread):
+
+    client   GameClient.update_game featurizes the new plays and ServingClient.predict scores them
+    post     ServingClient.score_game sends the play-by-play, featurized and scored by /games/<id>/score
+    get      ServingClient.score_game sends the game id only, the service reading the play-by-play
+             from its game source (GAME_SOURCE_DIR, rewritten before each ping)
+
+Reports the time and request bytes per ping, after checking every mode gets the same probabilities
+for the same shots. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_game_scoring [--plays 320 1200] [--step 10]
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+import tempfile
+import threading
+import time
+
+import numpy as np
+from werkzeug.serving import make_server
+
+from ift6758.ift6758.client.game_client import GameClient
+from ift6758.ift6758.client.serving_client import ServingClient
+from benchmarks.serving import import_app
+from benchmarks.synthetic import make_game
+
+
+def start_stand_in(port: int, game_dir: Path):
+    os.environ["GAME_SOURCE_DIR"] = str(game_dir)
+    app = import_app(["shotDistance"])
+    server = make_server("127.0.0.1", port, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def follow(mode: str, game: dict, step: int, port: int, game_dir: Path) -> tuple:
+    """Pings of a game with `step` more plays each; returns (seconds per ping, bytes per ping, probabilities)"""
+    serving_client = ServingClient("127.0.0.1", port, ["shotDistance"])
+    game_client = GameClient("127.0.0.1", port)
+    sent = []
+    serving_client.session.hooks["response"].append(lambda r, *args, **kwargs: sent.append(len(r.request.body or b"")))
+
+    seconds, probabilities, cursor = [], [], 0
+    for n_plays in range(step, len(game["plays"]) + step, step):
+        payload = dict(game, plays=game["plays"][:n_plays])
+        if mode == "get":
+            with open(game_dir / f"{game['id']}.json", "w") as f:
+                json.dump(payload, f)
+
+        start = time.perf_counter()
+        if mode == "client":
+            shots = game_client.update_game(payload)
+            if shots is not None:
+                probabilities.extend(serving_client.predict(shots)["probability"])
+        else:
+            body = serving_client.score_game(game["id"], payload if mode == "post" else None, cursor)
+            cursor = body["cursor"]
+            probabilities.extend(body["shots"].get("probability", []))
+        seconds.append(time.perf_counter() - start)
+
+    serving_client.close()
+    return np.array(seconds), sum(sent) / len(seconds), np.array(probabilities, dtype=float)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plays", type=int, nargs="+", default=[320, 1200], help="plays per game")
+    parser.add_argument("--step", type=int, default=10, help="new plays per ping")
+    parser.add_argument("--port", type=int, default=5097)
+    args = parser.parse_args()
+
+    game_dir = Path(tempfile.mkdtemp(prefix="ift6758-games-"))
+    server = start_stand_in(args.port, game_dir)
+
+    print(f"{'plays':>6} {'mode':>7} {'pings':>6} {'ms/ping':>8} {'p99 ms':>7} {'KB sent/ping':>13} {'shots':>6}")
+    try:
+        for n_plays in args.plays:
+            # A different game per size and mode, so the service never has it scored already
+            reference = None
+            for offset, mode in enumerate(("client", "post", "get")):
+                game = make_game(2023020000 + n_plays * 10 + offset, n_plays=n_plays)
+                seconds, sent, probabilities = follow(mode, game, args.step, args.port, game_dir)
+                if reference is None:
+                    reference = probabilities
+                assert np.allclose(probabilities, reference, equal_nan=True), f"{mode}: probabilities differ"
+                print(f"{n_plays:>6} {mode:>7} {len(seconds):>6} {seconds.mean() * 1000:>8.2f} "
+                      f"{np.percentile(seconds, 99) * 1000:>7.2f} {sent / 1024:>13.1f} {len(probabilities):>6}")
+    finally:
+        server.shutdown()
@@ -0,0 +1,89 @@
+"""
+Overhead of the metrics instrumentation (ift6758/ift6758/client/metrics.py, also used by the service): the
+cost of the timers and counters recorded per /predict call and per game update, as a percentage of
+the latency of the call itself. Exits with status 1 when it is above --max-overhead percent. Run from
+the root of the repo:
+
+    $ python -m benchmarks.bench_metrics [--max-overhead 2]
+"""
+import argparse
+import copy
+import statistics
+import sys
+import time
+
+from ift6758.ift6758.client.game_client import GameClient
+from ift6758.ift6758.client.metrics import Metrics
+from benchmarks.serving import import_app, make_shots
+from benchmarks.synthetic import make_game
+
+
+def median_seconds(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def server_instrumentation(metrics: Metrics):
+    """What a /predict call records: request latency and count, three stages and a row counter"""
+    with metrics.timer("decode"):
+        pass
+    metrics.inc("predicted_rows_total", 10)
+    with metrics.timer("predict_proba"):
+        pass
+    with metrics.timer("encode"):
+        pass
+    metrics.observe("request_seconds", 0.001, endpoint="/predict")
+    metrics.inc("requests_total", endpoint="/predict", status=200)
+
+
+def client_instrumentation(metrics: Metrics):
+    """What a game update records: fetch, parse and features stages and a shot counter"""
+    for stage in ("fetch", "parse", "features"):
+        with metrics.timer(stage):
+            pass
+    metrics.inc("shots_total", 5)
+
+
+def print_row(name: str, call: float, instrumentation: float) -> float:
+    overhead = 100 * instrumentation / call
+    print(f"{name:<24} {call * 1e6:>12.1f} {instrumentation * 1e6:>18.2f} {overhead:>10.3f}%")
+    return overhead
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--max-overhead", type=float, default=2.0, help="Maximum overhead, in percent")
+    args = parser.parse_args()
+
+    app = import_app()
+    client = app.app.test_client()
+    body = make_shots(10)[["shotDistance"]].to_json(orient="records")
+    predict = lambda: client.post("/predict", data=body, content_type="application/json")
+
+    game = make_game(2023020001, seed=0)
+
+    def update_game():
+        # A fresh client, so the whole game is featurized
+        GameClient().update_game(copy.deepcopy(game))
+
+    # Recorded into a separate object, so the benchmark does not inflate the metrics it measures
+    metrics = Metrics("bench")
+    instrumentation_repeat = args.repeat * 50
+
+    print(f"{'call':<24} {'call (us)':>12} {'instrumentation (us)':>18} {'overhead':>11}")
+    overheads = [
+        print_row("/predict (10 rows)", median_seconds(predict, args.repeat),
+                  median_seconds(lambda: server_instrumentation(metrics), instrumentation_repeat)),
+        print_row("GameClient.update_game", median_seconds(update_game, args.repeat // 10),
+                  median_seconds(lambda: client_instrumentation(metrics), instrumentation_repeat)),
+    ]
+
+    if max(overheads) > args.max_overhead:
+        print(f"FAIL: overhead above {args.max_overhead}%")
+        sys.exit(1)
+    print(f"OK: overhead below {args.max_overhead}%")
@@ -0,0 +1,57 @@
+"""
+Compares building a frame of every play then filtering shots (`ing_plays`) with the single-pass shot
+parser (`parse_shots`), alone and within `df_convert`, on full games. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_parse [--games 50] [--json-dir path/to/saved/games]
+
+Saved play-by-play JSON files are used when a directory is given, synthetic games otherwise.
+"""
+import argparse
+import copy
+import json
+from pathlib import Path
+import time
+
+from ift6758.ift6758.client.game_client import SHOT_EVENT_TYPES, df_convert, ing_plays, parse_shots
+from benchmarks.synthetic import make_game
+
+
+def load_games(json_dir: Path, n_games: int) -> list:
+    if json_dir is not None:
+        games = []
+        for path in sorted(json_dir.rglob("*.json"))[:n_games]:
+            with open(path) as f:
+                games.append(json.load(f))
+        return games
+    return [make_game(2023020001 + i, seed=i) for i in range(n_games)]
+
+
+def games_per_second(games: list, convert) -> float:
+    games = copy.deepcopy(games)
+    start = time.perf_counter()
+    for game_nhl in games:
+        convert(game_nhl)
+    return len(games) / (time.perf_counter() - start)
+
+
+def legacy_parse(game_nhl: dict):
+    clean_df = ing_plays(game_nhl['id'], game_nhl['plays'])
+    return clean_df[clean_df['typeDescKey'].isin(SHOT_EVENT_TYPES)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--json-dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    games = load_games(args.json_dir, args.games)
+    n_plays = sum(len(game_nhl['plays']) for game_nhl in games)
+    print(f"{len(games)} games, {n_plays / len(games):.0f} plays per game")
+
+    for stage, legacy, current in (
+            ("parse stage", legacy_parse, lambda g: parse_shots(g['id'], g['plays'])),
+            ("df_convert", lambda g: df_convert(g, legacy=True), df_convert)):
+        before = games_per_second(games, legacy)
+        after = games_per_second(games, current)
+        print(f"{stage:<12} legacy: {before:>8.1f} games/sec   streaming: {after:>8.1f} games/sec ({after / before:.1f}x)")
@@ -0,0 +1,71 @@
+"""
+Throughput of /predict for each request format, measured end to end (client-side encoding, request
+handling and response decoding) through the Flask test client. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_predict [--rows 1000 100000 1000000]
+"""
+import argparse
+import io
+import json
+import time
+
+import numpy as np
+
+from benchmarks.serving import import_app, make_shots
+
+
+FEATURES = ["shotDistance", "shotAngle"]
+
+
+def json_request(client, X):
+    r = client.post("/predict", json=json.loads(X.to_json(orient="records")))
+    return np.asarray(r.get_json()["probabilities"])
+
+
+def npy_request(client, X):
+    buffer = io.BytesIO()
+    np.save(buffer, X.to_numpy(dtype=np.float64))
+    r = client.post("/predict", data=buffer.getvalue(), content_type="application/x-npy",
+                    headers={"X-Feature-Names": ",".join(X.columns), "Accept": "application/x-npy"})
+    return np.load(io.BytesIO(r.get_data()))
+
+
+def arrow_request(client, X):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(X, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    r = client.post("/predict", data=sink.getvalue().to_pybytes(),
+                    content_type="application/vnd.apache.arrow.stream", headers={"Accept": "application/x-npy"})
+    return np.load(io.BytesIO(r.get_data()))
+
+
+FORMATS = {"json": json_request, "npy": npy_request, "arrow": arrow_request}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    app = import_app(FEATURES)
+    client = app.app.test_client()
+
+    print(f"{'rows':>10} {'format':>6} {'seconds':>9} {'rows/sec':>14}")
+    for n_rows in args.rows:
+        X = make_shots(n_rows)[FEATURES]
+        expected = None
+        for name, send in FORMATS.items():
+            try:
+                start = time.perf_counter()
+                probabilities = send(client, X)
+                elapsed = time.perf_counter() - start
+            except ImportError:
+                print(f"{n_rows:>10} {name:>6}   skipped (pyarrow is not installed)")
+                continue
+            if expected is None:
+                expected = probabilities
+            assert np.allclose(probabilities, expected), f"{name} probabilities differ from json"
+            print(f"{n_rows:>10} {name:>6} {elapsed:>9.3f} {n_rows / elapsed:>14,.0f}")
@@ -0,0 +1,221 @@
+"""
+End-to-end load test on replayed games, offline: saved play-by-play (synthetic games when no path is
+given) is served by the NHL stand-in of replay.py at `--speed` times the game clock, while concurrent
+dashboard sessions follow the games against the serving app (gunicorn with the synthetic model, or
+the service at `--serving-url`). Each session polls its game every `--poll` seconds, in one of two
+modes:
+
+    client   GameClient fetches and featurizes the new plays, ServingClient.predict scores them
+    service  ServingClient.score_game has /games/<id>/score fetch them from the stand-in, featurize
+             and score them (the service is started with NHL_API_URL pointing at the stand-in)
+
+Sessions are spread over `--games` games, so several sessions follow each game as on a busy night.
+Reports, per mode and number of sessions, polls/sec and scored shots/sec, p50/p99 of the time of a
+poll and of the latency from a play being revealed to its xG reaching the session (which includes
+the wait for the next poll), the percentage of failed polls and the shots scored out of those in
+the games. In a third mode, sessions do not poll:
+
+    live     A single LiveGames refresher (client/live.py) follows the games every `--poll` seconds
+             and pushes their new shots to the sessions subscribed to them, as in the dashboard
+
+where polls are the refresher's and the latency is until a delta reaches the session. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_replay [GAME.json | DIR ...] [--sessions 8 32] [--speed 120] [--games 4]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+from pathlib import Path
+import queue
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from ift6758.ift6758.client.game_client import SHOT_EVENT_TYPES, GameClient
+from ift6758.ift6758.client.live import LiveGames
+from ift6758.ift6758.client.nhl_api import PlayByPlayFetcher
+from ift6758.ift6758.client.serving_client import ServingClient
+from benchmarks.load import wait_until_up
+from benchmarks.replay import GameReplay, NHLStandIn, load_games
+from benchmarks.serving import SERVING_DIR, SERVING_PYTHONPATH, make_model, make_workdir
+from benchmarks.synthetic import make_game
+
+
+MODES = ("client", "service", "live")
+SERVERS = {"flask": ["app:app"], "asgi": ["-k", "uvicorn.workers.UvicornWorker", "asgi:app"]}
+
+
+def synthetic_games(n_games: int, n_plays: int) -> list:
+    """Synthetic games saved to and loaded back from JSON files, as saved games would be"""
+    game_dir = Path(tempfile.mkdtemp(prefix="ift6758-replay-"))
+    for i in range(n_games):
+        with open(game_dir / f"{2023020001 + i}.json", "w") as f:
+            json.dump(make_game(2023020001 + i, n_plays=n_plays, seed=i), f)
+    return load_games([game_dir])
+
+
+def renumber(games: list, n_games: int, first_id: int) -> list:
+    """`n_games` games cycling through `games`, with ids from `first_id` on"""
+    return [dict(games[i % len(games)], id=first_id + i) for i in range(n_games)]
+
+
+def start_server(server: str, workdir: Path, port: int, workers: int, nhl_url: str, nhl_ttl: float) -> subprocess.Popen:
+    env = dict(os.environ, GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_WORKERS=str(workers),
+               FLASK_LOG=str(workdir / "flask.log"), NHL_API_URL=nhl_url, NHL_API_TTL=str(nhl_ttl),
+               PYTHONPATH=SERVING_PYTHONPATH)
+    return subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", str(SERVING_DIR / "gunicorn.conf.py"),
+                             "--chdir", str(workdir), "--timeout", "120", *SERVERS[server]], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def follow(mode: str, replay: GameReplay, nhl_url: str, host: str, port: int, poll: float, nhl_ttl: float,
+           seed: int) -> dict:
+    """One dashboard session following `replay` until it polls once its last play can no longer be cached"""
+    serving_client = ServingClient(host, port, ["shotDistance"])
+    game_client = GameClient(host, port, fetcher=PlayByPlayFetcher(nhl_url, ttl=nhl_ttl))
+    game_id = replay.game_id
+    polls, latencies, errors, cursor, shots = [], [], 0, 0, 0
+
+    # Sessions do not poll in lockstep
+    time.sleep(max(0.0, replay.started - time.monotonic()) + random.Random(seed).uniform(0, poll))
+    while True:
+        started = time.monotonic()
+        try:
+            seconds = []
+            if mode == "client":
+                game_nhl = game_client.fetcher.get(game_id)
+                if game_nhl is None:
+                    raise RuntimeError(f"Failed to fetch game {game_id}")
+                new_shots = game_client.update_game(game_nhl)
+                if new_shots is not None:
+                    serving_client.predict(new_shots)
+                    seconds = new_shots["gameSeconds"].tolist()
+            else:
+                body = serving_client.score_game(game_id, cursor=cursor)
+                cursor = body["cursor"]
+                seconds = body["shots"].get("gameSeconds", [])
+            scored = time.monotonic()
+            polls.append(scored - started)
+            latencies.extend(scored - replay.revealed_at(s) for s in seconds)
+            shots += len(seconds)
+        except Exception:
+            errors += 1
+
+        if started > replay.ends_at + nhl_ttl:
+            break
+        time.sleep(max(0.0, started + poll - time.monotonic()))
+
+    serving_client.close()
+    return {"polls": polls, "latencies": latencies, "errors": errors, "shots": shots}
+
+
+def follow_live(live: LiveGames, replay: GameReplay, nhl_ttl: float, poll: float) -> dict:
+    """One dashboard session subscribed to `replay` until the refresher can no longer see new plays"""
+    deltas = queue.SimpleQueue()
+    latencies, shots = [], 0
+    unsubscribe = live.subscribe(replay.game_id, deltas.put)
+    while True:
+        try:
+            delta = deltas.get(timeout=poll)
+        except queue.Empty:
+            if time.monotonic() > replay.ends_at + nhl_ttl + 2 * poll:
+                break
+            continue
+        received = time.monotonic()
+        seconds = delta["shots"].get("gameSeconds", [])
+        latencies.extend(received - replay.revealed_at(s) for s in seconds)
+        shots += len(seconds)
+    unsubscribe()
+    return {"polls": [], "latencies": latencies, "errors": 0, "shots": shots}
+
+
+def timed(tick, seconds: list):
+    """`tick` of a GameTracker, appending the time of each call to `seconds`: the refresher's polls"""
+    async def timed_tick():
+        started = time.monotonic()
+        new_shots = await tick()
+        seconds.append(time.monotonic() - started)
+        return new_shots
+    return timed_tick
+
+
+def print_header():
+    print(f"{'mode':>8} {'sessions':>8} {'polls/s':>8} {'shots/s':>8} {'poll p50':>9} {'poll p99':>9} "
+          f"{'xG p50 ms':>10} {'xG p99 ms':>10} {'errors %':>8} {'shots':>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", help="Saved play-by-play JSON files, or directories of them")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--games", type=int, default=4, help="Distinct games followed by the sessions")
+    parser.add_argument("--plays", type=int, default=320, help="Plays per synthetic game")
+    parser.add_argument("--speed", type=float, default=120.0, help="Game clock seconds per second")
+    parser.add_argument("--poll", type=float, default=1.0, help="Seconds between two polls of a session")
+    parser.add_argument("--nhl-ttl", type=float, default=0.5,
+                        help="Seconds a play-by-play is reused before revalidating it, in clients and service")
+    parser.add_argument("--serving-url", help="Service to load, e.g. http://127.0.0.1:5000; started if omitted")
+    parser.add_argument("--server", choices=list(SERVERS), default="flask")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=5095)
+    parser.add_argument("--nhl-port", type=int, default=5096)
+    args = parser.parse_args()
+
+    games = load_games(args.paths) if args.paths else synthetic_games(args.games, args.plays)
+    stand_in = NHLStandIn([], args.speed, args.nhl_port)
+    server = None
+    if args.serving_url:
+        url = args.serving_url.rstrip("/")
+    else:
+        url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.server, make_workdir(make_model()), args.port, args.workers, stand_in.url,
+                              args.nhl_ttl)
+    host, port = url.split("://")[1].rsplit(":", 1)
+
+    print_header()
+    try:
+        wait_until_up(f"{url}/ready")
+        for run, (mode, n_sessions) in enumerate((mode, n) for mode in args.modes for n in args.sessions):
+            # Fresh game ids, so the service has not scored them in a previous run
+            run_games = renumber(games, args.games, 2000000000 + run * args.games)
+            stand_in.replay(run_games, args.speed, start_delay=1.0)
+            replays = list(stand_in.replays.values())
+            started = time.monotonic()
+            live = None
+            if mode == "live":
+                live = LiveGames(GameClient(host, int(port), fetcher=PlayByPlayFetcher(stand_in.url, ttl=args.nhl_ttl)),
+                                 ServingClient(host, int(port), ["shotDistance"]),
+                                 poll_intervals={status: args.poll for status in ("live", "intermission", "pregame")})
+                live.tracker.tick = timed(live.tracker.tick, refresher_polls := [])
+            with ThreadPoolExecutor(n_sessions) as executor:
+                results = list(executor.map(
+                    lambda i: follow_live(live, replays[i % len(replays)], args.nhl_ttl, args.poll) if live else
+                    follow(mode, replays[i % len(replays)], stand_in.url, host, int(port), args.poll, args.nhl_ttl, i),
+                    range(n_sessions)))
+            elapsed = time.monotonic() - max(started, stand_in.started)
+            if live is not None:
+                live.close()
+                results.append({"polls": refresher_polls, "latencies": [], "errors": 0, "shots": 0})
+
+            polls = np.concatenate([result["polls"] for result in results]) * 1000
+            latencies = np.concatenate([result["latencies"] for result in results]) * 1000
+            errors = sum(result["errors"] for result in results)
+            scored = sum(result["shots"] for result in results)
+            expected = sum(sum(play["typeDescKey"] in SHOT_EVENT_TYPES for play in replays[i % len(replays)]
+                               .game_nhl["plays"]) for i in range(n_sessions))
+            print(f"{mode:>8} {n_sessions:>8} {len(polls) / elapsed:>8.1f} {scored / elapsed:>8.1f} "
+                  f"{np.percentile(polls, 50):>9.1f} {np.percentile(polls, 99):>9.1f} "
+                  f"{np.percentile(latencies, 50):>10.0f} {np.percentile(latencies, 99):>10.0f} "
+                  f"{100 * errors / (len(polls) + errors):>8.1f} {f'{scored}/{expected}':>11}")
+        print(f"\nNHL stand-in: {stand_in.stats['requests']} requests, {stand_in.stats['not_modified']} answered 304")
+    finally:
+        stand_in.shutdown()
+        if server is not None:
+            server.terminate()
+            server.wait()
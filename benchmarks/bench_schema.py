@@ -0,0 +1,67 @@
+"""
+Memory and load time of a multi-season shot frame saved as CSV and Parquet, read with pandas' default
+dtypes vs `load_shots` (the dtypes of SHOT_SCHEMA). Uses --csv (e.g. dataframe_2016_to_2019.csv)
+when given, otherwise synthetic games repeated to --shots rows. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_schema [--shots 1000000] [--csv path/to/shots.csv]
+"""
+import argparse
+from pathlib import Path
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from ift6758.ift6758.client.game_client import df_convert
+from ift6758.ift6758.client.shot_schema import load_shots
+from benchmarks.synthetic import make_game
+
+
+def synthetic_shots(n_shots: int, n_games: int = 50) -> pd.DataFrame:
+    games = pd.concat([df_convert(make_game(2016020001 + i, seed=i)) for i in range(n_games)], ignore_index=True)
+    repeats = n_shots // len(games) + 1
+    shots = pd.concat([games] * repeats, ignore_index=True).iloc[:n_shots].copy()
+    # Distinct games across seasons
+    shots['idGame'] = shots['idGame'].to_numpy() + 1_000_000 * np.repeat(np.arange(repeats), len(games))[:n_shots]
+    return shots
+
+
+def measure(read) -> tuple:
+    start = time.perf_counter()
+    df = read()
+    return df, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=1_000_000)
+    parser.add_argument("--csv", type=Path, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = args.csv
+        if csv_path is None:
+            csv_path = Path(tmp) / "shots.csv"
+            synthetic_shots(args.shots).to_csv(csv_path, index=False)
+        parquet_path = Path(tmp) / "shots.parquet"
+        pd.read_csv(csv_path).to_parquet(parquet_path, index=False)
+
+        def read_csv_object_strings():
+            # Strings as Python objects, the default before pandas 3
+            with pd.option_context("future.infer_string", False):
+                return pd.read_csv(csv_path)
+
+        print(f"{'reader':>22} {'rows':>10} {'seconds':>8} {'memory MB':>10} {'reduction':>10}")
+        baseline = None
+        for name, read in [
+            ("pd.read_csv (object)", read_csv_object_strings),
+            ("pd.read_csv", lambda: pd.read_csv(csv_path)),
+            ("load_shots(csv)", lambda: load_shots(csv_path)),
+            ("pd.read_parquet", lambda: pd.read_parquet(parquet_path)),
+            ("load_shots(parquet)", lambda: load_shots(parquet_path)),
+        ]:
+            df, seconds = measure(read)
+            memory = df.memory_usage(deep=True).sum() / 2**20
+            baseline = baseline or memory
+            print(f"{name:>22} {len(df):>10,} {seconds:>8.2f} {memory:>10.1f} {baseline / memory:>9.1f}x")
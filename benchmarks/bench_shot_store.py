@@ -0,0 +1,60 @@
+"""
+Per-ping cost of keeping a game's shot history and xG totals in the dashboard: `pd.concat` of the
+whole history with the new shots followed by a groupby over it (as streamlit_app.py did), against
+appending the new shots to a `ShotStore`. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_shot_store [--shots-per-ping 5] [--history 100 1000 10000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from ift6758.ift6758.client.game_client import df_convert
+from ift6758.ift6758.client.shot_store import ShotStore
+from benchmarks.synthetic import make_game
+
+
+def concat_ping(history: pd.DataFrame, new_shots: pd.DataFrame) -> tuple:
+    history = pd.concat([history, new_shots], ignore_index=True)
+    return history, history.groupby("eventOwnerTeam")["probability"].sum().to_dict()
+
+
+def store_ping(store: ShotStore, new_shots: pd.DataFrame) -> dict:
+    store.append(new_shots)
+    return store.xg
+
+
+def ms_per_ping(ping, pings: list) -> float:
+    start = time.perf_counter()
+    for new_shots in pings:
+        ping(new_shots)
+    return (time.perf_counter() - start) / len(pings) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots-per-ping", type=int, default=5)
+    parser.add_argument("--history", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--pings", type=int, default=50)
+    args = parser.parse_args()
+
+    shots = df_convert(make_game(2023020001, seed=0))
+    shots["probability"] = np.random.default_rng(0).random(len(shots))
+    pings = [shots.sample(args.shots_per_ping, random_state=i) for i in range(args.pings)]
+
+    print(f"{'history':>8} {'concat ms/ping':>15} {'store ms/ping':>14}")
+    for size in args.history:
+        history = pd.concat([shots] * (size // len(shots) + 1), ignore_index=True).iloc[:size]
+        store = ShotStore()
+        store.append(history)
+
+        state = {"history": history}
+
+        def concat(new_shots):
+            state["history"], _ = concat_ping(state["history"], new_shots)
+
+        concat_ms = ms_per_ping(concat, pings)
+        store_ms = ms_per_ping(lambda new_shots: store_ping(store, new_shots), pings)
+        print(f"{size:>8} {concat_ms:>15.2f} {store_ms:>14.2f}")
@@ -0,0 +1,71 @@
+"""
+Decoding of `situationCode` into the emptyGoalNet and isGoalAdvantage features: the row-wise
+`empty_goal_func` and `goal_situation` against the column-wise `situation_features`. Before timing,
+both are checked to agree on every code with goalies in or out and 0 to 6 skaters per side, for
+shots of either team. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_situation [--shots 1000000]
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from ift6758.ift6758.client.features import situation_features
+from ift6758.ift6758.client.game_client import empty_goal_func, goal_situation
+
+
+def every_situation() -> pd.DataFrame:
+    codes = [f"{away_goalie}{away_skaters}{home_skaters}{home_goalie}"
+             for away_goalie, away_skaters, home_skaters, home_goalie
+             in itertools.product((0, 1), range(7), range(7), (0, 1))]
+    return pd.DataFrame(list(itertools.product(codes, ("home", "away"))), columns=["situationCode", "teamSide"])
+
+
+def check_parity(shots: pd.DataFrame):
+    empty_net, advantage, strength = situation_features(shots["situationCode"], shots["teamSide"])
+    assert np.array_equal(empty_net, empty_goal_func(shots).astype(bool).to_numpy()), "emptyGoalNet differs"
+    assert np.array_equal(np.asarray(advantage, dtype=object), goal_situation(shots).to_numpy(dtype=object)), \
+        "isGoalAdvantage differs"
+
+    home = (shots["teamSide"] == "home").to_numpy()
+    codes = shots["situationCode"]
+    own = np.where(home, codes.str[2], codes.str[1])
+    other = np.where(home, codes.str[1], codes.str[2])
+    assert np.array_equal(np.asarray(strength, dtype=object), own + "v" + other), "strength differs"
+
+
+def shots_per_second(decode, shots: pd.DataFrame) -> float:
+    start = time.perf_counter()
+    decode(shots)
+    return len(shots) / (time.perf_counter() - start)
+
+
+def row_wise(shots: pd.DataFrame):
+    return empty_goal_func(shots).astype(int), goal_situation(shots)
+
+
+def column_wise(shots: pd.DataFrame):
+    return situation_features(shots["situationCode"], shots["teamSide"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=1_000_000)
+    parser.add_argument("--legacy-shots", type=int, default=50_000,
+                        help="The row-wise path is timed on a prefix of the frame to keep the run short")
+    args = parser.parse_args()
+
+    situations = every_situation()
+    check_parity(situations)
+    print(f"parity: {len(situations)} code/side pairs agree")
+
+    shots = situations.sample(args.shots, replace=True, random_state=0).reset_index(drop=True)
+    legacy = shots_per_second(row_wise, shots.head(args.legacy_shots))
+    vectorized = shots_per_second(column_wise, shots)
+
+    print(f"frame: {len(shots)} shots")
+    print(f"row-wise    : {legacy:>14,.0f} shots/sec")
+    print(f"column-wise : {vectorized:>14,.0f} shots/sec ({vectorized / legacy:.0f}x)")
@@ -0,0 +1,126 @@
+"""
+Cold start of the serving app: how long `import app` takes in a fresh interpreter (the default model
+being loaded at import), and, under gunicorn, the time from spawning the server until /health
+answers, until /ready reports a loaded model, and until the first /predict response. Measured with
+the model baked into models/ (as bake_model.py does at image build), and without any model (W&B is
+unreachable, so the worker comes up but never gets ready). With WANDB_API_KEY set, the download of
+the default model from the registry is measured too. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_startup [--repeat 5] [--importtime 10]
+"""
+import argparse
+import os
+from pathlib import Path
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import requests
+
+from benchmarks.serving import SERVING_DIR, SERVING_PYTHONPATH, make_model, make_workdir
+
+
+IMPORT_SCRIPT = "import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+
+
+def server_env(workdir, **env) -> dict:
+    return dict(os.environ, FLASK_LOG=str(workdir / "flask.log"), PYTHONPATH=SERVING_PYTHONPATH, **env)
+
+
+def import_seconds(workdir, env: dict) -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=workdir, env=env, capture_output=True,
+                         text=True, check=True).stdout
+    return float(out.split()[-1])
+
+
+def slowest_imports(workdir, env: dict, n: int) -> list:
+    """Top-level modules imported by app.py, by cumulative import time (python -X importtime)"""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=workdir, env=env,
+                         capture_output=True, text=True).stderr
+    imports = []
+    for line in err.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)", line)
+        if match and len(match.group(2)) <= 2 and match.group(3) != "app":
+            imports.append((int(match.group(1)) / 1e6, match.group(3)))
+    return sorted(imports, reverse=True)[:n]
+
+
+def empty_workdir() -> Path:
+    workdir = Path(tempfile.mkdtemp(prefix="ift6758-serving-"))
+    (workdir / "models").mkdir()
+    return workdir
+
+
+def wait_for(url: str, deadline: float, ok_status: int = 200) -> float:
+    """Polls `url` until it answers with `ok_status`; returns when, or nan past the deadline"""
+    while time.perf_counter() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == ok_status:
+                return time.perf_counter()
+        except requests.RequestException:
+            pass
+        time.sleep(0.01)
+    return np.nan
+
+
+def cold_start(workdir, env: dict, port: int, timeout: float) -> dict:
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", str(SERVING_DIR / "gunicorn.conf.py"),
+                               "--chdir", str(workdir), "app:app"],
+                              env=dict(env, GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_WORKERS="1"),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = started + timeout
+        health = wait_for(f"{url}/health", deadline)
+        ready = wait_for(f"{url}/ready", deadline if not np.isnan(health) else started)
+        first_prediction = np.nan
+        if not np.isnan(ready):
+            r = requests.post(f"{url}/predict", json=[{"shotDistance": 30.0}], timeout=timeout)
+            if r.ok and "probabilities" in r.json():
+                first_prediction = time.perf_counter()
+        return {"health": health - started, "ready": ready - started, "first_prediction": first_prediction - started}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--importtime", type=int, default=10, help="Number of slowest imports listed")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds to wait for the server to get ready")
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+
+    baked = make_workdir(make_model())
+    empty = empty_workdir()
+    scenarios = {
+        "baked": (baked, server_env(baked)),
+        # The registry fails fast offline instead of hanging on the network
+        "no model": (empty, server_env(empty, WANDB_MODE="offline", WANDB_API_KEY="offline")),
+    }
+    if os.environ.get("WANDB_API_KEY"):
+        registry = empty_workdir()
+        scenarios["registry"] = (registry, server_env(registry))
+
+    print(f"{'model':>9} {'import s':>9} {'health s':>9} {'ready s':>8} {'1st predict s':>14}")
+    for name, (workdir, env) in scenarios.items():
+        imports, starts = [], []
+        for _ in range(args.repeat):
+            # Only the first start downloads the model from the registry, so it is the one timed
+            starts.append(cold_start(workdir, env, args.port, args.timeout))
+            imports.append(import_seconds(workdir, env))
+            if name == "registry":
+                break
+        median = {key: np.median([start[key] for start in starts]) for key in starts[0]}
+        print(f"{name:>9} {np.median(imports):>9.3f} {median['health']:>9.3f} {median['ready']:>8.3f} "
+              f"{median['first_prediction']:>14.3f}")
+
+    if args.importtime:
+        print("\nslowest imports of app.py (with the baked model):")
+        for seconds, module in slowest_imports(baked, scenarios["baked"][1], args.importtime):
+            print(f"  {module:<30} {seconds:>6.3f}s")
@@ -0,0 +1,74 @@
+"""
+Per-worker memory and startup time of the serving app under gunicorn, for each model loading mode.
+The default model is replaced by a large nearest-neighbours model so that its arrays dominate the
+memory of the workers. Requires gunicorn; run from the root of the repo:
+
+    $ python -m benchmarks.bench_workers [--workers 4] [--samples 2000000]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import requests
+from sklearn.neighbors import KNeighborsClassifier
+
+from benchmarks.serving import SERVING_DIR, SERVING_PYTHONPATH, make_shots, make_workdir
+
+
+MODES = {
+    "default": {},
+    "mmap": {"MODEL_MMAP_MODE": "r"},
+    "preload": {"GUNICORN_PRELOAD": "1"},
+    "preload+mmap": {"GUNICORN_PRELOAD": "1", "MODEL_MMAP_MODE": "r"},
+}
+
+
+def worker_reports(url: str, n_workers: int, timeout: float = 60.0) -> dict:
+    """Polls /worker until every worker answered"""
+    reports = {}
+    deadline = time.monotonic() + timeout
+    while len(reports) < n_workers and time.monotonic() < deadline:
+        try:
+            report = requests.get(f"{url}/worker", timeout=5).json()
+            reports[report["pid"]] = report
+        except requests.RequestException:
+            time.sleep(0.2)
+    return reports
+
+
+def run_mode(name: str, env: dict, workdir, port: int, n_workers: int):
+    env = dict(os.environ, GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_WORKERS=str(n_workers),
+               FLASK_LOG=str(workdir / "flask.log"), PYTHONPATH=SERVING_PYTHONPATH, **env)
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", str(SERVING_DIR / "gunicorn.conf.py"),
+                               "--chdir", str(workdir), "app:app"], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        reports = worker_reports(f"http://127.0.0.1:{port}", n_workers)
+    finally:
+        server.terminate()
+        server.wait()
+
+    rss = [r["memory"]["rss"] for r in reports.values()]
+    pss = [r["memory"].get("pss", np.nan) for r in reports.values()]
+    startup = [r["startup_seconds"] for r in reports.values()]
+    print(f"{name:>13} {len(reports):>7} {np.mean(rss) / 2**20:>9.1f} {np.nansum(pss) / 2**20:>13.1f} "
+          f"{np.mean(startup):>11.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--samples", type=int, default=2_000_000)
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+
+    X = make_shots(args.samples)[["shotDistance", "shotAngle"]]
+    model = KNeighborsClassifier().fit(X, (X["shotDistance"] < 20).astype(int))
+    workdir = make_workdir(model)
+
+    print(f"{'mode':>13} {'workers':>7} {'RSS/worker':>9} {'PSS total MB':>13} {'startup (s)':>11}")
+    for name, env in MODES.items():
+        run_mode(name, env, workdir, args.port, args.workers)
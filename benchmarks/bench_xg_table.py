@@ -0,0 +1,98 @@
+"""
+xG tables of geometry-only models (serving/xg_table.py): build time, size and error against the
+model at several resolutions, for logistic regressions on shotDistance and on shotDistance +
+shotAngle fitted to synthetic shots, and for a random forest on both. Exits with status 1 if the
+maximum error of a logistic regression's table at the default resolution exceeds --max-error. Then
+compares the time to score a batch from the table with the compiled scorer and with scikit-learn,
+and times /heatmap. Run from the root of the repo:
+
+    $ python -m benchmarks.bench_xg_table [--resolutions 0.25 0.5 1 2] [--max-error 0.01]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from benchmarks.serving import import_app
+
+
+def make_geometry_models(n_shots: int = 20000, seed: int = 0) -> dict:
+    """Models fitted to shots in the offensive zone, less likely to score far and wide"""
+    from xg_table import shot_geometry
+
+    rng = np.random.default_rng(seed)
+    distance, angle = shot_geometry(rng.uniform(-42.5, 42.5, n_shots), rng.uniform(25, 100, n_shots))
+    X = pd.DataFrame({"shotDistance": distance, "shotAngle": angle})
+    y = (rng.random(n_shots) < 1 / (1 + np.exp(0.3 + 0.05 * distance + 0.01 * angle))).astype(int)
+    return {
+        "distance": LogisticRegression().fit(X[["shotDistance"]], y),
+        "distance + angle": LogisticRegression().fit(X, y),
+        "forest": RandomForestClassifier(100, min_samples_leaf=50, random_state=seed).fit(X, y),
+    }
+
+
+def us_per_call(fn, X: np.ndarray, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn(X)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolutions", type=float, nargs="+", default=[0.25, 0.5, 1.0, 2.0])
+    parser.add_argument("--max-error", type=float, default=0.01)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 1000, 100_000])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    app = import_app(["shotDistance"])
+    from compiled import compile_model, predict_proba
+    from xg_table import XGTable
+
+    models = make_geometry_models()
+    failed = False
+    print(f"{'model':>17} {'ft':>5} {'build ms':>9} {'KB':>6} {'max err':>9} {'p99 err':>9} {'mean err':>9} "
+          f"{'coverage':>9}")
+    for name, model in models.items():
+        features = list(model.feature_names_in_)
+        scorer = compile_model(model) or model
+        for resolution in args.resolutions:
+            start = time.perf_counter()
+            table = XGTable.build(lambda rows: predict_proba(scorer, rows), features, resolution)
+            build_ms = (time.perf_counter() - start) * 1000
+            error = table.error
+            print(f"{name:>17} {resolution:>5} {build_ms:>9.1f} {table.probabilities.nbytes / 1024:>6.0f} "
+                  f"{error['max']:>9.2e} {error['p99']:>9.2e} {error['mean']:>9.2e} {error['coverage']:>9.4f}")
+            if name != "forest" and resolution == app.XG_TABLE_RESOLUTION and error["max"] > args.max_error:
+                print(f"  max error above {args.max_error}")
+                failed = True
+
+    print(f"\n{'model':>17} {'rows':>7} {'sklearn us':>11} {'compiled us':>12} {'table us':>9}")
+    for name, model in models.items():
+        entry = app.registry.add(app.model_key("bench", name, "1"), model)
+        table = entry.build_xg_table()
+        features = list(model.feature_names_in_)
+        for n_rows in args.batch_sizes:
+            if name == "forest" and n_rows > 1000:
+                continue
+            rng = np.random.default_rng(n_rows)
+            X = XGTable.features_at(rng.uniform(-42.5, 42.5, n_rows), rng.uniform(0, 100, n_rows), features)
+            sklearn_us = us_per_call(lambda rows: predict_proba(model, rows), X, args.calls)
+            compiled_us = us_per_call(entry.scorer.predict_proba, X, args.calls) if entry.scorer else np.nan
+            table_us = us_per_call(lambda rows: table.predict_proba(rows, entry.predict_proba), X, args.calls)
+            print(f"{name:>17} {n_rows:>7} {sklearn_us:>11.1f} {compiled_us:>12.1f} {table_us:>9.1f}")
+
+    client = app.app.test_client()
+    app.registry.swap(app.model_key("bench", "distance + angle", "1"))
+    start = time.perf_counter()
+    r = client.get("/heatmap")
+    elapsed = (time.perf_counter() - start) * 1000
+    cached = client.get("/heatmap", headers={"If-None-Match": r.headers["ETag"]})
+    print(f"\n/heatmap: {len(r.data) / 1024:.0f} KB in {elapsed:.0f} ms; with its ETag: HTTP {cached.status_code}")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,70 @@
+"""
+Closed-loop HTTP load generator shared by the serving load tests: `concurrency` clients each send
+their next request as soon as the previous one is answered.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import numpy as np
+import requests
+
+
+def run_load(send, concurrency: int, duration: float) -> dict:
+    """
+    Calls send(session) from `concurrency` threads for `duration` seconds. Returns the throughput,
+    the p50/p99 latency and the error count.
+    """
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                ok = send(session)
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(client)
+    elapsed = time.monotonic() - started
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": np.percentile(latencies, 50) if len(latencies) else np.nan,
+        "p99_ms": np.percentile(latencies, 99) if len(latencies) else np.nan,
+        "errors": errors[0],
+    }
+
+
+def wait_until_up(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise TimeoutError(f"{url} did not come up within {timeout}s")
+
+
+def print_header():
+    print(f"{'mode':>12} {'clients':>7} {'req/sec':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+
+
+def print_row(mode: str, concurrency: int, result: dict):
+    print(f"{mode:>12} {concurrency:>7} {result['throughput']:>9.0f} {result['p50_ms']:>8.2f} "
+          f"{result['p99_ms']:>8.2f} {result['errors']:>6}")
@@ -0,0 +1,132 @@
+"""
+Replay of saved NHL games for end-to-end load tests without network access: a local stand-in of the
+play-by-play endpoint of api-web.nhle.com (Flask, served by werkzeug in a background thread) reveals
+the plays of each game progressively, at `speed` times the game clock, so that clients polling it
+see live games. Point PlayByPlayFetcher (base_url) or the service (NHL_API_URL) at `NHLStandIn.url`.
+"""
+from bisect import bisect_right
+from itertools import accumulate
+import json
+from pathlib import Path
+import threading
+import time
+
+from flask import Flask, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from ift6758.ift6758.client.game_client import play_seconds
+
+
+def load_games(paths: list) -> list:
+    """
+    Play-by-play payloads saved as JSON files (or every *.json of a directory), as returned by the
+    NHL API or as kept in the on-disk cache of PlayByPlayFetcher (NHL_CACHE_DIR)
+    """
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob("*.json")) if path.is_dir() else [path])
+
+    games = []
+    for file in files:
+        with open(file) as f:
+            data = json.load(f)
+        games.append(data["payload"] if "payload" in data and "plays" not in data else data)
+    return games
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Does not log every request of the clients to stderr"""
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class GameReplay:
+    def __init__(self, game_nhl: dict, speed: float, started: float):
+        """
+        Args:
+            game_nhl (dict): Play-by-play of the whole game
+            speed (float): Game clock seconds revealed per second
+            started (float): time.monotonic() at which the game starts
+        """
+        self.game_nhl = game_nhl
+        self.speed = speed
+        self.started = started
+        # Plays are revealed in order once the clock passes them; intermissions and stoppages take no time
+        clock = accumulate((play_seconds(play) for play in game_nhl["plays"]), max)
+        self.reveal_at = [started + seconds / speed for seconds in clock]
+
+    @property
+    def game_id(self) -> int:
+        return self.game_nhl["id"]
+
+    def revealed(self, now: float = None) -> int:
+        """Number of plays revealed at `now`"""
+        return bisect_right(self.reveal_at, time.monotonic() if now is None else now)
+
+    def revealed_at(self, game_seconds: float) -> float:
+        """time.monotonic() at which the plays at `game_seconds` on the game clock were revealed"""
+        return self.started + game_seconds / self.speed
+
+    @property
+    def ends_at(self) -> float:
+        return self.reveal_at[-1] if self.reveal_at else self.started
+
+    def payload(self, n_plays: int) -> dict:
+        final = n_plays == len(self.reveal_at)
+        return dict(self.game_nhl, plays=self.game_nhl["plays"][:n_plays], gameState="OFF" if final else "LIVE")
+
+
+class NHLStandIn:
+    def __init__(self, games: list, speed: float = 60.0, port: int = 5096, start_delay: float = 0.0):
+        """
+        Serves /v1/gamecenter/<id>/play-by-play for `games` (see `replay`). Responses carry an ETag
+        per number of revealed plays, so revalidations of a game that did not move get a 304, as
+        with the NHL API.
+
+        Args:
+            games (list): Play-by-play payloads of whole games, with distinct ids
+            speed (float): Game clock seconds revealed per second; at 60, a 20-minute period takes 20 s
+            port (int): Port of the stand-in, on 127.0.0.1
+            start_delay (float): Seconds before the first plays of the games are revealed
+        """
+        self.stats = {"requests": 0, "not_modified": 0}
+        self._lock = threading.Lock()
+        self.replay(games, speed, start_delay)
+
+        app = Flask(__name__)
+        app.add_url_rule("/v1/gamecenter/<int:game_id>/play-by-play", view_func=self.play_by_play)
+        self.url = f"http://127.0.0.1:{port}/v1"
+        self.server = make_server("127.0.0.1", port, app, threaded=True, request_handler=QuietRequestHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def replay(self, games: list, speed: float, start_delay: float = 0.0):
+        """Replaces the games served with `games`, all starting `start_delay` seconds from now"""
+        started = time.monotonic() + start_delay
+        with self._lock:
+            self.started = started
+            self.replays = {game["id"]: GameReplay(game, speed, started) for game in games}
+            # Last (number of plays, JSON body) served per game, so polls between two plays do not encode it again
+            self._bodies = {}
+
+    def play_by_play(self, game_id: int):
+        replay = self.replays.get(game_id)
+        if replay is None:
+            return {"message": f"Game {game_id} not found"}, 404
+        n_plays = replay.revealed()
+        etag = f"{game_id}-{n_plays}"
+        with self._lock:
+            self.stats["requests"] += 1
+            if request.if_none_match.contains(etag):
+                self.stats["not_modified"] += 1
+                return "", 304, {"ETag": f'"{etag}"'}
+            cached = self._bodies.get(game_id)
+        if cached is None or cached[0] != n_plays:
+            cached = self._bodies[game_id] = (n_plays, json.dumps(replay.payload(n_plays)))
+        return cached[1], 200, {"Content-Type": "application/json", "ETag": f'"{etag}"'}
+
+    @property
+    def ends_at(self) -> float:
+        return max((replay.ends_at for replay in self.replays.values()), default=self.started)
+
+    def shutdown(self):
+        self.server.shutdown()
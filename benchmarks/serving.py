@@ -0,0 +1,55 @@
+"""
+Loads `serving/app.py` in-process with a logistic regression trained on synthetic shots, so the
+serving benchmarks run offline and never reach the W&B registry.
+"""
+import importlib
+import os
+from pathlib import Path
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+
+SERVING_DIR = Path(__file__).parent.parent / "serving"
+# PYTHONPATH of a service started from a scratch directory: its flat modules, and the root of the repo
+# for the client package (imported by app.py for metrics.py, and by games.py)
+SERVING_PYTHONPATH = os.pathsep.join([str(SERVING_DIR), str(SERVING_DIR.parent)])
+DEFAULT_MODEL_FILE = "logistic_regression_distance1.pkl"
+
+
+def make_shots(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "shotDistance": np.round(rng.uniform(0, 190, n_rows), 1),
+        "shotAngle": rng.uniform(0, 180, n_rows),
+    })
+
+
+def make_model(features: list = None, seed: int = 0) -> LogisticRegression:
+    features = features or ["shotDistance"]
+    X = make_shots(5000, seed)[features]
+    y = (np.random.default_rng(seed).random(len(X)) < 1 / (1 + np.exp(X["shotDistance"] / 20 - 1))).astype(int)
+    return LogisticRegression().fit(X, y)
+
+
+def make_workdir(model=None, workdir: str = None) -> Path:
+    """Scratch directory to run serving/app.py from, whose models/ holds `model` as the default model"""
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="ift6758-serving-"))
+    (workdir / "models").mkdir(parents=True, exist_ok=True)
+    joblib.dump(model if model is not None else make_model(), workdir / "models" / DEFAULT_MODEL_FILE)
+    return workdir
+
+
+def import_app(features: list = None, workdir: str = None):
+    """Imports serving/app.py from a scratch directory whose models/ holds the default model"""
+    workdir = make_workdir(make_model(features), workdir)
+
+    os.chdir(workdir)
+    os.environ.setdefault("FLASK_LOG", str(workdir / "flask.log"))
+    if str(SERVING_DIR) not in sys.path:
+        sys.path.insert(0, str(SERVING_DIR))
+    return importlib.import_module("app")
@@ -0,0 +1,84 @@
+"""
+Synthetic NHL play-by-play payloads and shot frames for the benchmark scripts, so they can run
+without network access or the Milestone 2 datasets.
+"""
+import random
+
+import numpy as np
+import pandas as pd
+
+
+EVENT_TYPES = ["faceoff", "hit", "shot-on-goal", "missed-shot", "blocked-shot", "giveaway", "goal",
+               "stoppage", "takeaway"]
+SITUATION_CODES = ["1551", "1541", "1451", "0651", "1560", "1441", "1331", "1550"]
+HOME_TEAM_ID = 10
+AWAY_TEAM_ID = 20
+
+
+def make_game(game_id: int = 2023020001, n_plays: int = 320, seed: int = 0) -> dict:
+    """Builds a play-by-play payload shaped like api-web.nhle.com/v1/gamecenter/<id>/play-by-play"""
+    rnd = random.Random(seed)
+    roster = [{"playerId": 100 + i, "teamId": HOME_TEAM_ID if i < 20 else AWAY_TEAM_ID,
+               "firstName": {"default": f"First{i}"}, "lastName": {"default": f"Last{i}"}} for i in range(40)]
+
+    plays = []
+    period, seconds = 1, 0
+    for event_id in range(n_plays):
+        if 1 + event_id * 3 // n_plays != period:
+            period, seconds = period + 1, 0
+        seconds = min(seconds + rnd.randint(0, 15), 1199)
+        event_type = rnd.choice(EVENT_TYPES) if event_id else "shot-on-goal"
+        owner = HOME_TEAM_ID if event_id == 0 else rnd.choice([HOME_TEAM_ID, AWAY_TEAM_ID])
+
+        details = {}
+        if event_type != "stoppage":
+            details = {"xCoord": rnd.randint(-99, 99), "yCoord": rnd.randint(-42, 42),
+                       "zoneCode": "O" if event_id == 0 else rnd.choice(["O", "D", "N"]),
+                       "eventOwnerTeamId": owner}
+        if event_type in ("shot-on-goal", "goal"):
+            details.update({"shootingPlayerId": rnd.choice(roster)["playerId"],
+                            "goalieInNetId": rnd.choice([101, 121]),
+                            "shotType": rnd.choice(["wrist", "snap", "slap", "backhand"])})
+
+        plays.append({
+            "eventId": event_id,
+            "periodDescriptor": {"number": period, "periodType": "REG", "maxRegulationPeriods": 3},
+            "timeInPeriod": f"{seconds // 60:02d}:{seconds % 60:02d}",
+            "situationCode": rnd.choice(SITUATION_CODES),
+            "typeDescKey": event_type,
+            "details": details,
+        })
+
+    return {
+        "id": game_id,
+        "gameState": "LIVE",
+        "homeTeam": {"id": HOME_TEAM_ID, "commonName": {"default": "Home"}, "score": 0},
+        "awayTeam": {"id": AWAY_TEAM_ID, "commonName": {"default": "Away"}, "score": 0},
+        "periodDescriptor": {"number": 3},
+        "clock": {"timeRemaining": "00:00"},
+        "rosterSpots": roster,
+        "plays": plays,
+    }
+
+
+def make_shot_frame(n_shots: int, seed: int = 0) -> pd.DataFrame:
+    """Builds the pre-`zoneshoot` columns of a multi-season shot frame"""
+    rng = np.random.default_rng(seed)
+    previous_x = rng.integers(-99, 100, n_shots).astype(float)
+    previous_x[rng.random(n_shots) < 0.05] = np.nan
+    df = pd.DataFrame({
+        'idGame': 2016020001 + rng.integers(0, 4 * 1271, n_shots),
+        'numberPeriod': rng.integers(1, 5, n_shots),
+        'eventOwnerTeam': rng.choice(["Home", "Away"], n_shots),
+        'gameSeconds': rng.integers(0, 3900, n_shots),
+        'previousEventType': rng.choice(EVENT_TYPES, n_shots),
+        'timeSinceLastEvent': rng.integers(0, 60, n_shots).astype(float),
+        'previousXCoord': previous_x,
+        'previousYCoord': rng.integers(-42, 43, n_shots).astype(float),
+        'xCoord': rng.integers(-99, 100, n_shots),
+        'yCoord': rng.integers(-42, 43, n_shots),
+        'zoneShoot': rng.choice(["O", "D", "N"], n_shots),
+        'teamSide': rng.choice(["home", "away"], n_shots),
+    })
+    df.loc[0, ['zoneShoot', 'teamSide']] = ['O', 'home']
+    return df
@@ -3,5 +3,9 @@
 # Define the image tag
 IMAGE_TAG="ift6758/serving:latest"
 
-# Build the Docker image
-docker build -t $IMAGE_TAG -f Dockerfile.serving .
\ No newline at end of file
+# Build the Docker image, baking the default model into it when WANDB_API_KEY is set
+if [ -n "$WANDB_API_KEY" ]; then
+    docker build --secret id=wandb_api_key,env=WANDB_API_KEY -t $IMAGE_TAG -f Dockerfile.serving .
+else
+    docker build -t $IMAGE_TAG -f Dockerfile.serving .
+fi
\ No newline at end of file
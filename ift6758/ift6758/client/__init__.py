@@ -1 +1,6 @@
-from ift6758.ift6758.client.serving_client import ServingClient
\ No newline at end of file
+def __getattr__(name):
+    # Imported on first use, so modules such as .metrics (used by the serving app) load without pandas
+    if name == "ServingClient":
+        from ift6758.ift6758.client.serving_client import ServingClient
+        return ServingClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
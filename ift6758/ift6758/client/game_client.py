@@ -1,42 +1,38 @@
 from collections import defaultdict
 import json
-import requests
 import pandas as pd
 import logging
 import numpy as np
 
+from .features import home_initial_side, shot_features, situation_features
+from .metrics import Metrics, client_metrics
+from .nhl_api import PlayByPlayFetcher
+from .shot_schema import enforce_schema
+
 
 logger = logging.getLogger(__name__)
 
 
 class GameClient:
-    def __init__(self, ip: str = "0.0.0.0", port: int = 5000):
+    def __init__(self, ip: str = "0.0.0.0", port: int = 5000, fetcher: PlayByPlayFetcher = None,
+                 metrics: Metrics = client_metrics):
         self.base_url = f"http://{ip}:{port}"
         logger.info(f"Initializing client; base URL: {self.base_url}")
         self.pointers = defaultdict(int)
-        self.pointer = 0
+        self.states = {}
+        self.fetcher = fetcher if fetcher is not None else PlayByPlayFetcher()
+        # Timings of the fetch, parse and features stages (see metrics.py)
+        self.metrics = metrics
 
     def get_game_and_filter(self, game_id: int) -> pd.DataFrame:
-        url = f"https://api-web.nhle.com/v1/gamecenter/{game_id}/play-by-play"
-        response = requests.get(url)
-        data = None
-        if response.status_code == 200:
-            data = response.json()
-        else:
-            print("Failed")
-
+        with self.metrics.timer("fetch"):
+            data = self.fetcher.get(game_id)
         if data is None:
+            print("Failed")
             return
-        
-        all_plays = data['plays']
-        try:
-            print("GAME FILTER ID: ", game_id)
-            print(self.pointers[game_id])
-            filtered_plays = all_plays[self.pointers[game_id]:]
-            self.pointers[game_id] = len(all_plays)
 
-            data['plays'] = filtered_plays
-            return df_convert(data)
+        try:
+            return self.update_game(data)
         except Exception as e:
             print("Error:", e)
             return 
@@ -44,19 +40,86 @@ class GameClient:
     def get_game_and_filter_from_json(self, json_game: str) -> pd.DataFrame:
         with open(json_game) as f:
             data = json.load(f)
-        
-        all_plays = data['plays']
-        try:
-            #print(self.pointer)
-            filtered_plays = all_plays[self.pointer:]
-            self.pointer = len(all_plays)
-            
-            data['plays'] = filtered_plays
 
-            return df_convert(data)
+        try:
+            return self.update_game(data)
         except:
             return 
 
+    def update_game(self, game_nhl: dict) -> pd.DataFrame:
+        """
+        Featurizes the plays of `game_nhl` that were not seen in a previous call for the same game.
+        Returns None when there are no new shots.
+        """
+        game_id = game_nhl['id']
+        if game_id not in self.states:
+            self.states[game_id] = GameState(game_nhl, self.metrics)
+        state = self.states[game_id]
+
+        new_shots = state.update(game_nhl)
+        self.pointers[game_id] = state.pointer
+        logger.debug(f"Game {game_id}: {len(new_shots)} new shots, pointer at {state.pointer}")
+
+        if new_shots.empty:
+            return
+        return new_shots
+
+    def forget_game(self, game_id):
+        """Drops the feature state of `game_id`; a later update_game featurizes it from the start"""
+        self.states.pop(game_id, None)
+        self.pointers.pop(game_id, None)
+
+
+class GameState:
+    """
+    Incremental feature state of a single game. Each call to `update` only featurizes the plays
+    appended since the previous call, carrying over the context the previous-event and offensive
+    pressure features need, so that the concatenated results match `df_convert` on the full game.
+    """
+    def __init__(self, game_nhl: dict, metrics: Metrics = client_metrics):
+        self.game_id = game_nhl['id']
+        self.metrics = metrics
+        self.df_players = get_player(game_nhl)
+        self.df_teams = get_teams(game_nhl)
+        self.home_team_initial_side = None
+        self.last_play = None
+        self.last_shot_seconds = {}
+        self.pointer = 0
+
+    def update(self, game_nhl: dict) -> pd.DataFrame:
+        all_plays = game_nhl['plays']
+        new_plays = all_plays[self.pointer:]
+        if not new_plays:
+            return pd.DataFrame()
+
+        with self.metrics.timer("parse"):
+            clean_df = parse_shots(self.game_id, new_plays, self.last_play)
+            if not clean_df.empty:
+                clean_df = ing_shots(clean_df, self.df_players, self.df_teams)
+        if clean_df.empty:
+            self._commit(all_plays)
+            return pd.DataFrame()
+
+        if self.home_team_initial_side is None:
+            if not ((clean_df['zoneShoot'] == 'O') & (clean_df['teamSide'] == 'home')).any():
+                # The rink sides are unknown until the home team's first offensive zone shot; these
+                # plays are featurized again on the next update.
+                return pd.DataFrame()
+            self.home_team_initial_side = home_initial_side(clean_df)
+
+        with self.metrics.timer("features"):
+            clean_df = shot_features(clean_df, self.home_team_initial_side, self.last_shot_seconds)
+        clean_df.drop('situationCode', axis=1, inplace=True)
+        self.metrics.inc("shots_total", len(clean_df))
+
+        self.last_shot_seconds.update(clean_df.groupby('eventOwnerTeam')['gameSeconds'].last().to_dict())
+        self._commit(all_plays)
+        return enforce_schema(clean_df)
+
+    def _commit(self, all_plays: list):
+        self.pointer = len(all_plays)
+        self.last_play = all_plays[-1]
+
 def get_coor(row: pd.Series, home_team_initial_side: str) -> list:
     initial_side = None
 
@@ -110,9 +173,10 @@ def v_angle(v1: np.array, v2: np.array) -> float:
     return angle_degrees
 
 
-def zoneshoot(clean_df: pd.DataFrame) -> pd.DataFrame:
+def zoneshoot(clean_df: pd.DataFrame, legacy: bool = False) -> pd.DataFrame:
+    if not legacy:
+        return shot_features(clean_df)
 
-    
     coords_list = [] 
     coords_last_event_list = []
 
@@ -249,18 +313,55 @@ def ing_event_bef(df: pd.DataFrame):
     df['timeSinceLastEvent'] = df.apply(lambda x: 0
     if pd.isnull(x['timeSinceLastEvent']) else abs(x['timeSinceLastEvent']), axis=1)
 
-    details = df_copy['details'].apply(pd.Series)
+    details = df_copy['details'].apply(pd.Series).reindex(columns=['xCoord', 'yCoord'])
     df["previousXCoord"] = details['xCoord']
     df["previousYCoord"] = details['yCoord']
 
     return df
 
-def df_convert(game_nhl: dict) -> pd.DataFrame:
+SHOT_EVENT_TYPES = ('shot-on-goal', 'goal')
+PLAY_COLUMNS = ['idGame', 'periodType', 'numberPeriod', 'situationCode', 'typeDescKey', 'details', 'gameSeconds',
+                'previousEventType', 'timeSinceLastEvent', 'previousXCoord', 'previousYCoord']
+
+
+def parse_shots(game_id: int, plays: list, previous_play: dict = None) -> pd.DataFrame:
+    """
+    Single pass over `plays` that only keeps shots, along with the context of the play preceding each
+    of them. Gives the same rows as `ing_plays` filtered on shots, without building a frame of every
+    play. `previous_play` is the play preceding `plays`, if any.
+    """
+    records = []
+    previous_type, previous_seconds, previous_details = None, None, {}
+    if previous_play is not None:
+        previous_type = previous_play['typeDescKey']
+        previous_seconds = play_seconds(previous_play)
+        previous_details = previous_play.get('details') or {}
+
+    for play in plays:
+        game_seconds = play_seconds(play)
+        if play['typeDescKey'] in SHOT_EVENT_TYPES:
+            records.append((
+                game_id, play['periodDescriptor']['periodType'], int(play['periodDescriptor']['number']),
+                play['situationCode'], play['typeDescKey'], play['details'], game_seconds, previous_type,
+                0.0 if previous_seconds is None else float(abs(game_seconds - previous_seconds)),
+                previous_details.get('xCoord', np.nan), previous_details.get('yCoord', np.nan),
+            ))
+        previous_type, previous_seconds, previous_details = play['typeDescKey'], game_seconds, play.get('details') or {}
+
+    clean_df = pd.DataFrame.from_records(records, columns=PLAY_COLUMNS)
+    clean_df[['previousXCoord', 'previousYCoord']] = clean_df[['previousXCoord', 'previousYCoord']].astype(float)
+    clean_df['previousEventType'] = clean_df['previousEventType'].astype(clean_df['typeDescKey'].dtype)
+    return clean_df
+
 
-    df_pbp = pd.DataFrame(game_nhl['plays'])
+def play_seconds(play: dict) -> int:
+    minutes, seconds = play['timeInPeriod'].split(':')
+    return int(minutes) * 60 + int(seconds) + 20 * 60 * (int(play['periodDescriptor']['number']) - 1)
 
-    df_players = get_player(game_nhl)
-    df_teams = get_teams(game_nhl)
+
+def ing_plays(game_id: int, plays: list) -> pd.DataFrame:
+
+    df_pbp = pd.DataFrame(plays)
 
     clean_df = pd.DataFrame(df_pbp[['periodDescriptor', 'timeInPeriod', 'situationCode',
                                     'typeDescKey', 'details']])
@@ -268,17 +369,20 @@ def df_convert(game_nhl: dict) -> pd.DataFrame:
     df_period = ing_period(clean_df)
     clean_df.drop('periodDescriptor', axis=1, inplace=True)
 
-    clean_df.insert(0, 'idGame', game_nhl['id'])
+    clean_df.insert(0, 'idGame', game_id)
     clean_df.insert(1, 'periodType', df_period['periodType'])
     clean_df.insert(3, 'numberPeriod', df_period['numberPeriod'])
 
     clean_df['gameSeconds'] = time_convert(clean_df, 'timeInPeriod')
     clean_df.drop('timeInPeriod', axis=1, inplace=True)
 
-    clean_df = ing_event_bef(clean_df)
+    return ing_event_bef(clean_df)
 
-    clean_df = clean_df[(clean_df['typeDescKey'] == 'shot-on-goal') | (clean_df['typeDescKey'] == 'goal')].reset_index(
-        drop=True)
+
+def ing_shots(clean_df: pd.DataFrame, df_players: pd.DataFrame, df_teams: pd.DataFrame,
+              legacy: bool = False) -> pd.DataFrame:
+
+    clean_df = clean_df[clean_df['typeDescKey'].isin(SHOT_EVENT_TYPES)].reset_index(drop=True)
 
     df_details = ing_event(clean_df, df_players)
     clean_df.drop('details', axis=1, inplace=True)
@@ -294,12 +398,35 @@ def df_convert(game_nhl: dict) -> pd.DataFrame:
     clean_df.insert(5, 'eventOwnerTeam', df_details['teamName'])
     clean_df['teamSide'] = df_details['teamSide']
 
-    clean_df['emptyGoalNet'] = empty_goal_func(clean_df).astype(int)
-    clean_df['isGoalAdvantage'] = goal_situation(clean_df)
+    if legacy:
+        clean_df['emptyGoalNet'] = empty_goal_func(clean_df).astype(int)
+        clean_df['isGoalAdvantage'] = goal_situation(clean_df)
+    else:
+        empty_net, advantage, strength = situation_features(clean_df['situationCode'], clean_df['teamSide'])
+        clean_df['emptyGoalNet'] = empty_net
+        clean_df['isGoalAdvantage'] = advantage
+        clean_df['strength'] = strength
 
     clean_df['isGoal'] = clean_df['typeDescKey'].apply(lambda x: 1 if x == 'goal' else 0)
 
-    clean_df = zoneshoot(clean_df)
+    return clean_df
+
+
+def df_convert(game_nhl: dict, legacy: bool = False) -> pd.DataFrame:
+
+    df_players = get_player(game_nhl)
+    df_teams = get_teams(game_nhl)
+
+    with client_metrics.timer("parse"):
+        if legacy:
+            clean_df = ing_plays(game_nhl['id'], game_nhl['plays'])
+        else:
+            clean_df = parse_shots(game_nhl['id'], game_nhl['plays'])
+        clean_df = ing_shots(clean_df, df_players, df_teams, legacy=legacy)
+
+    with client_metrics.timer("features"):
+        clean_df = zoneshoot(clean_df, legacy=legacy)
 
     clean_df.drop('situationCode', axis=1, inplace=True)
-    return clean_df
+    # The legacy path returns the frame of the original implementation, without the schema
+    return clean_df if legacy else enforce_schema(clean_df)
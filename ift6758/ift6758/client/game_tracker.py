@@ -0,0 +1,167 @@
+from collections import defaultdict
+import asyncio
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .game_client import GameClient
+from .nhl_api import FINAL_GAME_STATES
+from .serving_client import ServingClient
+from .shot_store import ShotStore
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two polls of a game, depending on its status
+POLL_INTERVALS = {"live": 10.0, "intermission": 60.0, "pregame": 120.0, "final": 600.0}
+PREGAME_STATES = ("FUT", "PRE")
+
+
+def game_status(game_nhl: dict) -> str:
+    if game_nhl.get("gameState") in FINAL_GAME_STATES:
+        return "final"
+    if game_nhl.get("gameState") in PREGAME_STATES:
+        return "pregame"
+    if game_nhl.get("clock", {}).get("inIntermission"):
+        return "intermission"
+    return "live"
+
+
+class GameTracker:
+    def __init__(self, game_ids: list, game_client: GameClient = None, serving_client: ServingClient = None,
+                 max_concurrency: int = 8, poll_intervals: dict = None, callback=None):
+        """
+        Follows several games at once. Each tick fetches the games that are due concurrently (at most
+        `max_concurrency` at a time), featurizes their new plays through `game_client` (so the
+        per-game pointers in `GameClient.pointers` keep advancing), and scores the new shots of all
+        games with a single request to the prediction service. When that request fails, the shots
+        are kept pending (see `unscored`) and sent again with those of the next tick, so the running
+        xG of a game never misses them.
+
+        Args:
+            game_ids (list): Games to follow; more can be added with `add_game`
+            game_client (GameClient): Client holding the fetcher and the per-game feature state
+            serving_client (ServingClient): Client of the prediction service
+            max_concurrency (int): Maximum number of games fetched and featurized in parallel
+            poll_intervals (dict): Overrides of POLL_INTERVALS
+            callback (callable): Called as callback(game_id, shots) for every game with new shots
+        """
+        self.game_client = game_client if game_client is not None else GameClient()
+        self.serving_client = serving_client if serving_client is not None else ServingClient()
+        self.poll_intervals = dict(POLL_INTERVALS, **(poll_intervals or {}))
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.callback = callback
+
+        self.next_poll = {}
+        self.status = {}
+        # Last play-by-play fetched of each game
+        self.games = {}
+        # Scored shots of each game, with running xG totals per team; appended under `lock`, which
+        # other threads hold to read them while the tracker runs
+        self.stores = defaultdict(ShotStore)
+        self.lock = threading.Lock()
+        # Shots of each game whose prediction failed, to score again at the next tick
+        self.pending = {}
+        for game_id in game_ids:
+            self.add_game(game_id)
+
+    @property
+    def xg(self) -> dict:
+        """Expected goals so far, as {game id: {team: xG}}"""
+        return {game_id: store.xg for game_id, store in self.stores.items()}
+
+    @property
+    def unscored(self) -> dict:
+        """Number of shots waiting for a successful prediction, as {game id: shots}"""
+        return {game_id: len(shots) for game_id, shots in self.pending.items()}
+
+    def add_game(self, game_id):
+        self.next_poll[game_id] = time.monotonic()
+
+    def remove_game(self, game_id):
+        self.next_poll.pop(game_id, None)
+        self.pending.pop(game_id, None)
+
+    def forget_game(self, game_id):
+        """Removes `game_id` and drops everything kept about it: its shots, last payload and feature state"""
+        self.remove_game(game_id)
+        with self.lock:
+            self.stores.pop(game_id, None)
+            self.games.pop(game_id, None)
+        self.status.pop(game_id, None)
+        self.game_client.forget_game(game_id)
+
+    async def run(self, ticks: int = None):
+        """Polls until every game is removed, or for `ticks` ticks"""
+        count = 0
+        while self.next_poll and (ticks is None or count < ticks):
+            await self.tick()
+            count += 1
+            if self.next_poll:
+                await asyncio.sleep(max(0.0, min(self.next_poll.values()) - time.monotonic()))
+
+    async def tick(self) -> dict:
+        """
+        Polls the games that are due and returns their new shots, with their probability of being a
+        goal, along with the shots of previous ticks whose prediction failed
+        """
+        now = time.monotonic()
+        due = [game_id for game_id, next_poll in self.next_poll.items() if next_poll <= now]
+        results = await asyncio.gather(*(self._poll(game_id) for game_id in due))
+
+        new_shots = {game_id: shots for game_id, shots in zip(due, results) if shots is not None}
+        # Shots left unscored by a failed prediction come first, in the order of the game
+        for game_id, shots in self.pending.items():
+            new_shots[game_id] = pd.concat([shots, new_shots[game_id]], ignore_index=True) if game_id in new_shots else shots
+        self.pending = {}
+        if new_shots:
+            new_shots = await self._predict(new_shots)
+            if self.callback is not None:
+                for game_id, shots in new_shots.items():
+                    self.callback(game_id, shots)
+        return new_shots
+
+    async def _poll(self, game_id) -> pd.DataFrame:
+        async with self.semaphore:
+            game_nhl = await asyncio.to_thread(self.game_client.fetcher.get, game_id)
+            if game_nhl is None:
+                self._schedule(game_id, "live")
+                return
+            self.games[game_id] = game_nhl
+            try:
+                shots = await asyncio.to_thread(self.game_client.update_game, game_nhl)
+            except Exception as e:
+                logger.error(f"Failed to featurize game {game_id}: {e}")
+                shots = None
+
+        self._schedule(game_id, game_status(game_nhl))
+        return shots
+
+    def _schedule(self, game_id, status: str):
+        self.status[game_id] = status
+        if game_id in self.next_poll:
+            self.next_poll[game_id] = time.monotonic() + self.poll_intervals[status]
+
+    async def _predict(self, new_shots: dict) -> dict:
+        """Scores and stores `new_shots`; returns them, or keeps them pending and returns {} on failure"""
+        frames = list(new_shots.values())
+        combined = pd.concat(frames, ignore_index=True)
+
+        # Rows with missing features are left unscored (NaN), the predictions being aligned with the shots
+        try:
+            response = await asyncio.to_thread(self.serving_client.predict, combined)
+            probability = response["probability"].to_numpy()
+        except Exception as e:
+            logger.error(f"Prediction failed for games {list(new_shots)}, retrying at the next tick: {e}")
+            self.pending = new_shots
+            return {}
+
+        offsets = np.cumsum([0] + [len(shots) for shots in frames])
+        for (game_id, shots), start, end in zip(new_shots.items(), offsets[:-1], offsets[1:]):
+            shots["probability"] = probability[start:end]
+            with self.lock:
+                self.stores[game_id].append(shots)
+        return new_shots
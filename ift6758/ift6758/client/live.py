@@ -0,0 +1,280 @@
+"""
+Live xG updates pushed to dashboards instead of pulled by them: a single background refresher follows
+the games being watched with a GameTracker (one fetch, featurization and prediction per game and
+poll, whatever the number of viewers) and pushes per-game deltas to the subscribers of each game:
+
+    {"game_id": 2023020001, "seq": 12,
+     "game": {"home_team": ..., "away_team": ..., "period": 2, "time_remaining": "12:34",
+              "home_score": 1, "away_score": 0, "status": "live"},
+     "shots": {column: [values of the new shots], ...},   # with their "probability"
+     "xg": {team: running xG}}
+
+The first delta of a subscription is a snapshot with every shot scored so far. A game is no longer
+polled once it is final, only its shots and header being kept for later snapshots, and the games
+without subscribers are dropped beyond `max_games`, the least recently followed first. Subscribers
+in the same process (the Streamlit dashboard) pass a callback to `LiveGames.subscribe`; others
+connect to the server-sent events stream of `sse_app`, GET /games/<id>/events, e.g. from a
+browser's EventSource.
+Run the stream on its own with:
+
+    $ python -m ift6758.ift6758.client.live [--port 8502] [--serving-ip serving]
+"""
+import argparse
+import asyncio
+from collections import OrderedDict
+import json
+import logging
+import queue
+import threading
+import time
+
+from .game_client import GameClient
+from .game_tracker import GameTracker, game_status
+from .serving_client import ServingClient
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two comments sent on an idle event stream, so proxies do not close it
+HEARTBEAT_SECONDS = 15.0
+
+
+def game_header(game_nhl: dict) -> dict:
+    """Teams, score, period and clock of a play-by-play payload"""
+    if game_nhl is None:
+        return None
+    return {
+        "home_team": game_nhl["homeTeam"]["commonName"]["default"],
+        "away_team": game_nhl["awayTeam"]["commonName"]["default"],
+        "period": game_nhl.get("periodDescriptor", {}).get("number"),
+        "time_remaining": game_nhl.get("clock", {}).get("timeRemaining"),
+        "home_score": game_nhl["homeTeam"].get("score", 0),
+        "away_score": game_nhl["awayTeam"].get("score", 0),
+        "status": game_status(game_nhl),
+    }
+
+
+class LiveGames:
+    def __init__(self, game_client: GameClient = None, serving_client: ServingClient = None,
+                 poll_intervals: dict = None, max_concurrency: int = 8, max_games: int = 32):
+        """
+        Background refresher of the games followed, started by the first `follow`. Games are polled
+        at the intervals of the GameTracker for their status (live, intermission, ...) until they are
+        final, and a delta is pushed to the subscribers of a game whenever it has new shots or its
+        score or clock moved. At most `max_games` games are kept, those without subscribers being
+        dropped (see `unfollow`) the least recently followed first.
+
+        Args:
+            game_client (GameClient): Client holding the fetcher and the per-game feature state
+            serving_client (ServingClient): Client of the prediction service
+            poll_intervals (dict): Overrides of game_tracker.POLL_INTERVALS
+            max_concurrency (int): Maximum number of games fetched and featurized in parallel
+            max_games (int): Number of games kept, unless more have subscribers
+        """
+        self.tracker = GameTracker([], game_client, serving_client, max_concurrency, poll_intervals)
+        self.max_games = max_games
+        self.seq = 0
+        self._headers = {}
+        self._subscribers = {}
+        # Games kept, least recently followed first, and those of them that are final (no longer polled)
+        self._kept = OrderedDict()
+        self._final = set()
+        # Serializes deliveries, so a subscriber never gets a delta before its snapshot
+        self._deliver_lock = threading.Lock()
+        # ("follow" | "unfollow", game id) to apply to the tracker, which only its own thread touches
+        self._changes = queue.SimpleQueue()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def lock(self) -> threading.Lock:
+        """Held while shots are appended; hold it to read `store` from another thread"""
+        return self.tracker.lock
+
+    def store(self, game_id):
+        """ShotStore of the scored shots of `game_id`, None before its first shots"""
+        return self.tracker.stores.get(game_id)
+
+    def follow(self, game_id):
+        """Starts following `game_id` (and the refresher, if need be); following it again is a no-op"""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="live-games", daemon=True)
+                self._thread.start()
+        self._changes.put(("follow", game_id))
+        self._wake.set()
+
+    def unfollow(self, game_id):
+        """
+        Stops following `game_id` and drops its shots and state; its subscribers, if any, get no
+        more deltas until it is followed again
+        """
+        self._changes.put(("unfollow", game_id))
+        self._wake.set()
+
+    def subscribe(self, game_id, callback):
+        """
+        Follows `game_id` and calls `callback(delta)` with a snapshot of the game, then with each
+        delta, from the refresher's thread; returns a function cancelling the subscription. A
+        callback that raises is unsubscribed, so one of a closed session does not pile up deltas.
+        """
+        token = object()
+        with self._deliver_lock:
+            with self.lock:
+                snapshot = self._delta(game_id, 0)
+                self._subscribers.setdefault(game_id, {})[token] = callback
+            if snapshot["game"] is not None:
+                callback(snapshot)
+        self.follow(game_id)
+
+        def unsubscribe():
+            with self.lock:
+                self._subscribers.get(game_id, {}).pop(token, None)
+        return unsubscribe
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        asyncio.run(self._loop())
+
+    async def _loop(self):
+        tracker = self.tracker
+        while not self._stop.is_set():
+            while not self._changes.empty():
+                change, game_id = self._changes.get()
+                if change == "unfollow":
+                    self._forget(game_id)
+                    continue
+                self._kept[game_id] = None
+                self._kept.move_to_end(game_id)
+                if game_id not in tracker.next_poll and game_id not in self._final:
+                    tracker.add_game(game_id)
+            self._evict()
+
+            sizes = {game_id: len(store) for game_id, store in tracker.stores.items()}
+            try:
+                new_shots = await tracker.tick()
+            except Exception as e:
+                logger.error(f"Failed to refresh games {list(tracker.next_poll)}: {e}")
+                new_shots = {}
+            for game_id in list(tracker.next_poll):
+                header = game_header(tracker.games.get(game_id))
+                if game_id in new_shots or (header is not None and header != self._headers.get(game_id)):
+                    self._headers[game_id] = header
+                    self._publish(game_id, sizes.get(game_id, 0))
+                if tracker.status.get(game_id) == "final" and game_id not in tracker.pending:
+                    self._retire(game_id)
+
+            # Sleeps until the next game is due, or a game is followed
+            wait = min(tracker.next_poll.values(), default=time.monotonic() + 60.0) - time.monotonic()
+            await asyncio.to_thread(self._wake.wait, max(0.0, wait))
+            self._wake.clear()
+
+    def _retire(self, game_id):
+        """Stops polling a final game, keeping only its shots and header"""
+        self.tracker.remove_game(game_id)
+        with self.lock:
+            self.tracker.games.pop(game_id, None)
+        self.tracker.game_client.forget_game(game_id)
+        self._final.add(game_id)
+
+    def _forget(self, game_id):
+        self.tracker.forget_game(game_id)
+        self._headers.pop(game_id, None)
+        with self.lock:
+            if not self._subscribers.get(game_id):
+                self._subscribers.pop(game_id, None)
+        self._final.discard(game_id)
+        self._kept.pop(game_id, None)
+
+    def _evict(self):
+        """Drops the least recently followed games without subscribers beyond `max_games`"""
+        with self.lock:
+            unwatched = [game_id for game_id in self._kept if not self._subscribers.get(game_id)]
+        for game_id in unwatched[:max(0, len(self._kept) - self.max_games)]:
+            logger.info(f"Dropped game {game_id}, not watched by anyone")
+            self._forget(game_id)
+
+    def _publish(self, game_id, start: int):
+        """Pushes the shots of `game_id` from the `start`-th one on, with its header and xG"""
+        with self._deliver_lock:
+            with self.lock:
+                self.seq += 1
+                delta = self._delta(game_id, start)
+                subscribers = list(self._subscribers.get(game_id, {}).items())
+            for token, callback in subscribers:
+                try:
+                    callback(delta)
+                except Exception as e:
+                    logger.info(f"Dropped a subscriber of game {game_id}: {e!r}")
+                    with self.lock:
+                        self._subscribers[game_id].pop(token, None)
+
+    def _delta(self, game_id, start: int) -> dict:
+        store = self.tracker.stores.get(game_id)
+        game_nhl = self.tracker.games.get(game_id)
+        return {
+            "game_id": game_id,
+            "seq": self.seq,
+            # The payload of a final game is dropped once its last delta is published
+            "game": game_header(game_nhl) if game_nhl is not None else self._headers.get(game_id),
+            "shots": store.to_columns(start) if store is not None else {},
+            "xg": dict(store.xg) if store is not None else {},
+        }
+
+
+def sse_event(delta: dict) -> str:
+    return f"id: {delta['seq']}\nevent: delta\ndata: {json.dumps(delta)}\n\n"
+
+
+def sse_app(live: LiveGames):
+    """ASGI app streaming the deltas of a game as server-sent events, at GET /games/<id>/events"""
+    from starlette.applications import Starlette
+    from starlette.responses import StreamingResponse
+    from starlette.routing import Route
+
+    async def events(request):
+        game_id = request.path_params["game_id"]
+        loop = asyncio.get_running_loop()
+        deltas = asyncio.Queue()
+        unsubscribe = live.subscribe(game_id, lambda delta: loop.call_soon_threadsafe(deltas.put_nowait, delta))
+
+        async def stream():
+            try:
+                while True:
+                    try:
+                        delta = await asyncio.wait_for(deltas.get(), HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield sse_event(delta)
+            finally:
+                unsubscribe()
+
+        return StreamingResponse(stream(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    return Starlette(routes=[Route("/games/{game_id:int}/events", events)])
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--serving-ip", default="serving")
+    parser.add_argument("--serving-port", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serving_client = ServingClient(args.serving_ip, args.serving_port)
+    serving_client.model_info()
+    live = LiveGames(GameClient(args.serving_ip, args.serving_port), serving_client)
+    uvicorn.run(sse_app(live), host=args.host, port=args.port)
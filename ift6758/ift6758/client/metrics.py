@@ -0,0 +1,154 @@
+"""
+Lightweight in-process metrics: counters and latency histograms, a `timer` usable as a context
+manager or a decorator, and rendering in the Prometheus text exposition format.
+
+`client_metrics` collects the stages of the clients (fetch, parse, features, predict request) of this
+process. The serving app (serving/app.py) has its own `Metrics`, exposed on /metrics: they are per
+process, so with several gunicorn workers each scrape reports the worker that handled it.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ContextDecorator
+import threading
+import time
+
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile"""
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank and seen > 0:
+                return bound
+        return float("nan")
+
+
+class Timer(ContextDecorator):
+    def __init__(self, metrics, key: tuple):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics._observe(self.key, time.perf_counter() - self.start)
+        return False
+
+    def _recreate_cm(self):
+        # Used as a decorator, each call gets its own timer, so concurrent calls do not share `start`
+        return Timer(self.metrics, self.key)
+
+
+class Metrics:
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.counters = defaultdict(float)
+        self.histograms = defaultdict(Histogram)
+        self._lock = threading.Lock()
+        # Keys of the timers, built once per stage rather than on every timed call
+        self._timer_keys = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = metric_key(name, labels)
+        with self._lock:
+            self.counters[key] += value
+
+    def observe(self, name: str, value: float, **labels):
+        self._observe(metric_key(name, labels), value)
+
+    def _observe(self, key: tuple, value: float):
+        with self._lock:
+            self.histograms[key].observe(value)
+
+    def timer(self, stage: str, name: str = "stage_seconds") -> Timer:
+        """
+        Times a block or a function into the `name` histogram, labelled with the stage:
+
+            with metrics.timer("decode"):
+                ...
+
+            @metrics.timer("fetch")
+            def fetch(...):
+        """
+        key = self._timer_keys.get((name, stage))
+        if key is None:
+            key = self._timer_keys[(name, stage)] = metric_key(name, {"stage": stage})
+        return Timer(self, key)
+
+    def snapshot(self) -> dict:
+        """Counters and histogram summaries (count, sum, p50, p99), keyed by name and labels"""
+        with self._lock:
+            return {
+                "counters": {format_key(name, labels): value for (name, labels), value in self.counters.items()},
+                "histograms": {
+                    format_key(name, labels): {"count": h.count, "sum": h.sum, "p50": h.quantile(0.5),
+                                               "p99": h.quantile(0.99)}
+                    for (name, labels), h in self.histograms.items()
+                },
+            }
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self.counters}):
+                metric = f"{self.namespace}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for (counter, labels), value in sorted(self.counters.items()):
+                    if counter == name:
+                        lines.append(f"{metric}{format_labels(labels)} {value}")
+
+            for name in sorted({name for name, _ in self.histograms}):
+                metric = f"{self.namespace}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for (histogram, labels), h in sorted(self.histograms.items()):
+                    if histogram != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(h.buckets + (float("inf"),), h.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{metric}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{metric}_sum{format_labels(labels)} {h.sum}")
+                    lines.append(f"{metric}_count{format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def metric_key(name: str, labels: dict) -> tuple:
+    """(name, sorted (label, value) pairs), the key of a counter or histogram"""
+    if not labels:
+        return name, ()
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def format_key(name: str, labels: tuple) -> str:
+    return name + format_labels(labels)
+
+
+client_metrics = Metrics("xg_client")
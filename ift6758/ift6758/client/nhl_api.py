@@ -0,0 +1,186 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+NHL_API_URL = "https://api-web.nhle.com/v1"
+FINAL_GAME_STATES = ("FINAL", "OFF")
+
+
+class PlayByPlayFetcher:
+    def __init__(self, base_url: str = NHL_API_URL, ttl: float = 5.0, cache_dir: str = None,
+                 pool_size: int = 16, timeout: float = 10.0, max_games: int = 64):
+        """
+        Fetches and caches NHL play-by-play payloads. Payloads are kept in memory for `ttl` seconds
+        (forever once the game is final), then revalidated with ETag / If-Modified-Since. When
+        `cache_dir` (or the NHL_CACHE_DIR environment variable) is set, payloads are also kept on
+        disk so that a restarted process only needs to revalidate them. At most `max_games` payloads
+        are kept in memory, the least recently requested being evicted (and read back from the disk
+        cache, if any, when requested again), so a long-lived fetcher does not keep every game.
+
+        Args:
+            base_url (str): Root of the NHL web API, overridable to point at a local stand-in
+            ttl (float): Seconds during which a cached payload is served without any request
+            cache_dir (str): Directory of the on-disk cache; disabled if None and NHL_CACHE_DIR is unset
+            pool_size (int): Number of pooled connections kept per host
+            timeout (float): Timeout of each request, in seconds
+            max_games (int): Number of payloads kept in memory
+        """
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_games = max_games
+
+        cache_dir = cache_dir or os.environ.get("NHL_CACHE_DIR")
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "errors": 0}
+        self._entries = OrderedDict()
+        # Lock of each game being fetched, with the number of callers holding or waiting for it
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, game_id) -> dict:
+        """
+        Returns the parsed play-by-play of `game_id`, or None if it could not be fetched. The same
+        dict is returned to every caller until the payload changes, so callers must not modify it.
+        """
+        key = str(game_id)
+        with self._game_lock(key):
+            entry = self._lookup(key) or self._load(key)
+            if entry is not None and self._is_fresh(entry):
+                self._count("hits")
+                return entry["payload"]
+            return self._fetch(key, entry)
+
+    def _fetch(self, key: str, entry: dict) -> dict:
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        url = f"{self.base_url}/gamecenter/{key}/play-by-play"
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning(f"Failed to fetch {url}: {e}")
+            self._count("errors")
+            return None if entry is None else entry["payload"]
+
+        if response.status_code == 304 and entry is not None:
+            self._count("not_modified")
+            entry["fetched_at"] = time.monotonic()
+            self._remember(key, entry)
+            return entry["payload"]
+
+        if response.status_code != 200:
+            logger.warning(f"Failed to fetch {url}: HTTP {response.status_code}")
+            self._count("errors")
+            return None if entry is None else entry["payload"]
+
+        try:
+            payload = response.json()
+        except ValueError as e:
+            # A truncated or garbled body is an error like any other, not a reason to drop the cached payload
+            logger.warning(f"Failed to decode {url}: {e}")
+            self._count("errors")
+            return None if entry is None else entry["payload"]
+
+        self._count("misses")
+        entry = {
+            "payload": payload,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.monotonic(),
+        }
+        self._remember(key, entry)
+        self._save(key, entry)
+        return entry["payload"]
+
+    def _is_fresh(self, entry: dict) -> bool:
+        if entry["payload"].get("gameState") in FINAL_GAME_STATES:
+            return True
+        return time.monotonic() - entry["fetched_at"] < self.ttl
+
+    def _load(self, key: str) -> dict:
+        if self.cache_dir is None:
+            return None
+        path = self.cache_dir / f"{key}.json"
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Entries read back from disk are always revalidated, unless the game is over
+        entry["fetched_at"] = float("-inf")
+        self._remember(key, entry)
+        return entry
+
+    def _save(self, key: str, entry: dict):
+        if self.cache_dir is None:
+            return
+        path = self.cache_dir / f"{key}.json"
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({k: v for k, v in entry.items() if k != "fetched_at"}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write {path}: {e}")
+
+    def _lookup(self, key: str) -> dict:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _remember(self, key: str, entry: dict):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_games:
+                evicted, _ = self._entries.popitem(last=False)
+                logger.debug(f"Evicted game {evicted} from the in-memory cache")
+
+    @contextmanager
+    def _game_lock(self, key: str):
+        """Holds the lock of `key`, which is dropped once no caller holds or waits for it"""
+        with self._lock:
+            lock, users = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._locks[key]
+                if users == 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, users - 1)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.stats[counter] += 1
@@ -1,48 +1,207 @@
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import io
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
 import logging
 
+from .metrics import Metrics, client_metrics
+
 
 logger = logging.getLogger(__name__)
 
+NPY_MIMETYPE = "application/x-npy"
+# Responses retried (with backoff) besides connection errors: overloaded or restarting service
+RETRY_STATUSES = (429, 502, 503, 504)
+
 
 class ServingClient:
-    def __init__(self, ip: str = "serving", port: int = 5000, features=None):
+    def __init__(self, ip: str = "serving", port: int = 5000, features=None, metrics: Metrics = client_metrics,
+                 pool_size: int = 8, chunk_rows: int = 50_000, max_workers: int = 4, retries: int = 3,
+                 backoff: float = 0.2, compress_min_bytes: int = None, timeout: float = 30.0):
+        """
+        Client of the prediction service. Requests go through a pooled session, retried on connection
+        errors and on the statuses of RETRY_STATUSES; frames of more than `chunk_rows` rows are sent
+        as several requests in parallel.
+
+        Args:
+            ip (str): Host of the service
+            port (int): Port of the service
+            features (list): Features sent to /predict (replaced by those of the model by `model_info`)
+            metrics (Metrics): Where the timings of the requests are recorded (see metrics.py)
+            pool_size (int): Number of pooled connections to the service
+            chunk_rows (int): Maximum number of rows per /predict request
+            max_workers (int): Maximum number of chunks of a frame sent at once
+            retries (int): Number of retries of a failed request
+            backoff (float): Backoff factor of the retries, in seconds (0.2, 0.4, 0.8, ...)
+            compress_min_bytes (int): Request bodies at least this large are gzip-compressed (None: never),
+                worth it when the service is across a slow link rather than on the same host
+            timeout (float): Timeout of each request, in seconds
+        """
         self.base_url = f"http://{ip}:{port}"
+        # Timings of the predict requests (see metrics.py)
+        self.metrics = metrics
         logger.info(f"Initializing client; base URL: {self.base_url}")
 
         if features is None:
             features = ["shotDistance"]
         self.features = features
 
-        # any other potential initialization
+        self.chunk_rows = chunk_rows
+        self.max_workers = max_workers
+        self.compress_min_bytes = compress_min_bytes
+        self.timeout = timeout
+
+        # Scoring is idempotent, so POSTs are retried as well
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=None, raise_on_status=False)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = None
+        # (ETag, body) of the last /heatmap
+        self._heatmap = None
 
     def predict(self, X: pd.DataFrame) -> pd.DataFrame:
         """
         Formats the inputs into an appropriate payload for a POST request, and queries the
         prediction service. Retrieves the response from the server, and processes it back into a
         dataframe that corresponds index-wise to the input dataframe.
-        
+
+        The features are sent as a .npy body (gzip-compressed if large, see `compress_min_bytes`) and the probabilities come
+        back as .npy, so rows are encoded once on each side. Rows missing one of the features are
+        not sent; their prediction and probability are missing in the result.
+
         Args:
             X (Dataframe): Input dataframe to submit to the prediction service.
+
+        Returns:
+            Dataframe with the index of X, the predicted label (`prediction`) and the probability of
+            a goal (`probability`) of each row.
         """
-        X = X[self.features].dropna()
-        json_payload = X.to_json(orient='records')
-        r = requests.post(
-	        f"{self.base_url}/predict", 
-	        json=json.loads(json_payload)
-        )
+        features = X[self.features]
+        valid = features.notna().all(axis=1).to_numpy()
+        values = features[valid].to_numpy(dtype=np.float64)
+
+        probabilities = np.empty((0, 2))
+        with self.metrics.timer("predict_request"):
+            chunks = [values[start:start + self.chunk_rows] for start in range(0, len(values), self.chunk_rows)]
+            if len(chunks) == 1:
+                probabilities = self._post_chunk(chunks[0])
+            elif chunks:
+                probabilities = np.concatenate(list(self._pool().map(self._post_chunk, chunks)))
+        self.metrics.inc("predicted_rows_total", len(values))
+
+        prediction = pd.array(np.full(len(X), pd.NA), dtype="Int64")
+        probability = np.full(len(X), np.nan)
+        if len(probabilities):
+            prediction[valid] = probabilities.argmax(axis=1)
+            probability[valid] = probabilities[:, 1]
+        return pd.DataFrame({"prediction": prediction, "probability": probability}, index=X.index)
+
+    def _post_chunk(self, values: np.ndarray) -> np.ndarray:
+        """Scores one chunk of rows, returning their (n, 2) probabilities"""
+        buffer = io.BytesIO()
+        np.save(buffer, values, allow_pickle=False)
+        body = buffer.getvalue()
+        headers = {"Content-Type": NPY_MIMETYPE, "Accept": NPY_MIMETYPE, "X-Feature-Names": ",".join(self.features)}
+        if self.compress_min_bytes is not None and len(body) >= self.compress_min_bytes:
+            body = gzip.compress(body, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+
+        r = self.session.post(f"{self.base_url}/predict", data=body, headers=headers, timeout=self.timeout)
+        r.raise_for_status()
+        if r.headers.get("Content-Type", "").split(";")[0] != NPY_MIMETYPE:
+            # Failures are reported as JSON
+            raise RuntimeError(f"Prediction failed: {r.json().get('message', r.text)}")
+        return np.load(io.BytesIO(r.content), allow_pickle=False)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="serving-client")
+        return self._executor
+
+    def close(self):
+        """Closes the pooled connections and the threads sending chunks"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.session.close()
+
+    def model_info(self) -> dict:
+        """
+        Gets the feature schema of the current model of the service (feature names in the order the
+        model expects them, and their dtypes), and sends those features from then on.
+        """
+        r = self.session.get(f"{self.base_url}/model_info", timeout=self.timeout)
+        info = r.json()
+        if info.get("features"):
+            self.features = info["features"]
+        return info
+
+    def heatmap(self) -> dict:
+        """
+        Goal probability of the current model over the rink (see the /heatmap endpoint of the
+        service), or None if the model does not only depend on the shot location. The table is only
+        downloaded again once the model has changed.
+        """
+        headers = {"If-None-Match": self._heatmap[0]} if self._heatmap is not None else {}
+        r = self.session.get(f"{self.base_url}/heatmap", headers=headers, timeout=self.timeout)
+        if r.status_code == 304:
+            return self._heatmap[1]
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        self._heatmap = (r.headers.get("ETag"), r.json())
+        return self._heatmap[1]
+
+    def score_game(self, game_id: int, game_nhl: dict = None, cursor: int = 0) -> dict:
+        """
+        Has the service featurize and score a game (see the /games/<id>/score endpoint), returning
+        the shots after `cursor` with their probability of being a goal (`shots`, column-wise:
+        pd.DataFrame(response["shots"]) gives the new rows), the running xG of each team and the
+        `cursor` to pass next time.
+
+        Args:
+            game_id (int): NHL id of the game
+            game_nhl (dict): Play-by-play of the game so far; when None, the service fetches it
+            cursor (int): Number of shots already received for this game
+        """
+        url = f"{self.base_url}/games/{game_id}/score"
+        params = {"cursor": cursor}
+        with self.metrics.timer("score_game_request"):
+            if game_nhl is None:
+                r = self.session.get(url, params=params, timeout=self.timeout)
+            else:
+                r = self.session.post(url, params=params, json=game_nhl, timeout=self.timeout)
+        if not r.ok:
+            raise RuntimeError(f"Scoring game {game_id} failed: HTTP {r.status_code} {r.text}")
         return r.json()
 
-    def logs(self) -> dict:
-        """Get server logs"""
+    def logs(self, limit: int = 100, level: str = None, offset: int = None, before: int = None) -> dict:
+        """
+        Get server logs: the latest `limit` records by default, or a window of the log file (see the
+        /logs endpoint of the service).
 
-        r = requests.get(
-            f"{self.base_url}/logs"
+        Args:
+            limit (int): Maximum number of records
+            level (str): Minimum level of the records, e.g. "WARNING"
+            offset (int): Byte offset to read forward from, e.g. the `next_offset` of a previous call
+            before (int): Byte offset to read backward from, e.g. the `before_offset` of a previous call
+        """
+        params = {"limit": limit, "level": level, "offset": offset, "before": before}
+        r = self.session.get(
+            f"{self.base_url}/logs",
+            params={key: value for key, value in params.items() if value is not None},
+            timeout=self.timeout
         )
 
-        return json.loads(r.json())
+        return r.json()
 
     def download_registry_model(self, workspace: str, model: str, version: str) -> dict:
         """
@@ -59,7 +218,7 @@ class ServingClient:
             model (str): The model in the Comet ML registry to download
             version (str): The model version to download
         """
-        r = requests.post(
+        r = self.session.post(
             f"{self.base_url}/download_registry_model",
             json=json.dumps(
                 {"workspace": workspace, 
@@ -68,4 +227,7 @@ class ServingClient:
             )
         )
 
-        return r.json()
+        response = r.json()
+        if response.get("status") == "success":
+            self.model_info()
+        return response
@@ -0,0 +1,105 @@
+"""
+Declared dtypes of the shot records produced by `df_convert`: categoricals for the repeated strings,
+the smallest integer types that fit, float32 for measurements and bools for flags. A season of shots
+takes several times less memory than with object strings and 64-bit numbers, and `load_shots` reads
+saved frames (CSV or Parquet) straight into the same dtypes.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+PERIOD_TYPES = pd.CategoricalDtype(["REG", "OT", "SO"])
+SHOT_TYPES = pd.CategoricalDtype(["shot-on-goal", "missed-shot", "blocked-shot", "goal"])
+ZONES = pd.CategoricalDtype(["O", "D", "N"])
+TEAM_SIDES = pd.CategoricalDtype(["home", "away"])
+GOAL_ADVANTAGES = pd.CategoricalDtype(["Advantage", "Disadvantage", "Neutral"])
+# Skaters of the shooting team "v" skaters of the other team, for every pair of situation code digits
+STRENGTHS = pd.CategoricalDtype([f"{own}v{other}" for own in range(10) for other in range(10)])
+
+# Column -> dtype; "category" columns have an open set of values (teams, players, ...)
+SHOT_SCHEMA = {
+    'idGame': np.int32,
+    'periodType': PERIOD_TYPES,
+    'numberPeriod': np.int8,
+    'typeDescKey': SHOT_TYPES,
+    'eventOwnerTeam': "category",
+    'gameSeconds': np.int16,
+    'previousEventType': "category",
+    'timeSinceLastEvent': np.float32,
+    'previousXCoord': np.float32,
+    'previousYCoord': np.float32,
+    'xCoord': np.float32,
+    'yCoord': np.float32,
+    'zoneShoot': ZONES,
+    'shootingPlayer': "category",
+    'goaliePlayer': "category",
+    'shotType': "category",
+    'teamSide': TEAM_SIDES,
+    'emptyGoalNet': bool,
+    'isGoalAdvantage': GOAL_ADVANTAGES,
+    'strength': STRENGTHS,
+    'isGoal': bool,
+    'shotDistance': np.float32,
+    'distanceFromLastEvent': np.float32,
+    'rebound': bool,
+    'speedFromLastEvent': np.float32,
+    'shotAngle': np.float32,
+    'reboundAngleShot': np.float32,
+    'offensivePressureTime': np.float32,
+}
+
+
+def enforce_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Casts the columns of `df` declared in SHOT_SCHEMA to their dtype (other columns are left as they
+    are). Integer and bool columns holding missing values become float32 and nullable booleans
+    rather than losing them, and values outside of fixed categories become missing.
+    """
+    dtypes = {}
+    for column, dtype in SHOT_SCHEMA.items():
+        if column not in df:
+            continue
+        if isinstance(dtype, pd.CategoricalDtype) and df[column].dtype != dtype:
+            unknown = ~df[column].isin(dtype.categories) & df[column].notna()
+            if unknown.any():
+                df = df.assign(**{column: df[column].mask(unknown)})
+        elif dtype is bool and df[column].dtype != bool:
+            dtype = "boolean" if df[column].hasnans else bool
+        elif isinstance(dtype, type) and issubclass(dtype, np.integer) and df[column].hasnans:
+            dtype = np.float32
+        dtypes[column] = dtype
+    return df.astype(dtypes)
+
+
+def load_shots(path, columns: list = None) -> pd.DataFrame:
+    """
+    Reads shots saved as CSV or Parquet (a file, or a directory of Parquet files such as the output
+    of data/featurize.py) into the dtypes of SHOT_SCHEMA. Only `columns` are read when given.
+    """
+    path = Path(path)
+    if path.is_dir() or path.suffix == ".parquet":
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        df = pd.read_csv(path, usecols=columns, dtype={column: csv_dtype(dtype) for column, dtype in SHOT_SCHEMA.items()
+                                                       if columns is None or column in columns},
+                         engine=csv_engine())
+    return enforce_schema(df)
+
+
+def csv_dtype(dtype):
+    """Type the CSV parser reads a column as: strings go straight to categories, numbers are narrowed after"""
+    if dtype == "category" or isinstance(dtype, pd.CategoricalDtype):
+        return "category"
+    if dtype is bool:
+        return "boolean"
+    return np.float32 if np.dtype(dtype).kind == "f" else np.float64
+
+
+def csv_engine() -> str:
+    try:
+        import pyarrow  # noqa: F401
+        return "pyarrow"
+    except ImportError:
+        return "c"
@@ -0,0 +1,144 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+
+class ShotStore:
+    """
+    Append-only, column-oriented history of the shots of a game. Each column is a NumPy array whose
+    capacity doubles when full, so appending k shots costs O(k) amortized whatever the size of the
+    history, and the expected goals of each team are kept as running totals.
+    """
+    def __init__(self, capacity: int = 256, team_column: str = "eventOwnerTeam",
+                 probability_column: str = "probability"):
+        self.team_column = team_column
+        self.probability_column = probability_column
+        self.capacity = capacity
+
+        self.columns = {}
+        self.dtypes = {}
+        self.size = 0
+        self.xg = defaultdict(float)
+        self.shots = defaultdict(int)
+        self._frame = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, shots: pd.DataFrame, probability=None):
+        """
+        Appends new shots, with their probability of being a goal (the `probability_column` of
+        `shots` when None). Missing probabilities count as 0 in the expected goals.
+        """
+        if shots is None or shots.empty:
+            return
+        if probability is None:
+            probability = shots[self.probability_column]
+        probability = np.asarray(probability, dtype=np.float64)
+
+        if not self.columns:
+            for name, dtype in shots.dtypes.items():
+                if name != self.probability_column:
+                    self.columns[name] = np.empty(self.capacity, dtype=storage_dtype(dtype))
+                    self.dtypes[name] = dtype
+            self.columns[self.probability_column] = np.empty(self.capacity, dtype=np.float64)
+
+        start, end = self.size, self.size + len(shots)
+        self._reserve(end)
+        for name, values in list(self.columns.items()):
+            if name == self.probability_column:
+                values[start:end] = probability
+                continue
+            column = shots[name] if name in shots else None
+            if values.dtype.kind in "biu" and (column is None or column.dtype.kind not in "biu"):
+                # e.g. integers followed by missing values: the column is widened rather than filled
+                values = self.columns[name] = values.astype(np.float64 if values.dtype.kind in "iu" else object)
+            if column is None:
+                values[start:end] = missing_value(values.dtype)
+            else:
+                values[start:end] = column.to_numpy(dtype=values.dtype, na_value=missing_value(values.dtype))
+        self.size = end
+        self._frame = None
+
+        teams = shots[self.team_column].to_numpy(dtype=object)
+        totals = np.nan_to_num(probability)
+        for team in pd.unique(teams):
+            in_team = teams == team
+            self.xg[team] += float(totals[in_team].sum())
+            self.shots[team] += int(in_team.sum())
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only view of the stored values of a column"""
+        view = self.columns[name][:self.size]
+        view.flags.writeable = False
+        return view
+
+    def to_columns(self, start: int = 0) -> dict:
+        """
+        The shots from the `start`-th one on, as {column: list of values} ready to be encoded as
+        JSON (missing values are None), without building a DataFrame
+        """
+        start = min(max(start, 0), self.size)
+        columns = {}
+        for name, values in self.columns.items():
+            values = values[start:self.size]
+            if values.dtype == np.float32:
+                # Through their shortest repr, so 59.1 is not sent as 59.099998474121094
+                values = values.astype(str).astype(np.float64)
+            if values.dtype.kind == "f" and np.isnan(values).any():
+                values = np.where(np.isnan(values), None, values)
+            columns[name] = values.tolist()
+        return columns
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        The shots as a DataFrame, with the dtypes of the first shots appended (but for widened
+        columns), built at most once between two appends
+        """
+        if self._frame is None:
+            self._frame = pd.DataFrame({
+                name: restore_dtype(values[:self.size].copy(), self.dtypes.get(name, values.dtype))
+                for name, values in self.columns.items()
+            })
+        return self._frame
+
+    def _reserve(self, size: int):
+        if size <= self.capacity:
+            return
+        while self.capacity < size:
+            self.capacity *= 2
+        for name, values in self.columns.items():
+            grown = np.empty(self.capacity, dtype=values.dtype)
+            grown[:self.size] = values[:self.size]
+            self.columns[name] = grown
+
+
+def storage_dtype(dtype) -> np.dtype:
+    """NumPy dtype of the array storing a column: its own for numbers and booleans, object otherwise"""
+    if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+        return dtype
+    return np.dtype(object)
+
+
+def restore_dtype(values: np.ndarray, dtype) -> pd.Series:
+    """
+    Stored `values` as a Series of their original `dtype`. Categories seen only in later appends
+    are added after the original ones; widened integers stay floats and widened booleans become
+    nullable booleans.
+    """
+    values = pd.Series(values)
+    if isinstance(dtype, pd.CategoricalDtype):
+        new = pd.Index(values.dropna().unique()).difference(dtype.categories)
+        if len(new):
+            dtype = pd.CategoricalDtype(dtype.categories.append(new), ordered=dtype.ordered)
+        return values.astype(dtype)
+    if values.dtype == dtype:
+        return values
+    if isinstance(dtype, np.dtype) and dtype.kind in "biu":
+        return values.astype("boolean") if dtype.kind == "b" else values
+    return values.astype(dtype)
+
+
+def missing_value(dtype: np.dtype):
+    return np.nan if dtype.kind == "f" else None
@@ -1,22 +1,30 @@
-from pathlib import Path
-
-from flask import json
-import pandas as pd
-import requests
+"""
+Featurizes two saved snapshots of the same game in a row, as two pings of the dashboard would: the
+second ping only returns the shots added since the first. From the root of the repo:
 
-from  game_client import GameClient
+    $ python -m ift6758.ift6758.client.test game1.json game2.json
 
+To replay saved games progressively against the serving app, see benchmarks/bench_replay.py.
+"""
+import argparse
+from pathlib import Path
 
+from .game_client import GameClient
 
 
 if __name__ == "__main__":
-
+    parser = argparse.ArgumentParser()
+    parser.add_argument("first", type=Path, nargs="?", default=Path(__file__).parent / "game1.json",
+                        help="Play-by-play of the first ping")
+    parser.add_argument("second", type=Path, nargs="?", default=Path(__file__).parent / "game2.json",
+                        help="Play-by-play of the second ping, later in the same game")
+    args = parser.parse_args()
 
     gc = GameClient()
     # first ping
-    all_events = gc.get_game_and_filter_from_json("/Users/philippebergeron/Documents/Universite/automne2024/ift6758/docker-project-template/ift6758/ift6758/client/game1.json")
+    all_events = gc.get_game_and_filter_from_json(args.first)
     print(all_events)
 
     # second ping
-    two_events = gc.get_game_and_filter_from_json("/Users/philippebergeron/Documents/Universite/automne2024/ift6758/docker-project-template/ift6758/ift6758/client/game2.json")
+    two_events = gc.get_game_and_filter_from_json(args.second)
     print(two_events)
@@ -0,0 +1,144 @@
+"""
+Featurizes a directory of saved play-by-play JSON files (one game per file, as returned by
+api-web.nhle.com/v1/gamecenter/<id>/play-by-play) into Parquet files partitioned by season and game
+type:
+
+    <out_dir>/season=2016/gameType=02/part-00000.parquet
+
+Games are converted with `df_convert` in a pool of processes and written as soon as enough of them are
+done. Each part file lists the games it holds in its Parquet metadata, so an interrupted run picks up
+where it stopped when started again, without ever writing a game twice. From the root of the repo:
+
+    $ python -m ift6758.ift6758.data.featurize <json_dir> <out_dir> [--workers 8]
+"""
+import argparse
+from collections import defaultdict
+import json
+import logging
+from multiprocessing import Pool
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+from ..client.game_client import df_convert
+from ..client.shot_schema import enforce_schema
+
+
+logger = logging.getLogger(__name__)
+
+# Key of the Parquet metadata listing the games of a part file, as paths relative to the JSON directory
+GAMES_METADATA_KEY = b"ift6758.games"
+
+
+def partition(game_id: int) -> tuple:
+    """(season, game type) of a game id such as 2016020001: season 2016, regular season ('02')"""
+    return str(game_id)[:4], str(game_id)[4:6]
+
+
+def featurize_file(path: str) -> tuple:
+    """Returns (path, season, game type, shots, error) for one saved game"""
+    try:
+        with open(path) as f:
+            game_nhl = json.load(f)
+        season, game_type = partition(game_nhl['id'])
+        return path, season, game_type, df_convert(game_nhl), None
+    except Exception as e:
+        return path, None, None, None, f"{type(e).__name__}: {e}"
+
+
+class PartitionWriter:
+    def __init__(self, out_dir: Path, games_per_file: int = 200):
+        """
+        Buffers the converted games of each partition and writes them games_per_file at a time. A file
+        is written under a temporary name then renamed, and lists its games in its own metadata: the
+        rename records them at once, so a game is either written and recorded or redone on the next
+        run, never both.
+        """
+        self.out_dir = Path(out_dir)
+        self.games_per_file = games_per_file
+        self.buffers = defaultdict(list)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+
+    def done(self) -> set:
+        """Games already written, as paths relative to the JSON directory"""
+        done = set()
+        for part_file in self.out_dir.glob("season=*/gameType=*/part-*.parquet"):
+            metadata = pq.read_schema(part_file).metadata or {}
+            done.update(json.loads(metadata.get(GAMES_METADATA_KEY, b"[]")))
+        return done
+
+    def add(self, path: str, season: str, game_type: str, shots: pd.DataFrame):
+        buffer = self.buffers[(season, game_type)]
+        buffer.append((path, shots))
+        if len(buffer) >= self.games_per_file:
+            self.flush(season, game_type)
+
+    def flush(self, season: str, game_type: str):
+        buffer = self.buffers.pop((season, game_type), [])
+        if not buffer:
+            return
+
+        partition_dir = self.out_dir / f"season={season}" / f"gameType={game_type}"
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        # Parts of earlier runs are never overwritten, even if some were deleted in between
+        part = 1 + max((int(path.stem[len("part-"):]) for path in partition_dir.glob("part-*.parquet")
+                        if path.stem[len("part-"):].isdigit()), default=-1)
+        part_file = partition_dir / f"part-{part:05d}.parquet"
+        tmp_file = partition_dir / f".part-{part:05d}.parquet.tmp"
+
+        # Categories differ from game to game, which concat turns back into strings
+        shots = enforce_schema(pd.concat([shots for _, shots in buffer], ignore_index=True))
+        table = pa.Table.from_pandas(shots, preserve_index=False)
+        games = json.dumps([path for path, _ in buffer]).encode()
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), GAMES_METADATA_KEY: games})
+        pq.write_table(table, tmp_file)
+        os.replace(tmp_file, part_file)
+
+    def close(self):
+        for season, game_type in list(self.buffers):
+            self.flush(season, game_type)
+
+
+def featurize_directory(json_dir: str, out_dir: str, workers: int = None, games_per_file: int = 200) -> dict:
+    """
+    Converts every *.json file under `json_dir` that is not already listed by a part file of
+    `out_dir`. Returns counts of converted, skipped and failed games.
+    """
+    json_dir = Path(json_dir)
+    writer = PartitionWriter(out_dir, games_per_file)
+
+    done = writer.done()
+    paths = [str(path.relative_to(json_dir)) for path in sorted(json_dir.rglob("*.json"))]
+    todo = [path for path in paths if path not in done]
+    stats = {"converted": 0, "skipped": len(paths) - len(todo), "failed": 0}
+
+    with Pool(workers) as pool:
+        results = pool.imap_unordered(featurize_file, [str(json_dir / path) for path in todo], chunksize=4)
+        try:
+            for path, season, game_type, shots, error in tqdm(results, total=len(todo)):
+                if error is not None:
+                    logger.warning(f"Failed to convert {path}: {error}")
+                    stats["failed"] += 1
+                    continue
+                writer.add(str(Path(path).relative_to(json_dir)), season, game_type, shots)
+                stats["converted"] += 1
+        finally:
+            writer.close()
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Featurize saved play-by-play JSON files into Parquet")
+    parser.add_argument("json_dir", help="Directory of saved play-by-play JSON files, searched recursively")
+    parser.add_argument("out_dir", help="Root of the partitioned Parquet dataset")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes (default: one per CPU)")
+    parser.add_argument("--games-per-file", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(featurize_directory(args.json_dir, args.out_dir, args.workers, args.games_per_file))
@@ -3,130 +3,645 @@ If you are in the same directory as this file (app.py), you can run run the app
     
     $ gunicorn --bind 0.0.0.0:<PORT> app:app
 
+or, with the settings of gunicorn.conf.py (workers, preloading, ...):
+
+    $ gunicorn -c gunicorn.conf.py app:app
+
 gunicorn can be installed via:
 
     $ pip install gunicorn
 
+asgi.py serves the same endpoints as an ASGI app, for many slow or idle clients.
 """
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
+import io
 import os
 from pathlib import Path
 import logging
-from flask import Flask, json, jsonify, request, abort
-import requests
-import pandas as pd
-import joblib
-import wandb
+import threading
+import uuid
+import zlib
+from flask import Flask, Response, g, json, jsonify, request, abort
+import numpy as np
+
+from ift6758.ift6758.client.metrics import Metrics
+
+from batching import MicroBatcher
+from compiled import predict_proba
+from log_handlers import log_payload, log_window, read_logs, setup_logging
+from prediction_cache import PredictionCache
+from registry import LocalArtifactSource, ModelRegistry, WandbArtifactSource, model_key
+from schema import FeatureSchema, SchemaError
 
 
 LOG_FILE = os.environ.get("FLASK_LOG", "flask.log")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 10 * 2**20))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", 5))
+# Fraction of /predict calls whose payload and predictions are logged
+PAYLOAD_LOG_SAMPLE_RATE = float(os.environ.get("PAYLOAD_LOG_SAMPLE_RATE", 0.01))
 MODEL_DIR = Path("models")
+# When set, models are read from this directory (laid out as <workspace>/<model>/v<version>/*.pkl)
+# instead of being downloaded from the W&B registry
+MODEL_ARTIFACT_DIR = os.environ.get("MODEL_ARTIFACT_DIR")
+MODEL_MEMORY_BUDGET = int(os.environ.get("MODEL_MEMORY_BUDGET", 256 * 2**20))
+# Set to "r" to memory-map the arrays of the models instead of copying them in each worker
+MODEL_MMAP_MODE = os.environ.get("MODEL_MMAP_MODE") or None
+# Run of the service whose workers follow each other's model swaps; gunicorn.conf.py sets one per start,
+# so that after a restart the workers serve the default model again rather than the last swapped one
+MODEL_STATE_GENERATION = os.environ.get("MODEL_STATE_GENERATION") or uuid.uuid4().hex
+
+DEFAULT_MODEL_KEY = model_key("philippe-bergeron-7-universit-de-montr-al-org/wandb-registry-model",
+                              "Logistic regression", "6")
+DEFAULT_MODEL_FILE = MODEL_DIR / "logistic_regression_distance1.pkl"
+
+JSON_MIMETYPE = "application/json"
+NPY_MIMETYPE = "application/x-npy"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+METRICS_MIMETYPE = "text/plain; version=0.0.4"
+# JSON responses with more rows than this are streamed in chunks of this many rows
+STREAM_ROWS = int(os.environ.get("PREDICT_STREAM_ROWS", 10000))
+# gzip request bodies that decompress to more than this many bytes are rejected
+MAX_DECOMPRESSED_BYTES = int(os.environ.get("MAX_DECOMPRESSED_BYTES", 128 * 2**20))
+# Set to 1 to coalesce concurrent /predict calls of a worker into batches (see batching.py); only
+# useful when a worker handles several requests at once, e.g. with GUNICORN_THREADS > 1
+PREDICT_BATCHING = os.environ.get("PREDICT_BATCHING", "0") == "1"
+PREDICT_BATCH_MAX_WAIT_MS = float(os.environ.get("PREDICT_BATCH_MAX_WAIT_MS", 2))
+PREDICT_BATCH_MAX_ROWS = int(os.environ.get("PREDICT_BATCH_MAX_ROWS", 4096))
+# Number of feature rows whose predictions are cached per worker (see prediction_cache.py); 0 disables
+# the cache. Cached predictions are dropped when the model is swapped, and after PREDICT_CACHE_TTL seconds.
+# Lookups cost about as much as scoring with a logistic regression: only worth it for costlier models
+PREDICT_CACHE_SIZE = int(os.environ.get("PREDICT_CACHE_SIZE", 0))
+PREDICT_CACHE_TTL = float(os.environ.get("PREDICT_CACHE_TTL", 3600))
+# Set to 0 to always score with scikit-learn; otherwise logistic regressions (and pipelines of scalers
+# ending with one) are scored with NumPy only, without scikit-learn's per-call overhead (see compiled.py)
+COMPILED_SCORING = os.environ.get("COMPILED_SCORING", "1") == "1"
+# Side in feet of the cells of the xG tables of geometry-only models (see xg_table.py); 0 disables them.
+# Tables are built on the first /heatmap, and in the background for models that are not compiled (e.g.
+# tree ensembles; compiled ones are faster to score than to look up): /predict is then scored from the
+# table if the 99th percentile of its error against the model is at most XG_TABLE_MAX_ERROR
+XG_TABLE_RESOLUTION = float(os.environ.get("XG_TABLE_RESOLUTION", 0.5))
+XG_TABLE_MAX_ERROR = float(os.environ.get("XG_TABLE_MAX_ERROR", 0.01))
+# Games featurized and scored by /games/<id>/score kept per worker and model (see games.py). Games
+# requested by id are read from GAME_SOURCE_DIR (as <game id>.json) when set, from NHL_API_URL otherwise
+GAME_STORE_SIZE = int(os.environ.get("GAME_STORE_SIZE", 64))
+GAME_SOURCE_DIR = os.environ.get("GAME_SOURCE_DIR")
+NHL_API_URL = os.environ.get("NHL_API_URL", "https://api-web.nhle.com/v1")
+# Seconds during which a play-by-play fetched from NHL_API_URL is reused without revalidating it
+NHL_API_TTL = float(os.environ.get("NHL_API_TTL", 5.0))
 
 
 MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
 app = Flask(__name__)
 
+# Per-stage latencies and request counts of this worker, exposed on /metrics
+metrics = Metrics("xg_serving")
+
+prediction_cache = None
+if PREDICT_CACHE_SIZE > 0:
+    prediction_cache = PredictionCache(max_entries=PREDICT_CACHE_SIZE, ttl=PREDICT_CACHE_TTL)
+
+registry = ModelRegistry(
+    LocalArtifactSource(MODEL_ARTIFACT_DIR) if MODEL_ARTIFACT_DIR else WandbArtifactSource(MODEL_DIR),
+    memory_budget=MODEL_MEMORY_BUDGET,
+    state_file=MODEL_DIR / "current_model.json",
+    generation=MODEL_STATE_GENERATION,
+    mmap_mode=MODEL_MMAP_MODE,
+    metrics=metrics,
+    on_swap=(lambda entry: prediction_cache.invalidate()) if prediction_cache is not None else None,
+    compile_models=COMPILED_SCORING,
+    xg_table_resolution=XG_TABLE_RESOLUTION or None,
+)
+
+batcher = None
+if PREDICT_BATCHING:
+    batcher = MicroBatcher(lambda model, X: predict_proba(model, X), max_batch_rows=PREDICT_BATCH_MAX_ROWS,
+                           max_wait=PREDICT_BATCH_MAX_WAIT_MS / 1000)
+
+# Store and source of the games scored by /games/<id>/score, created by the first of those requests
+games = None
+game_source = None
+games_lock = threading.Lock()
+
+# Process that imported the app: the gunicorn master when preloading (--preload / preload_app),
+# the worker itself otherwise
+LOADED_IN_PID = os.getpid()
+startup_seconds = None
+# Why the default model could not be loaded at startup, reported by /ready while no model is loaded
+startup_error = None
+
 
 def before_first_request():
     """
     Hook to handle any initialization before the first request (e.g. load model,
     setup logging handler, etc.)
     """
-    # TODO: setup basic logging configuration
-    logging.basicConfig(filename=LOG_FILE, level=logging.INFO)
+    setup_logging(LOG_FILE, level=LOG_LEVEL, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT)
     logging.info("App initialized")
 
-    global current_model
-    global current_model_name
+    global startup_seconds, startup_error
 
     try:
-        model_file_path = MODEL_DIR / "logistic_regression_distance1.pkl"
-        if model_file_path.exists():
-            logging.info(model_file_path)
-            current_model = joblib.load(model_file_path)
-            current_model_name = "default_model"
-            logging.info("Loaded default model: default_model")
-        else:
+        if DEFAULT_MODEL_FILE.exists():
+            logging.info(DEFAULT_MODEL_FILE)
+            registry.load(DEFAULT_MODEL_KEY, DEFAULT_MODEL_FILE)
 
-            wandb.login(key=os.environ.get("WANDB_API_KEY"))
-            wandb.init()
-            model_artifact = wandb.use_artifact(f"philippe-bergeron-7-universit-de-montr-al-org/wandb-registry-model/Logistic regression:v6")
-            model_artifact.download(root=str(MODEL_DIR))
-            wandb.finish()
-
-            # Load the downloaded model
-            
-            logging.info(model_file_path)
-            current_model = joblib.load(model_file_path)
-            current_model_name = f"Default model (Logistic Regression Distance)"
-            app.logger.info(f"Downloaded and loaded model: {current_model_name}")
-            response = {"status": "success", "message": f"Downloaded and loaded model {current_model_name}"}
-            return response
+        # Not recorded in the state file, which would undo the swaps other workers already made
+        entry = registry.swap(DEFAULT_MODEL_KEY, record=False)
+        logging.info(f"Loaded default model: {entry.name}")
     except Exception as e:
         logging.error(f"Failed to load default model: {e}")
+        startup_error = f"Failed to load default model: {type(e).__name__}: {e}"
+
+    # Another worker may already have swapped the model; if it cannot be loaded, the default one is kept
+    registry.sync()
+
+    startup_seconds = time.perf_counter() - IMPORT_STARTED
+    logging.info(f"Startup took {startup_seconds:.3f}s (pid {os.getpid()}, mmap_mode={MODEL_MMAP_MODE})")
 
 before_first_request()
 
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.observe("request_seconds", time.perf_counter() - g.request_started, endpoint=endpoint)
+    metrics.inc("requests_total", endpoint=endpoint, status=response.status_code)
+    return response
+
+
+def process_memory() -> dict:
+    """
+    Memory of the current process, in bytes. On Linux, `pss` splits the pages shared with other
+    processes (e.g. other workers) between them and `shared` counts those pages.
+    """
+    memory = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                field, value = line.split(":", 1)
+                if field in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty"):
+                    memory[field] = int(value.split()[0]) * 1024
+        memory = {"rss": memory["Rss"], "pss": memory["Pss"],
+                  "shared": memory["Shared_Clean"] + memory["Shared_Dirty"]}
+    except (OSError, KeyError, ValueError):
+        import resource
+
+        # ru_maxrss is the peak RSS, in kilobytes on Linux and in bytes on macOS
+        memory = {"rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    return memory
+
+
+def readiness() -> tuple:
+    """
+    Body and status of /ready: 200 once a model is loaded, 503 until then with the `reason`. Either
+    way, `sync_error` holds the model set by another worker that could not be switched to, if any.
+    """
+    current = registry.current()
+    sync_error = registry.sync_error
+    if current is None:
+        if sync_error is not None:
+            reason = f"Failed to switch to model {sync_error['key']} set by another worker: {sync_error['error']}"
+        else:
+            reason = startup_error or "No model loaded yet"
+        return {"status": "loading", "model": None, "reason": reason, "sync_error": sync_error}, 503
+    return {"status": "ready", "model": current.name, "startup_seconds": startup_seconds,
+            "sync_error": sync_error}, 200
+
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Liveness: the process is up and handling requests, whether or not a model is loaded"""
+    return jsonify({"status": "ok"})
+
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """
+    Readiness: 200 once the worker has a model to score with, 503 while it has none (e.g. the default
+    model could not be loaded at startup and no model was downloaded since), saying why (see readiness)
+    """
+    body, status = readiness()
+    return jsonify(body), status
+
+
+@app.route("/worker", methods=["GET"])
+def worker():
+    """Startup time and memory of the worker handling the request"""
+    response = {
+        "pid": os.getpid(),
+        "preloaded": os.getpid() != LOADED_IN_PID,
+        "mmap_mode": MODEL_MMAP_MODE,
+        "startup_seconds": startup_seconds,
+        "memory": process_memory(),
+        "models": registry.stats(),
+    }
+    return jsonify(response)
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Counters and latency histograms of the worker handling the request, in the Prometheus text
+    format: request latency per endpoint, and the time spent in each stage of /predict (decode,
+    predict_proba, encode) and of model downloads and loads.
+    """
+    return Response(metrics.render(), mimetype=METRICS_MIMETYPE)
+
+
 @app.route("/logs", methods=["GET"])
 def logs():
-    """Reads data from the log file and returns them as the response"""
+    """
+    Returns a window of the log file, reading only that window from disk. Query parameters:
+
+        limit   maximum number of records (default 100, at most log_handlers.MAX_LIMIT)
+        level   minimum level of the records, e.g. WARNING
+        offset  byte offset to read forward from; the response gives the `next_offset` to continue
+        before  byte offset to read backward from (default: end of the file, i.e. the latest
+                records); the response gives the `before_offset` of the previous page
+    """
     try:
-        with open(LOG_FILE, "r") as f:
-            log_data = f.read()
-        return jsonify({"logs": log_data})
+        window = log_window(request.args)
+    except ValueError as e:
+        return {"status": "failure", "message": str(e)}, 400
+
+    try:
+        return jsonify(read_logs(LOG_FILE, **window))
     except Exception as e:
         logging.error(f"Error reading logs: {e}")
         abort(500, "Failed to read logs")
-#     # TODO: read the log file specified and return the data
-#     #raise NotImplementedError("TODO: implement this endpoint")
 
-#     #response = None
-#     #return jsonify(response)  # response must be json serializable!
+
+@app.route("/batching", methods=["GET"])
+def batching():
+    """Queue depth and batch size histograms of the micro-batching of /predict, if enabled"""
+    if batcher is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **batcher.stats()})
+
+
+@app.route("/prediction_cache", methods=["GET"])
+def prediction_cache_stats():
+    """Size and hit rate of the prediction cache of the worker handling the request, if enabled"""
+    if prediction_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **prediction_cache.stats()})
 
 
 @app.route("/download_registry_model", methods=["POST"])
 def download_registry_model():
-    #Get POST json data
-    global current_model
-    global current_model_name
-
-    json_request = request.get_json()
+    """
+    Makes the given model the current one. Models are downloaded and loaded once, then kept in the
+    registry, so swapping back to a recently used model is immediate.
+    """
+    json_request = request.get_json(silent=True)
     app.logger.info(f"Received request to download model: {json_request}")
 
-    data = json.loads(json_request)
+    key = registry_model_key(json_request)
+    if key is None:
+        return {"status": "failure", "message": DOWNLOAD_BODY_ERROR}, 400
+
+    response = swap_model(key)
+    app.logger.info(response)
+    return jsonify(response)  # response must be json serializable!
+
+
+DOWNLOAD_BODY_ERROR = 'Expected a JSON object such as {"workspace": ..., "model": ..., "version": ...}'
+
+
+def registry_model_key(data) -> tuple:
+    """
+    Key of the model named by the decoded body of a /download_registry_model request (a JSON object,
+    possibly encoded as a JSON string), or None if the body is not one
+    """
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return None
+    if not isinstance(data, dict):
+        return None
+    return model_key(data.get("workspace"), data.get("model"), data.get("version"))
 
-    workspace = data.get("workspace")
-    model_name = data.get("model")
-    version = data.get("version")
-    wandb.init()
-    model_artifact = wandb.use_artifact(f"{workspace}/{model_name}:v{version}")
-    model_file_path = Path(model_artifact.file(root=str(MODEL_DIR)))
 
+def swap_model(key: tuple) -> dict:
+    """Makes the model of `key` the current one; returns the response of /download_registry_model"""
     try:
-        if model_file_path.exists():
-            wandb.finish()
-            app.logger.info(f"Model already exists: {model_file_path}. Loading model.")
-            
-            current_model = joblib.load(model_file_path)
-            current_model_name = f"{model_name}_v{version}"
-            response = {"status": "success", "message": f"Loaded model {current_model_name}"}
-        else:
-            model_artifact.download(root=str(MODEL_DIR))
-            wandb.finish()
-
-            # Load the downloaded model
-            current_model = joblib.load(model_file_path)
-            current_model_name = f"{model_name}_v{version}"
-            app.logger.info(f"Downloaded and loaded model: {current_model_name}")
-            response = {"status": "success", "message": f"Downloaded and loaded model {current_model_name}"}
+        entry = registry.swap(key)
+        return {"status": "success", "message": f"Loaded model {entry.name}"}
     except Exception as e:
         logging.error(f"Failed to download/load model: {e}")
-        response = {"status": "failure", "message": str(e)}
+        return {"status": "failure", "message": str(e)}
 
 
+def requested_model(args=None):
+    """
+    Model selected by the `workspace`, `model` and `version` query parameters of the request (or of
+    the mapping `args`), each defaulting to the one of the current model; the current model if none
+    is given.
+    """
+    args = request.args if args is None else args
+    current = registry.current()
+    if not any(arg in args for arg in ("workspace", "model", "version")):
+        if current is None:
+            raise RuntimeError("No model loaded")
+        return current
 
-    app.logger.info(response)
-    return jsonify(response)  # response must be json serializable!
+    workspace, model, version = DEFAULT_MODEL_KEY if current is None else current.key
+    return registry.get(model_key(args.get("workspace", workspace), args.get("model", model),
+                                  args.get("version", version)))
+
+
+def model_description(entry) -> dict:
+    """Response of /model_info for a registry entry"""
+    classes = getattr(entry.model, "classes_", None)
+    return {
+        "model": entry.name,
+        "key": list(entry.key),
+        "classes": None if classes is None else classes.tolist(),
+        "compiled": entry.scorer is not None,
+        "xg_table": xg_table_description(entry),
+        **entry.schema.to_dict(),
+    }
+
+
+def xg_table_description(entry) -> dict:
+    """xG table of a registry entry in /model_info: None if it cannot have one, its description once built"""
+    used = uses_xg_table(entry)
+    if entry.xg_table is None:
+        return None if entry.xg_table_resolution is None else \
+            {"resolution": entry.xg_table_resolution, "built": False, "used": False}
+    return {**entry.xg_table.to_dict(), "built": True, "used": used}
+
+
+def read_features(schema: FeatureSchema) -> np.ndarray:
+    """Decodes the body of the current /predict request (see `decode_features`)"""
+    return decode_features(schema, request.mimetype, request.get_data(), request.headers.get("X-Feature-Names"),
+                           request.headers.get("Content-Encoding"))
+
+
+def gunzip(body: bytes, max_length: int) -> bytes:
+    """
+    Decompresses a gzip body without ever holding more than `max_length` decompressed bytes. Raises
+    SchemaError when the body is not valid gzip or decompresses to more than that.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, max_length)
+    except zlib.error as e:
+        raise SchemaError(f"Invalid gzip body: {e}")
+    if not decompressor.eof:
+        if len(data) >= max_length:
+            raise SchemaError(f"Body larger than {max_length} bytes once decompressed")
+        raise SchemaError("Invalid gzip body: truncated stream")
+    return data
+
+
+def decode_features(schema: FeatureSchema, mimetype: str, body: bytes, feature_names: str = None,
+                    content_encoding: str = None) -> np.ndarray:
+    """
+    Decodes the body of a /predict request according to its Content-Type:
+
+        application/json                     records or columns, as produced by DataFrame.to_json
+        application/x-npy                    2D float array saved with np.save; column names may be
+                                             given, comma separated, in the X-Feature-Names header,
+                                             otherwise the columns must be in the order of /model_info
+        application/vnd.apache.arrow.stream  Arrow IPC stream of one numeric column per feature
+                                             (requires pyarrow)
+
+    Bodies of any format may be gzip-compressed (Content-Encoding: gzip), up to MAX_DECOMPRESSED_BYTES
+    once decompressed. Returns the features validated against `schema`, as a contiguous float64 array
+    in the model's feature order. Raises SchemaError when they do not match, or when the body cannot be
+    decoded.
+    """
+    if content_encoding:
+        if content_encoding.strip().lower() != "gzip":
+            raise SchemaError(f"Unsupported Content-Encoding: {content_encoding}")
+        body = gunzip(body, MAX_DECOMPRESSED_BYTES)
+
+    if mimetype == NPY_MIMETYPE:
+        try:
+            X = np.load(io.BytesIO(body), allow_pickle=False)
+        except (OSError, EOFError, ValueError) as e:
+            raise SchemaError(f"Invalid .npy body: {e}")
+        if not isinstance(X, np.ndarray):
+            raise SchemaError("Expected a single array saved with np.save")
+        if X.ndim == 1:
+            # A single feature may be sent as a 1D array
+            X = X[:, np.newaxis]
+        return schema.from_array(X, feature_names.split(",") if feature_names else None)
+
+    if mimetype == ARROW_MIMETYPE:
+        import pyarrow as pa
+
+        try:
+            table = pa.ipc.open_stream(body).read_all()
+            columns = {name: table.column(name).to_numpy() for name in table.column_names}
+        except (pa.ArrowException, ValueError) as e:
+            raise SchemaError(f"Invalid Arrow IPC stream: {e}")
+        return schema.from_columns(columns, table.num_rows)
+
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise SchemaError(f"Invalid JSON body: {e}")
+    return schema.from_json(data)
+
+
+def predict_batch(entry, X: np.ndarray) -> tuple:
+    """
+    Scores a decoded batch with the model of a registry entry, through the prediction cache and the
+    micro-batcher when enabled. Returns (predictions, probabilities); labels are derived from the
+    probabilities rather than running the model a second time. Compiled models are scored with
+    their NumPy scorer, other geometry-only models from their xG table when it is accurate enough.
+    """
+    model = entry.model
+    scorer = entry.scorer if entry.scorer is not None else model
+    with metrics.timer("predict_proba"):
+        if len(X) == 0:
+            probabilities = np.empty((0, len(model.classes_)))
+        elif uses_xg_table(entry):
+            probabilities = entry.xg_table.predict_proba(X, lambda rows: score(scorer, rows))
+        elif prediction_cache is not None:
+            probabilities = prediction_cache.predict(entry.key, X, lambda rows: score(scorer, rows))
+        else:
+            probabilities = score(scorer, X)
+    return model.classes_[probabilities.argmax(axis=1)], probabilities
+
+
+def uses_xg_table(entry) -> bool:
+    """Whether /predict is scored from the xG table of `entry`; starts building it if it could be"""
+    if entry.scorer is not None or entry.xg_table_resolution is None:
+        return False
+    if entry.xg_table is None:
+        entry.build_xg_table_in_background()
+        return False
+    return entry.xg_table.error["p99"] <= XG_TABLE_MAX_ERROR
+
+
+def encode_npy(probabilities: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, probabilities, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def score(model, X: np.ndarray) -> np.ndarray:
+    """Probabilities of a batch, through the micro-batcher when enabled"""
+    if batcher is not None:
+        return batcher.submit(model, X)
+    return predict_proba(model, X)
+
+
+def stream_predictions(predictions: np.ndarray, probabilities: np.ndarray):
+    """Yields the JSON response body of /predict in chunks of STREAM_ROWS rows"""
+    for key, values in (("predictions", predictions), ("probabilities", probabilities)):
+        yield '{"predictions": [' if key == "predictions" else '], "probabilities": ['
+        for start in range(0, len(values), STREAM_ROWS):
+            chunk = json.dumps(values[start:start + STREAM_ROWS].tolist())[1:-1]
+            yield chunk if start == 0 else "," + chunk
+    yield "]}"
+
+
+@app.route("/model_info", methods=["GET"])
+def model_info():
+    """
+    Feature schema of the current model, or of the one selected by the `workspace`, `model` and
+    `version` query parameters: the feature names in the order the model expects them, and their
+    dtypes. Clients can fetch it once and send arrays already in that order to /predict.
+    """
+    try:
+        entry = requested_model()
+    except Exception as e:
+        logging.error(f"Failed to get model info: {e}")
+        return {"status": "failure", "message": str(e)}, 404
+    return jsonify(model_description(entry))
+
+
+@app.route("/heatmap", methods=["GET"])
+def heatmap():
+    """
+    Goal probability of the current model (or of the one selected by the `workspace`, `model` and
+    `version` query parameters) over the rink, for geometry-only models: the xG table of
+    xg_table.py, with its extent, resolution and measured error. Responses carry an ETag per model
+    version, so a client holding the table gets a 304 until the model changes.
+    """
+    try:
+        entry = requested_model()
+    except Exception as e:
+        logging.error(f"Failed to get heatmap: {e}")
+        return {"status": "failure", "message": str(e)}, 404
+    if entry.build_xg_table() is None:
+        return {"status": "failure", "message": no_heatmap_message(entry)}, 404
+
+    response = jsonify(heatmap_body(entry))
+    response.set_etag(heatmap_etag(entry))
+    return response.make_conditional(request)
+
+
+def heatmap_body(entry) -> dict:
+    table = entry.xg_table
+    return {"model": entry.name, **table.to_dict(),
+            "probabilities": np.round(table.probabilities.astype(np.float64), 5).tolist()}
+
+
+def heatmap_etag(entry) -> str:
+    return f"{'/'.join(entry.key)}@{entry.xg_table.resolution}"
+
+
+def no_heatmap_message(entry) -> str:
+    return f"Model {entry.name} has no xG table: it does not only depend on the shot location"
+
+
+@app.route("/games/<int:game_id>/score", methods=["GET", "POST"])
+def score_game(game_id):
+    """
+    Featurizes and scores a game in the service, so clients never build feature frames. POST the raw
+    play-by-play of the game so far (as returned by api-web.nhle.com/v1/gamecenter/<id>/play-by-play),
+    or GET to have the service read it from its game source (GAME_SOURCE_DIR or the NHL API). Only the
+    shots after the `cursor` query parameter (the number of shots the client already has, 0 by
+    default) are returned, column-wise: every column of the shot records, and their `probability`
+    (null for shots missing one of the model's features).
+
+        {"game_id": ..., "model": ..., "cursor": <cursor to send next>, "shots": {column: [...]},
+         "xg": {team: xG}}
+
+    The model can be picked per request with the `workspace`, `model` and `version` query parameters.
+    """
+    try:
+        entry = requested_model()
+    except Exception as e:
+        logging.error(f"Failed to score game {game_id}: {e}")
+        return {"status": "failure", "message": str(e)}, 404
+
+    try:
+        if request.method == "POST":
+            game_nhl = request.get_json(silent=True)
+            if game_nhl is None:
+                return {"status": "failure", "message": "Expected the play-by-play of the game as a JSON body"}, 400
+        else:
+            game_nhl = fetch_game(game_id)
+        body, status = score_game_payload(entry, game_id, game_nhl, request.args.get("cursor", default=0, type=int))
+        return jsonify(body), status
+    except Exception as e:
+        logging.error(f"Failed to score game {game_id}: {e}")
+        return {"status": "failure", "message": str(e)}, 500
+
+
+def game_store():
+    """
+    The GameStore of this worker and its game source (see games.py), created on first use: games.py
+    imports pandas and the client package, which the other endpoints do without
+    """
+    global games, game_source
+    with games_lock:
+        if games is None:
+            from games import GameStore, LocalGameSource
+            from ift6758.ift6758.client.nhl_api import PlayByPlayFetcher
+
+            if GAME_SOURCE_DIR:
+                game_source = LocalGameSource(GAME_SOURCE_DIR)
+            else:
+                # As many payloads in memory as games in the store
+                game_source = PlayByPlayFetcher(NHL_API_URL, ttl=NHL_API_TTL, max_games=GAME_STORE_SIZE)
+            games = GameStore(GAME_STORE_SIZE, metrics)
+    return games, game_source
+
+
+def fetch_game(game_id: int) -> dict:
+    """Play-by-play of `game_id` from the game source, or None if it has none"""
+    return game_store()[1].get(game_id)
+
+
+def score_game_payload(entry, game_id: int, game_nhl, cursor: int) -> tuple:
+    """Body and status of /games/<id>/score for the play-by-play `game_nhl` (None if not found)"""
+    if game_nhl is None:
+        return {"status": "failure", "message": f"Game {game_id} not found"}, 404
+    if not isinstance(game_nhl, dict) or not isinstance(game_nhl.get("plays"), list):
+        return {"status": "failure", "message": "Expected the play-by-play of a game, with its plays"}, 400
+    if game_nhl.setdefault("id", game_id) != game_id:
+        return {"status": "failure", "message": f"Play-by-play of game {game_nhl['id']} sent for game {game_id}"}, 400
+
+    try:
+        with metrics.timer("score_game"):
+            body = game_store()[0].score(entry.key, entry.schema, game_nhl,
+                                         lambda X: predict_batch(entry, X)[1], cursor)
+    except SchemaError as e:
+        metrics.inc("prediction_errors_total", reason="schema")
+        logging.warning(f"Rejected game {game_id}: {e}")
+        return {"status": "failure", "message": str(e)}, 400
+    except KeyError as e:
+        logging.warning(f"Rejected game {game_id}: missing {e}")
+        return {"status": "failure", "message": f"Malformed play-by-play, missing {e}"}, 400
+    metrics.inc("predicted_rows_total", len(body["shots"].get("probability", ())))
+    return {**body, "model": entry.name}, 200
 
 
 @app.route("/predict", methods=["POST"])
@@ -134,21 +649,40 @@ def predict():
     """
     Handles POST requests made to http://IP_ADDRESS:PORT/predict
 
-    Returns predictions
+    Returns predictions. The body may be JSON, .npy or Arrow IPC (see `read_features`). Clients
+    sending `Accept: application/x-npy` get the (n, 2) probabilities back as a .npy body, labels
+    being their argmax; everyone else gets {"predictions": [...], "probabilities": [...]}. The
+    model can be picked per request with the `workspace`, `model` and `version` query parameters.
+    Bodies not matching the model's features (see /model_info) are rejected with a 400.
     """
-    # Get POST json data
-    json_data = request.get_json()
-    app.logger.info(f"Received prediction request: {json_data}")
-    data = pd.DataFrame(json_data)
     try:
-        # Assuming features are in a format suitable for the current model
-        predictions = current_model.predict(data)
-        probabilities = current_model.predict_proba(data)
-        response = {"predictions": predictions.tolist(), "probabilities": probabilities.tolist()}
-        app.logger.info(response)
-        return jsonify(response) 
+        # The model is resolved once, so a concurrent swap does not affect this request
+        entry = requested_model()
+        with metrics.timer("decode"):
+            X = read_features(entry.schema)
+        metrics.inc("predicted_rows_total", len(X))
+        app.logger.info("Received prediction request",
+                        extra={"fields": {"rows": len(X), "content_type": request.mimetype}})
+        log_payload(app.logger, "Prediction request", X, PAYLOAD_LOG_SAMPLE_RATE)
+
+        predictions, probabilities = predict_batch(entry, X)
+        log_payload(app.logger, "Predictions", predictions, PAYLOAD_LOG_SAMPLE_RATE)
+
+        # Streamed bodies are encoded after the handler returns, so they are not part of this stage
+        with metrics.timer("encode"):
+            if request.accept_mimetypes.best_match([JSON_MIMETYPE, NPY_MIMETYPE]) == NPY_MIMETYPE:
+                return Response(encode_npy(probabilities), mimetype=NPY_MIMETYPE)
+            if len(probabilities) > STREAM_ROWS:
+                return Response(stream_predictions(predictions, probabilities), mimetype=JSON_MIMETYPE)
+
+            response = {"predictions": predictions.tolist(), "probabilities": probabilities.tolist()}
+            return jsonify(response)
+    except SchemaError as e:
+        metrics.inc("prediction_errors_total", reason="schema")
+        logging.warning(f"Rejected prediction request: {e}")
+        return {"status": "failure", "message": str(e)}, 400
     except Exception as e:
+        metrics.inc("prediction_errors_total", reason="error")
         logging.error(f"Prediction failed: {e}")
         response = {"status": "failure", "message": str(e)}
         return response
-
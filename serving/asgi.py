@@ -0,0 +1,259 @@
+"""
+ASGI entry point of the serving app, with the same /predict, /games/<id>/score, /model_info, /heatmap,
+/logs, /download_registry_model, /health and /ready contract as app.py (whose model registry, caches and settings it shares).
+Requests are handled on an event loop, so slow or idle keep-alive clients only cost a coroutine:
+decoding and scoring run in a pool of INFERENCE_THREADS threads, and model downloads and loads in a
+separate pool, so a swap never holds up the loop nor the predictions. Requests are counted and timed
+on /metrics with the same labels as app.py. From this directory:
+
+    $ uvicorn asgi:app --host 0.0.0.0 --port 5000 [--workers 2]
+
+or, with the settings of gunicorn.conf.py:
+
+    $ gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+
+uvicorn and starlette can be installed via:
+
+    $ pip install uvicorn starlette
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import re
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import app as service
+from log_handlers import log_payload, log_window, read_logs
+from schema import SchemaError
+
+
+logger = logging.getLogger(__name__)
+
+# Threads decoding and scoring /predict bodies; numpy and scikit-learn release the GIL in their
+# heavy loops, so a few threads use several cores
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", os.cpu_count() or 1))
+# Threads downloading and loading models
+DOWNLOAD_THREADS = int(os.environ.get("DOWNLOAD_THREADS", 2))
+
+inference_pool = ThreadPoolExecutor(INFERENCE_THREADS, thread_name_prefix="inference")
+download_pool = ThreadPoolExecutor(DOWNLOAD_THREADS, thread_name_prefix="download")
+
+
+async def run_in(pool: ThreadPoolExecutor, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+
+def failure(message: str, status_code: int = 200) -> JSONResponse:
+    return JSONResponse({"status": "failure", "message": message}, status_code=status_code)
+
+
+def accepts_npy(request) -> bool:
+    """Whether the client prefers .npy to JSON, with q-values, as Flask's `best_match` decides in app.py"""
+    accept = parse_accept_header(request.headers.get("accept"), MIMEAccept)
+    return accept.best_match([service.JSON_MIMETYPE, service.NPY_MIMETYPE]) == service.NPY_MIMETYPE
+
+
+def selects_model(request) -> bool:
+    return any(arg in request.query_params for arg in ("workspace", "model", "version"))
+
+
+def score_request(entry, mimetype: str, body: bytes, feature_names: str, content_encoding: str = None) -> tuple:
+    """Decodes and scores a /predict body with `entry` (the current model if None), off the event loop"""
+    if entry is None:
+        entry = service.requested_model({})
+    with service.metrics.timer("decode"):
+        X = service.decode_features(entry.schema, mimetype, body, feature_names, content_encoding)
+    service.metrics.inc("predicted_rows_total", len(X))
+    logger.info("Received prediction request", extra={"fields": {"rows": len(X), "content_type": mimetype}})
+    log_payload(logger, "Prediction request", X, service.PAYLOAD_LOG_SAMPLE_RATE)
+    return service.predict_batch(entry, X)
+
+
+async def predict(request):
+    """Same contract as the /predict of app.py"""
+    try:
+        # Selecting another model than the current one may download it, which is left to the download
+        # pool so that requests for the current model do not queue behind it
+        entry = await run_in(download_pool, service.requested_model, request.query_params) \
+            if selects_model(request) else None
+        mimetype = request.headers.get("content-type", service.JSON_MIMETYPE).split(";")[0].strip()
+        predictions, probabilities = await run_in(inference_pool, score_request, entry, mimetype,
+                                                  await request.body(), request.headers.get("x-feature-names"),
+                                                  request.headers.get("content-encoding"))
+        log_payload(logger, "Predictions", predictions, service.PAYLOAD_LOG_SAMPLE_RATE)
+
+        if accepts_npy(request):
+            return Response(await run_in(inference_pool, service.encode_npy, probabilities),
+                            media_type=service.NPY_MIMETYPE)
+        if len(probabilities) > service.STREAM_ROWS:
+            # Sync iterators are consumed in a thread by starlette
+            return StreamingResponse(service.stream_predictions(predictions, probabilities),
+                                     media_type=service.JSON_MIMETYPE)
+        response = {"predictions": predictions.tolist(), "probabilities": probabilities.tolist()}
+        return JSONResponse(response)
+    except SchemaError as e:
+        service.metrics.inc("prediction_errors_total", reason="schema")
+        logger.warning(f"Rejected prediction request: {e}")
+        return failure(str(e), 400)
+    except Exception as e:
+        service.metrics.inc("prediction_errors_total", reason="error")
+        logger.error(f"Prediction failed: {e}")
+        return failure(str(e))
+
+
+async def model_info(request):
+    """Same contract as the /model_info of app.py"""
+    try:
+        pool = download_pool if selects_model(request) else inference_pool
+        entry = await run_in(pool, service.requested_model, request.query_params)
+    except Exception as e:
+        logger.error(f"Failed to get model info: {e}")
+        return failure(str(e), 404)
+    return JSONResponse(service.model_description(entry))
+
+
+async def heatmap(request):
+    """Same contract as the /heatmap of app.py"""
+    try:
+        pool = download_pool if selects_model(request) else inference_pool
+        entry = await run_in(pool, service.requested_model, request.query_params)
+    except Exception as e:
+        logger.error(f"Failed to get heatmap: {e}")
+        return failure(str(e), 404)
+    # Built on the first request for the model, which can take a while
+    if await run_in(download_pool, entry.build_xg_table) is None:
+        return failure(service.no_heatmap_message(entry), 404)
+
+    headers = {"ETag": f'"{service.heatmap_etag(entry)}"'}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(await run_in(inference_pool, service.heatmap_body, entry), headers=headers)
+
+
+async def score_game(request):
+    """Same contract as the /games/<id>/score of app.py; games read from the game source are fetched off the event loop"""
+    game_id = request.path_params["game_id"]
+    try:
+        pool = download_pool if selects_model(request) else inference_pool
+        entry = await run_in(pool, service.requested_model, request.query_params)
+    except Exception as e:
+        logger.error(f"Failed to score game {game_id}: {e}")
+        return failure(str(e), 404)
+
+    try:
+        if request.method == "POST":
+            try:
+                game_nhl = json.loads(await request.body())
+            except ValueError:
+                return failure("Expected the play-by-play of the game as a JSON body", 400)
+        else:
+            game_nhl = await run_in(download_pool, service.fetch_game, game_id)
+        cursor = request.query_params.get("cursor", "0")
+        cursor = int(cursor) if cursor.lstrip("-").isdigit() else 0
+        body, status = await run_in(inference_pool, service.score_game_payload, entry, game_id, game_nhl, cursor)
+        return JSONResponse(body, status_code=status)
+    except Exception as e:
+        logger.error(f"Failed to score game {game_id}: {e}")
+        return failure(str(e), 500)
+
+
+async def download_registry_model(request):
+    """Same contract as the /download_registry_model of app.py; the download runs off the event loop"""
+    try:
+        json_request = json.loads(await request.body())
+    except ValueError:
+        json_request = None
+    logger.info(f"Received request to download model: {json_request}")
+
+    key = service.registry_model_key(json_request)
+    if key is None:
+        return failure(service.DOWNLOAD_BODY_ERROR, 400)
+    response = await run_in(download_pool, service.swap_model, key)
+    logger.info(response)
+    return JSONResponse(response)
+
+
+async def logs(request):
+    """Same contract as the /logs of app.py"""
+    try:
+        window = log_window(request.query_params)
+    except ValueError as e:
+        return failure(str(e), 400)
+
+    try:
+        return JSONResponse(await asyncio.to_thread(read_logs, service.LOG_FILE, **window))
+    except Exception as e:
+        logger.error(f"Error reading logs: {e}")
+        return failure("Failed to read logs", 500)
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def ready(request):
+    # Off the loop: the registry may still be downloading the model another worker swapped to
+    body, status = await run_in(download_pool, service.readiness)
+    return JSONResponse(body, status_code=status)
+
+
+async def metrics(request):
+    return Response(service.metrics.render(), media_type=service.METRICS_MIMETYPE)
+
+
+class RequestMetrics:
+    """
+    ASGI middleware recording the latency and count of each request, per route and status, as the
+    before_request / after_request hooks of app.py do. Routes are labelled with their Flask rule
+    (e.g. /games/<int:game_id>/score), so both entry points report the same series.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_recording_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_recording_status)
+        finally:
+            route = scope.get("route")
+            endpoint = flask_rule(route.path) if route is not None else "unmatched"
+            service.metrics.observe("request_seconds", time.perf_counter() - started, endpoint=endpoint)
+            service.metrics.inc("requests_total", endpoint=endpoint, status=status)
+
+
+def flask_rule(path: str) -> str:
+    """/games/{game_id:int}/score -> /games/<int:game_id>/score"""
+    return re.sub(r"\{(\w+)(?::(\w+))?\}", lambda m: f"<{m[2]}:{m[1]}>" if m[2] else f"<{m[1]}>", path)
+
+
+app = Starlette(middleware=[Middleware(RequestMetrics)], routes=[
+    Route("/predict", predict, methods=["POST"]),
+    Route("/games/{game_id:int}/score", score_game, methods=["GET", "POST"]),
+    Route("/model_info", model_info, methods=["GET"]),
+    Route("/heatmap", heatmap, methods=["GET"]),
+    Route("/download_registry_model", download_registry_model, methods=["POST"]),
+    Route("/logs", logs, methods=["GET"]),
+    Route("/metrics", metrics, methods=["GET"]),
+    Route("/health", health, methods=["GET"]),
+    Route("/ready", ready, methods=["GET"]),
+])
@@ -0,0 +1,28 @@
+"""
+Downloads the default model of app.py into models/ when building the serving image (see
+Dockerfile.serving), so that containers load it from disk at startup instead of logging in to W&B
+and downloading it. From this directory:
+
+    $ WANDB_API_KEY=<key> python bake_model.py
+
+Exits with status 1 if the model could not be downloaded and loaded.
+"""
+import os
+import sys
+
+# Nothing of the build is logged to the image
+os.environ.setdefault("FLASK_LOG", os.devnull)
+
+import app
+
+
+if __name__ == "__main__":
+    entry = app.registry.current()
+    if entry is None:
+        print(f"Failed to bake the default model {app.DEFAULT_MODEL_KEY}", file=sys.stderr)
+        sys.exit(1)
+
+    # Which model is current is decided by each container at startup, not by the build
+    if app.registry.state_file is not None:
+        app.registry.state_file.unlink(missing_ok=True)
+    print(f"Baked model {entry.name} ({entry.nbytes} bytes) in {app.startup_seconds:.1f}s")
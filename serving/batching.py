@@ -0,0 +1,120 @@
+"""
+Micro-batching of /predict calls: requests handled concurrently by the threads of a worker are queued,
+coalesced for at most `max_wait` seconds (or until `max_batch_rows` rows are waiting), scored with a
+single model call per model, and each caller gets back its own slice of the probabilities.
+"""
+from collections import Counter, defaultdict
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+def bucket(value: int) -> int:
+    """Smallest power of two >= value, the upper bound of the histogram bucket of `value`"""
+    return 1 << max(0, int(value) - 1).bit_length()
+
+
+class PendingRequest:
+    def __init__(self, model, X: np.ndarray):
+        self.model = model
+        self.X = X
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    def __init__(self, predict_proba, max_batch_rows: int = 4096, max_wait: float = 0.002):
+        """
+        Args:
+            predict_proba (callable): predict_proba(model, X) scoring a 2D array with a model
+            max_batch_rows (int): A batch is scored as soon as this many rows are waiting
+            max_wait (float): Seconds the first request of a batch waits for others to join it
+        """
+        self.predict_proba = predict_proba
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait
+
+        self.queue = queue.Queue()
+        self.queue_depth = Counter()
+        self.batch_rows = Counter()
+        self.batch_requests = Counter()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def submit(self, model, X: np.ndarray) -> np.ndarray:
+        """Blocks until the rows of X, in the feature order of `model`, are scored"""
+        self._ensure_started()
+        pending = PendingRequest(model, X)
+        self.queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "max_wait": self.max_wait,
+                "max_batch_rows": self.max_batch_rows,
+                # Histograms, as {bucket upper bound: count}
+                "queue_depth_histogram": dict(sorted(self.queue_depth.items())),
+                "batch_rows_histogram": dict(sorted(self.batch_rows.items())),
+                "batch_requests_histogram": dict(sorted(self.batch_requests.items())),
+            }
+
+    def _ensure_started(self):
+        # Threads do not survive a fork, so the batching thread is started in each worker rather than
+        # at import time, which may happen in the gunicorn master when preloading
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                threading.Thread(target=self._run, name="predict-batcher", daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            depth = self.queue.qsize()
+            rows = len(batch[0].X)
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_batch_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                rows += len(pending.X)
+
+            with self._lock:
+                self.queue_depth[bucket(depth)] += 1
+                self.batch_rows[bucket(rows)] += 1
+                self.batch_requests[bucket(len(batch))] += 1
+            self._score(batch)
+
+    def _score(self, batch: list):
+        by_model = defaultdict(list)
+        for pending in batch:
+            by_model[id(pending.model)].append(pending)
+
+        for requests in by_model.values():
+            try:
+                probabilities = self.predict_proba(requests[0].model, np.concatenate([p.X for p in requests]))
+                start = 0
+                for pending in requests:
+                    pending.result = probabilities[start:start + len(pending.X)]
+                    start += len(pending.X)
+            except Exception as e:
+                for pending in requests:
+                    pending.error = e
+            finally:
+                for pending in requests:
+                    pending.done.set()
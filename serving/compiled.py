@@ -0,0 +1,104 @@
+"""
+NumPy-only scoring of the linear models served by app.py. A fitted binary LogisticRegression, alone
+or at the end of a Pipeline of affine scalers (StandardScaler, MinMaxScaler, MaxAbsScaler), is
+compiled when loaded into a single weight vector and intercept, the scalers being folded into them.
+Scoring a batch is then one dot product and a sigmoid, without scikit-learn's input validation,
+which dominates predict_proba for batches of a few shots.
+
+Any other model, including a binary one fitted with multi_class="multinomial", is left to
+scikit-learn: `compile_model` returns None for it.
+"""
+import logging
+import warnings
+
+import numpy as np
+from scipy.special import expit
+
+
+logger = logging.getLogger(__name__)
+
+
+class LinearScorer:
+    def __init__(self, coef: np.ndarray, intercept: float, classes: np.ndarray):
+        """
+        Args:
+            coef (np.ndarray): Weight of each feature, in the model's feature order
+            intercept (float): Intercept of the decision function
+            classes (np.ndarray): The two classes of the model, the second one being the positive class
+        """
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.classes_ = classes
+        self.n_features_in_ = len(self.coef)
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        return X @ self.coef + self.intercept
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Same as the predict_proba of the compiled model, for a 2D float array of its features"""
+        probabilities = np.empty((len(X), 2))
+        probabilities[:, 1] = expit(self.decision_function(X))
+        np.subtract(1, probabilities[:, 1], out=probabilities[:, 0])
+        return probabilities
+
+
+def predict_proba(model, X: np.ndarray) -> np.ndarray:
+    """Single pass of a model, or of its LinearScorer, over a batch already in the model's feature order"""
+    if isinstance(model, LinearScorer):
+        return model.predict_proba(X)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        return model.predict_proba(X)
+
+
+def compile_model(model) -> LinearScorer:
+    """Compiles `model` into a LinearScorer, or returns None when it is not supported"""
+    steps = [step for _, step in getattr(model, "steps", [(None, model)]) if step not in (None, "passthrough")]
+    if not steps:
+        return None
+    estimator, transforms = steps[-1], steps[:-1]
+    if not is_binary_ovr(estimator):
+        return None
+
+    coef = np.asarray(estimator.coef_, dtype=np.float64).ravel()
+    intercept = float(np.asarray(estimator.intercept_).ravel()[0])
+    # Each scaler is x -> x * scale + offset; folded from the last one: w.(x * s + o) + b = (w * s).x + (w.o + b)
+    for transform in reversed(transforms):
+        affine = affine_transform(transform)
+        if affine is None:
+            logger.info(f"Not compiling {type(model).__name__}: unsupported step {type(transform).__name__}")
+            return None
+        scale, offset = affine
+        intercept += float(coef @ offset)
+        coef = coef * scale
+    return LinearScorer(coef, intercept, estimator.classes_)
+
+
+def is_binary_ovr(estimator) -> bool:
+    """
+    Whether `estimator` is a binary LogisticRegression scored with a sigmoid of its single decision
+    function. Binary models fitted with multi_class="multinomial" (still found in older pickles) are
+    scored by the releases that had that parameter with a softmax over (-d, d), i.e. a sigmoid of 2d,
+    and are left to scikit-learn.
+    """
+    if type(estimator).__name__ != "LogisticRegression" or len(getattr(estimator, "classes_", ())) != 2:
+        return False
+    if getattr(estimator, "multi_class", "auto") not in ("auto", "ovr", "warn", "deprecated"):
+        return False
+    return np.shape(estimator.coef_)[0] == 1 and np.size(estimator.intercept_) == 1
+
+
+def affine_transform(transform) -> tuple:
+    """(scale, offset) of a fitted affine scaler, such that it maps x to x * scale + offset; None if not one"""
+    name = type(transform).__name__
+    if name == "StandardScaler":
+        n_features = transform.n_features_in_
+        # mean_ is also fitted when with_mean is False, but not subtracted
+        scale = 1 / transform.scale_ if transform.with_std else np.ones(n_features)
+        mean = transform.mean_ if transform.with_mean else np.zeros(n_features)
+        return scale, -mean * scale
+    if name == "MinMaxScaler" and not transform.clip:
+        return transform.scale_, transform.min_
+    if name == "MaxAbsScaler":
+        return 1 / transform.scale_, np.zeros(transform.n_features_in_)
+    return None
@@ -0,0 +1,152 @@
+"""
+Featurization and scoring of NHL games within the service, for the /games/<id>/score endpoint of
+app.py: clients send the raw play-by-play of a game, or only its id resolved through a game source,
+instead of building feature frames themselves. The plays are featurized with the incremental
+GameState of the client package, so each call only parses the plays appended since the previous one,
+and the scored shots of each game are kept in a ShotStore.
+
+Games are kept in an LRU of at most `max_games` games per worker, per model. Shots are numbered in
+the order of the game and the same plays always give the same shots, so the cursor returned with
+each response (the number of shots scored so far) stays valid on any worker, and after a game was
+evicted and featurized again.
+"""
+from collections import OrderedDict
+import json
+import logging
+from pathlib import Path
+import threading
+
+import numpy as np
+import pandas as pd
+
+from ift6758.ift6758.client.game_client import GameState
+from ift6758.ift6758.client.metrics import Metrics, client_metrics
+from ift6758.ift6758.client.shot_store import ShotStore
+from schema import SchemaError
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocalGameSource:
+    def __init__(self, root: str):
+        """
+        Play-by-play payloads already on disk, as <root>/<game id>.json; the on-disk cache of
+        PlayByPlayFetcher (NHL_CACHE_DIR) is laid out the same way and can be used as is.
+        """
+        self.root = Path(root)
+
+    def get(self, game_id) -> dict:
+        """The play-by-play of `game_id`, or None if there is none"""
+        try:
+            with open(self.root / f"{game_id}.json") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Entries of the fetcher's cache wrap the payload along with its ETag
+        return data["payload"] if "payload" in data and "plays" not in data else data
+
+
+class ScoredGame:
+    def __init__(self, game_nhl: dict, metrics: Metrics = client_metrics):
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.reset(game_nhl)
+
+    def reset(self, game_nhl: dict):
+        self.state = GameState(game_nhl, self.metrics)
+        self.shots = ShotStore()
+
+    def since(self, cursor: int) -> dict:
+        """The scored shots from the `cursor`-th one on, column-wise (see ShotStore.to_columns)"""
+        return self.shots.to_columns(cursor)
+
+
+class GameStore:
+    def __init__(self, max_games: int = 64, metrics: Metrics = client_metrics):
+        """
+        Args:
+            max_games (int): Number of games kept per worker; the least recently scored are evicted
+            metrics (Metrics): Where the parse and features stages of the featurization are timed
+                (see ift6758/ift6758/client/metrics.py)
+        """
+        self.max_games = max_games
+        self.metrics = metrics
+        self._games = OrderedDict()
+        self._lock = threading.Lock()
+
+    def score(self, model_key: tuple, schema, game_nhl: dict, predict_proba, cursor: int = 0) -> dict:
+        """
+        Featurizes and scores the plays of `game_nhl` not seen yet for this model, then returns the
+        shots scored after `cursor` (column-wise, see `ScoredGame.since`), with the running xG of
+        each team and the cursor to send next.
+
+        Args:
+            model_key (tuple): Registry key of the model; each model has its own copy of the game
+            schema (FeatureSchema): Features of the model, taken from the columns of the shots
+            game_nhl (dict): Play-by-play of the game so far, as returned by the NHL API
+            predict_proba (callable): (n, 2) probabilities of a batch in the model's feature order
+            cursor (int): Number of shots the caller already has
+        """
+        game = self._game((model_key, game_nhl['id']), game_nhl)
+        with game.lock:
+            if len(game_nhl['plays']) < game.state.pointer:
+                # Plays were taken back (e.g. a revised payload): the game is featurized again
+                logger.info(f"Game {game_nhl['id']} has fewer plays than already scored, starting over")
+                game.reset(game_nhl)
+
+            new_shots = game.state.update(game_nhl)
+            if not new_shots.empty:
+                try:
+                    probability = score_shots(new_shots, schema, predict_proba)
+                except Exception:
+                    # The state already moved past these shots, which would never be scored
+                    game.reset(game_nhl)
+                    raise
+                game.shots.append(new_shots, probability)
+
+            return {
+                "game_id": game_nhl['id'],
+                "cursor": max(cursor, len(game.shots)),
+                "shots": game.since(cursor),
+                "xg": dict(game.shots.xg),
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"games": len(self._games), "max_games": self.max_games,
+                    "shots": sum(len(game.shots) for game in self._games.values())}
+
+    def _game(self, key: tuple, game_nhl: dict) -> ScoredGame:
+        with self._lock:
+            game = self._games.get(key)
+            if game is None:
+                game = self._games[key] = ScoredGame(game_nhl, self.metrics)
+                while len(self._games) > self.max_games:
+                    evicted, _ = self._games.popitem(last=False)
+                    logger.info(f"Evicted game {evicted[1]} scored with {evicted[0]}")
+            self._games.move_to_end(key)
+            return game
+
+
+def score_shots(shots: pd.DataFrame, schema, predict_proba) -> np.ndarray:
+    """
+    Probability of a goal of each shot, NaN for shots missing one of the model's features. Raises
+    SchemaError when the shots do not have the features of the model.
+    """
+    if schema.features is None:
+        raise SchemaError("The model was fitted without feature names, which cannot be found in the shots")
+    missing = [name for name in schema.features if name not in shots.columns]
+    if missing:
+        raise SchemaError(f"Missing features {missing} in the shots; the model expects {schema.features}")
+
+    try:
+        X = np.column_stack([shots[name].to_numpy(dtype=np.float64, na_value=np.nan) for name in schema.features])
+    except (TypeError, ValueError):
+        raise SchemaError(f"Some of the features {schema.features} of the shots are not numeric")
+    valid = np.isfinite(X).all(axis=1)
+
+    probability = np.full(len(shots), np.nan)
+    if valid.any():
+        probability[valid] = predict_proba(schema.from_array(X[valid]))[:, 1]
+    return probability
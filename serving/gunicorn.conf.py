@@ -0,0 +1,28 @@
+"""
+gunicorn settings of the serving app, overridable through the environment:
+
+    $ gunicorn -c gunicorn.conf.py app:app
+
+With GUNICORN_PRELOAD=1 the app, and so the default model, is loaded once in the master process before
+the workers are forked; the workers then share its memory pages copy-on-write. MODEL_MMAP_MODE=r
+(see app.py) memory-maps the model arrays instead, which also keeps them shared once workers are
+recycled or swap models. GET /worker reports the startup time and memory of each worker.
+"""
+import os
+import uuid
+
+
+# Shared by the workers of this run (inherited when they are forked), so that they follow each other's
+# model swaps but ignore the state file left by a previous run (see app.py)
+os.environ.setdefault("MODEL_STATE_GENERATION", uuid.uuid4().hex)
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+# More than one thread per worker switches to the gthread worker class, which lets PREDICT_BATCHING
+# coalesce the concurrent requests of a worker
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "0") == "1"
+
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} forked (preload_app={preload_app})")
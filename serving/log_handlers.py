@@ -0,0 +1,193 @@
+"""
+Logging of the serving app: records are formatted as JSON lines and written by a background thread
+(the request threads only enqueue them) to a log file rotated by size. `read_logs` serves windows of
+that file without loading it whole.
+
+Each gunicorn worker rotates the file on its own; with several workers a rotation may lose the few
+records written by the others while it happens.
+"""
+import atexit
+from datetime import datetime, timezone
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import os
+import queue
+import random
+
+
+LEVELS = {name: level for level, name in logging._levelToName.items()}
+READ_BLOCK_SIZE = 64 * 1024
+# Most records returned by one call of `read_logs`
+MAX_LIMIT = 1000
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(log_file: str, level: int = logging.INFO, max_bytes: int = 10 * 2**20, backup_count: int = 5):
+    """
+    Routes the records of the root logger through a queue to a rotating JSON-lines file, keeping at
+    most `backup_count` rotated files of `max_bytes` bytes.
+    """
+    global _listener
+
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_listener)
+    # The listener thread does not survive a fork (gunicorn preloading), so each child starts its own
+    os.register_at_fork(after_in_child=_restart_listener)
+
+
+def stop_listener():
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _restart_listener():
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+def log_payload(logger: logging.Logger, message: str, payload, sample_rate: float, max_chars: int = 2000):
+    """
+    Logs `payload` at INFO for a random fraction `sample_rate` of the calls, truncated to `max_chars`
+    characters; the payload is only rendered when sampled.
+    """
+    if sample_rate > 0 and random.random() < sample_rate:
+        logger.info("%s: %.*s", message, max_chars, payload)
+
+
+def parse_line(line: str) -> dict:
+    try:
+        return json.loads(line)
+    except ValueError:
+        # Line written before structured logging, e.g. "INFO:root:App initialized"
+        level = line.split(":", 1)[0]
+        return {"level": level if level in LEVELS else None, "message": line}
+
+
+def matches(entry: dict, min_level: int) -> bool:
+    return min_level <= 0 or LEVELS.get(entry.get("level"), 0) >= min_level
+
+
+def log_window(args) -> dict:
+    """
+    Keyword arguments of `read_logs` from the query parameters of a /logs request (limit, offset,
+    before and level), as given by Flask or Starlette. Raises ValueError, with a message for the
+    client, when they are not valid.
+    """
+    window = {"limit": 100, "offset": None, "before": None}
+    for name in window:
+        value = args.get(name)
+        if value is None:
+            continue
+        try:
+            window[name] = int(value)
+        except ValueError:
+            raise ValueError(f"{name} must be an integer, got {value!r}")
+    negative = any(window[name] is not None and window[name] < 0 for name in ("offset", "before"))
+    if window["limit"] < 1 or negative:
+        raise ValueError("limit must be at least 1, offset and before at least 0")
+    window["level"] = args.get("level")
+    return window
+
+
+def read_logs(log_file: str, limit: int = 100, offset: int = None, before: int = None, level: str = None) -> dict:
+    """
+    Reads at most `limit` records (clamped to 1..MAX_LIMIT) of at least `level` from the log file,
+    without reading the rest of it:
+
+    - forward from the byte `offset` when given, returning `next_offset` to continue from (e.g. to
+      follow the file);
+    - otherwise backward from the byte `before` (the end of the file by default), returning the last
+      records before it and `before_offset` to page further back.
+
+    Offsets are clamped to the file.
+    """
+    min_level = LEVELS.get(level.upper(), 0) if level else 0
+    limit = min(max(limit, 1), MAX_LIMIT)
+    size = os.path.getsize(log_file)
+
+    with open(log_file, "rb") as f:
+        if offset is not None:
+            entries, next_offset = _read_forward(f, min(max(offset, 0), size), limit, min_level)
+            return {"logs": entries, "next_offset": next_offset, "file_size": size}
+
+        end = size if before is None else min(max(before, 0), size)
+        entries, before_offset = _read_backward(f, end, limit, min_level)
+        return {"logs": entries, "before_offset": before_offset, "file_size": size}
+
+
+def _read_forward(f, offset: int, limit: int, min_level: int) -> tuple:
+    f.seek(offset)
+    entries = []
+    while len(entries) < limit:
+        line = f.readline()
+        if not line.endswith(b"\n"):
+            # Partial last line, still being written: it is read again from the same offset next time
+            break
+        offset += len(line)
+        entry = parse_line(line.decode("utf-8", errors="replace").rstrip("\n"))
+        if matches(entry, min_level):
+            entries.append(entry)
+    return entries, offset
+
+
+def _read_backward(f, end: int, limit: int, min_level: int) -> tuple:
+    entries = []
+    position, remainder, in_last_line = end, b"", True
+    while position > 0:
+        block_size = min(READ_BLOCK_SIZE, position)
+        position -= block_size
+        f.seek(position)
+        buffer = f.read(block_size) + remainder
+        if in_last_line:
+            # Skips a partial last line, still being written
+            if b"\n" not in buffer:
+                remainder = b""
+                continue
+            buffer = buffer[:buffer.rfind(b"\n") + 1]
+            in_last_line = False
+
+        lines, starts, start = buffer.split(b"\n"), [], position
+        for line in lines:
+            starts.append(start)
+            start += len(line) + 1
+        # Unless the start of the file is reached, the first line may begin in the previous block
+        remainder = lines[0] if position > 0 else b""
+        if position > 0:
+            lines, starts = lines[1:], starts[1:]
+
+        for line, start in zip(reversed(lines), reversed(starts)):
+            if not line:
+                continue
+            entry = parse_line(line.decode("utf-8", errors="replace"))
+            if matches(entry, min_level):
+                entries.append(entry)
+                if len(entries) == limit:
+                    return entries[::-1], start
+    return entries[::-1], 0
@@ -0,0 +1,117 @@
+"""
+Cache of the probabilities predicted for a feature vector, keyed by (model key, feature row).
+
+The dashboard sends the same shots again on every refresh, and a distance-only model sees the same
+few thousand distances (rounded to 0.1 ft) over and over: each batch is deduplicated, looked up, and
+only the rows never seen before are scored. Entries expire after `ttl` seconds and the least recently
+used ones are dropped beyond `max_entries`.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+import numpy as np
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int = 100_000, ttl: float = 3600.0):
+        """
+        Args:
+            max_entries (int): Maximum number of cached feature rows, over all models
+            ttl (float): Seconds after which a cached prediction is computed again
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        # {model key: {feature row bytes: (probabilities, expiry)}}, least recently used first
+        self._models = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def predict(self, model_key: tuple, X: np.ndarray, predict_proba) -> np.ndarray:
+        """
+        Probabilities of the rows of X with the model of `model_key`, calling predict_proba(rows)
+        only on the distinct rows that are not cached.
+        """
+        if len(X) == 0:
+            return predict_proba(X)
+
+        X = np.ascontiguousarray(X)
+        # Each row as a single opaque value, so rows are deduplicated and hashed as a whole
+        rows = X.view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+        unique, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+        keys = unique.tolist()
+
+        now = time.monotonic()
+        hit_index, hit_values, missing = [], [], []
+        with self._lock:
+            entries = self._models.setdefault(model_key, OrderedDict())
+            self._models.move_to_end(model_key)
+            for i, key in enumerate(keys):
+                entry = entries.get(key)
+                if entry is not None and entry[1] > now:
+                    entries.move_to_end(key)
+                    hit_index.append(i)
+                    hit_values.append(entry[0])
+                else:
+                    missing.append(i)
+
+        if missing:
+            computed = predict_proba(X[first[missing]])
+            probabilities = np.empty((len(unique), computed.shape[1]), dtype=computed.dtype)
+            probabilities[missing] = computed
+        else:
+            probabilities = np.empty((len(unique), len(hit_values[0])))
+        if hit_index:
+            probabilities[hit_index] = hit_values
+
+        with self._lock:
+            self.hits += len(X) - len(missing)
+            self.misses += len(missing)
+            if missing:
+                entries = self._models.setdefault(model_key, OrderedDict())
+                expires = now + self.ttl
+                for i, values in zip(missing, computed.tolist()):
+                    self._size += keys[i] not in entries
+                    entries[keys[i]] = (values, expires)
+                    entries.move_to_end(keys[i])
+                self._evict()
+
+        return probabilities[inverse.ravel()]
+
+    def invalidate(self, model_key: tuple = None):
+        """Drops the cached predictions of `model_key`, or of every model when None"""
+        with self._lock:
+            if model_key is None:
+                self._models.clear()
+                self._size = 0
+            elif model_key in self._models:
+                self._size -= len(self._models.pop(model_key))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                # Rows served without being scored (cached, or repeated within their batch) and rows scored
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+            }
+
+    def _evict(self):
+        # Least recently used rows of the least recently used models first
+        while self._size > self.max_entries:
+            model_key, entries = next(iter(self._models.items()))
+            if not entries:
+                del self._models[model_key]
+                continue
+            entries.popitem(last=False)
+            self._size -= 1
+            self.evictions += 1
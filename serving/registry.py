@@ -0,0 +1,326 @@
+"""
+In-process registry of the models served by app.py, keyed by (workspace, model, version).
+
+Loaded estimators are kept in an LRU bounded by a memory budget, so switching back and forth between
+models does not download and unpickle them again. Swapping the current model is a single reference
+assignment: requests that already picked their model keep using it until they complete. Swaps made by
+other gunicorn workers are picked up by a background thread of each worker, so no request waits for
+the download and load of the new model.
+"""
+from collections import OrderedDict
+from contextlib import nullcontext
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+
+import joblib
+
+from compiled import compile_model, predict_proba
+from schema import FeatureSchema
+from xg_table import XGTable
+
+
+logger = logging.getLogger(__name__)
+
+
+def model_key(workspace: str, model: str, version) -> tuple:
+    return (str(workspace), str(model), str(version).lstrip("v"))
+
+
+def find_model_file(artifact_dir: Path) -> Path:
+    model_files = sorted(Path(artifact_dir).glob("*.pkl"))
+    if not model_files:
+        raise FileNotFoundError(f"No model file (*.pkl) in {artifact_dir}")
+    return model_files[0]
+
+
+class LocalArtifactSource:
+    def __init__(self, root: str):
+        """Artifacts already on disk, laid out as <root>/<workspace>/<model>/v<version>/<file>.pkl"""
+        self.root = Path(root)
+
+    def download(self, workspace: str, model: str, version: str) -> Path:
+        return find_model_file(self.root / workspace / model / f"v{version}")
+
+
+class WandbArtifactSource:
+    def __init__(self, root: str):
+        """
+        Artifacts of the W&B model registry, downloaded once to <root>/<workspace>/<model>/v<version>.
+        Uses the public API rather than a run, so nothing is logged to W&B when a model is fetched.
+        """
+        self.root = Path(root)
+        self._api = None
+
+    def download(self, workspace: str, model: str, version: str) -> Path:
+        artifact_dir = self.root / workspace / model / f"v{version}"
+        if not any(artifact_dir.glob("*.pkl")):
+            import wandb
+
+            if self._api is None:
+                wandb.login(key=os.environ.get("WANDB_API_KEY"))
+                self._api = wandb.Api()
+            self._api.artifact(f"{workspace}/{model}:v{version}").download(root=str(artifact_dir))
+        return find_model_file(artifact_dir)
+
+
+class ModelEntry:
+    def __init__(self, key: tuple, model, nbytes: int, compile: bool = False, xg_table_resolution: float = None):
+        self.key = key
+        self.model = model
+        self.nbytes = nbytes
+        self.name = f"{key[1]}_v{key[2]}"
+        # Feature order and dtypes, against which the batches scored with this model are validated
+        self.schema = FeatureSchema.from_model(model)
+        # NumPy scorer equivalent to model.predict_proba, if the model is supported (see compiled.py)
+        self.scorer = compile_model(model) if compile else None
+        # Side of the cells of the goal probability over the rink, for binary models of the shot location
+        # only (see xg_table.py); the table is built by `build_xg_table`, as loads must stay fast
+        self.xg_table_resolution = xg_table_resolution if xg_table_resolution and \
+            XGTable.supports(self.schema.features) and len(getattr(model, "classes_", ())) == 2 else None
+        self.xg_table = None
+        self._xg_table_lock = threading.Lock()
+        # Process that started building the table in the background; threads do not survive a fork
+        self._xg_table_pid = None
+
+    def build_xg_table(self) -> XGTable:
+        """The xG table of the model, built by the first call; None if the model cannot have one"""
+        if self.xg_table is None and self.xg_table_resolution is not None:
+            with self._xg_table_lock:
+                if self.xg_table is None:
+                    table = XGTable.build(self.predict_proba, self.schema.features, self.xg_table_resolution)
+                    logger.info(f"Built the xG table of {self.name} at {self.xg_table_resolution} ft, "
+                                f"max error {table.error['max']:.2e}")
+                    self.xg_table = table
+        return self.xg_table
+
+    def build_xg_table_in_background(self):
+        """Starts building the xG table in a thread of this process, unless one already did"""
+        if self.xg_table is not None or self.xg_table_resolution is None or self._xg_table_pid == os.getpid():
+            return
+        self._xg_table_pid = os.getpid()
+        threading.Thread(target=self._build_xg_table_quietly, name=f"xg-table-{self.name}", daemon=True).start()
+
+    def _build_xg_table_quietly(self):
+        try:
+            self.build_xg_table()
+        except Exception as e:
+            logger.error(f"Failed to build the xG table of {self.name}: {e}")
+
+    def predict_proba(self, X):
+        """Probabilities of a batch in the model's feature order, with its compiled scorer if any"""
+        return predict_proba(self.scorer if self.scorer is not None else self.model, X)
+
+
+class ModelRegistry:
+    def __init__(self, source, memory_budget: int = 256 * 2**20, state_file: str = None,
+                 sync_interval: float = 1.0, mmap_mode: str = None, metrics=None, on_swap=None,
+                 compile_models: bool = False, xg_table_resolution: float = None, generation: str = None):
+        """
+        Args:
+            source: Object whose download(workspace, model, version) returns the path of a model file
+            memory_budget (int): Bytes of models (as pickled on disk) kept loaded; the current model
+                is never evicted
+            state_file (str): File recording the current model, so that a swap made in one gunicorn
+                worker is picked up by the others
+            sync_interval (float): Seconds between two checks of `state_file` by the background thread
+            generation (str): Identifier of the run of the service, shared by its workers and recorded in
+                `state_file`; a file written by another run (e.g. before a restart) is ignored
+            mmap_mode (str): Passed to joblib.load; with 'r' the numeric arrays of the models are
+                memory-mapped read-only, so every worker shares the same pages of the page cache
+            metrics (Metrics): When given, downloads and loads are timed as the "model_download" and
+                "model_load" stages (see ift6758/ift6758/client/metrics.py)
+            on_swap (callable): Called with the new current ModelEntry whenever the current model
+                changes, in this worker or, through `state_file`, in another one
+            compile_models (bool): Compile the supported models into NumPy scorers when they are
+                loaded (see compiled.py)
+            xg_table_resolution (float): When set, geometry-only models can have a table of their goal
+                probability over the rink, with cells of this side in feet (see xg_table.py and
+                `ModelEntry.build_xg_table`)
+        """
+        self.source = source
+        self.mmap_mode = mmap_mode
+        self.memory_budget = memory_budget
+        self.state_file = Path(state_file) if state_file else None
+        self.sync_interval = sync_interval
+        self.metrics = metrics
+        self.on_swap = on_swap
+        self.compile_models = compile_models
+        self.xg_table_resolution = xg_table_resolution
+        self.generation = generation
+        # Model of `state_file` that could not be switched to, as {"key": ..., "error": ...}, until a sync succeeds
+        self.sync_error = None
+
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._current = None
+        self._lock = threading.Lock()
+        self._state_mtime = None
+        # Process whose background thread follows `state_file`; threads do not survive a fork
+        self._sync_pid = None
+
+    def get(self, key: tuple = None) -> ModelEntry:
+        """Returns the model of `key`, loading it if needed, or the current model if `key` is None"""
+        if key is None:
+            return self.current()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Only the requests needing this model wait for it; concurrent requests for the same model
+        # share a single download and load
+        try:
+            with load_lock:
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is None:
+                    with self._timer("model_download"):
+                        path = self.source.download(*key)
+                    entry = self.load(key, path)
+        finally:
+            with self._lock:
+                if self._loading.get(key) is load_lock:
+                    del self._loading[key]
+        return entry
+
+    def load(self, key: tuple, path: Path) -> ModelEntry:
+        """Loads the model file at `path` under `key`"""
+        with self._timer("model_load"):
+            model = joblib.load(path, mmap_mode=self.mmap_mode)
+        entry = self.add(key, model, Path(path).stat().st_size)
+        logger.info(f"Loaded model {entry.name} from {path}" + (" (compiled)" if entry.scorer is not None else ""))
+        return entry
+
+    def add(self, key: tuple, model, nbytes: int = 0) -> ModelEntry:
+        entry = ModelEntry(key, model, nbytes, compile=self.compile_models,
+                           xg_table_resolution=self.xg_table_resolution)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+        return entry
+
+    def swap(self, key: tuple, record: bool = True) -> ModelEntry:
+        """
+        Makes `key` the current model, once it is loaded. Unless `record` is False, the swap is recorded
+        in `state_file` for the other workers to follow.
+        """
+        entry = self.get(key)
+        with self._lock:
+            self._current = entry
+            self._evict()
+        if record:
+            self._write_state(key)
+        if self.on_swap is not None:
+            self.on_swap(entry)
+        return entry
+
+    def current(self) -> ModelEntry:
+        """
+        The current model. The first call of a process starts the thread picking up the swaps of
+        other workers (see `sync`), so a gunicorn master preloading the app never loads them.
+        """
+        self._start_syncing()
+        return self._current
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "current": None if self._current is None else self._current.name,
+                "loaded": [entry.name for entry in self._entries.values()],
+                "bytes": sum(entry.nbytes for entry in self._entries.values()),
+                "memory_budget": self.memory_budget,
+            }
+
+    def _timer(self, stage: str):
+        return self.metrics.timer(stage) if self.metrics is not None else nullcontext()
+
+    def _evict(self):
+        total = sum(entry.nbytes for entry in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.memory_budget:
+                break
+            entry = self._entries[key]
+            if entry is self._current:
+                continue
+            del self._entries[key]
+            total -= entry.nbytes
+            logger.info(f"Evicted model {entry.name}")
+
+    def _write_state(self, key: tuple):
+        if self.state_file is None:
+            return
+        tmp_file = self.state_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump({"generation": self.generation, "key": list(key)}, f)
+        os.replace(tmp_file, self.state_file)
+        self._state_mtime = self.state_file.stat().st_mtime_ns
+
+    def sync(self) -> ModelEntry:
+        """
+        Makes the model recorded in `state_file` by another worker of this generation the current one,
+        downloading and loading it if need be, then returns the current model. A model that cannot be
+        switched to leaves the current one in place; the failure is logged once, kept in `sync_error`
+        and retried at the next call.
+        """
+        if self.state_file is None:
+            return self._current
+        try:
+            mtime = self.state_file.stat().st_mtime_ns
+            if mtime == self._state_mtime:
+                return self._current
+            with open(self.state_file) as f:
+                state = json.load(f)
+            key = tuple(state["key"])
+            generation = state["generation"]
+        except (OSError, ValueError, TypeError, KeyError):
+            return self._current
+
+        if generation != self.generation:
+            # Left by a previous run of the service, whose swaps do not outlive it
+            self._state_mtime = mtime
+            return self._current
+
+        if self._current is None or self._current.key != key:
+            try:
+                entry = self.get(key)
+            except Exception as e:
+                error = {"key": list(key), "error": f"{type(e).__name__}: {e}"}
+                if error != self.sync_error:
+                    current = None if self._current is None else self._current.name
+                    logger.error(f"Failed to switch to model {key} set by another worker, keeping {current}: {e}")
+                self.sync_error = error
+                return self._current
+            logger.info(f"Switched to model {key} set by another worker")
+            with self._lock:
+                self._current = entry
+            if self.on_swap is not None:
+                self.on_swap(entry)
+        self.sync_error = None
+        self._state_mtime = mtime
+        return self._current
+
+    def _start_syncing(self):
+        if self.state_file is None or self._sync_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sync_pid == os.getpid():
+                return
+            self._sync_pid = os.getpid()
+        threading.Thread(target=self._sync_forever, name="model-sync", daemon=True).start()
+
+    def _sync_forever(self):
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                # Raised by on_swap; the state file is read again at the next check
+                logger.error(f"Failed to follow the model set by another worker: {e}")
@@ -0,0 +1,128 @@
+"""
+Feature schema of a served model (feature order and dtypes), built once when the model is loaded.
+
+Incoming batches are validated column by column against it and converted straight to a C-contiguous
+float64 array in the model's feature order, without building a DataFrame, so a client sending the
+wrong columns gets a clear error instead of an exception from inside the model.
+"""
+import numpy as np
+
+
+FEATURE_DTYPE = np.float64
+
+
+class SchemaError(ValueError):
+    """A batch does not match the feature schema of the model"""
+
+
+class FeatureSchema:
+    def __init__(self, features: list, n_features: int, allow_nan: bool = True):
+        """
+        Args:
+            features (list): Feature names, in the order the model expects them; None when the model
+                was fitted without names, in which case columns are taken in the order received
+            n_features (int): Number of features
+            allow_nan (bool): Whether the model accepts missing values
+        """
+        self.features = features
+        self.n_features = n_features
+        self.allow_nan = allow_nan
+        self.dtypes = [np.dtype(FEATURE_DTYPE).name] * n_features
+
+    @classmethod
+    def from_model(cls, model) -> "FeatureSchema":
+        names = getattr(model, "feature_names_in_", None)
+        n_features = getattr(model, "n_features_in_", None)
+        if n_features is None:
+            n_features = len(names) if names is not None else 0
+        try:
+            allow_nan = model.__sklearn_tags__().input_tags.allow_nan
+        except AttributeError:
+            allow_nan = True
+        return cls(None if names is None else [str(name) for name in names], int(n_features), allow_nan)
+
+    def to_dict(self) -> dict:
+        return {"features": self.features, "dtypes": self.dtypes, "n_features": self.n_features,
+                "allow_nan": self.allow_nan}
+
+    def from_columns(self, columns: dict, n_rows: int) -> np.ndarray:
+        """
+        Builds the batch from a mapping of column name to values (list or 1D array of n_rows values),
+        e.g. the columns of a JSON body or of an Arrow table. Extra columns are ignored.
+        """
+        names = self.features if self.features is not None else list(columns)
+        self._check_names(list(columns), names)
+
+        X = np.empty((n_rows, self.n_features), dtype=FEATURE_DTYPE)
+        for j, name in enumerate(names):
+            values = columns[name]
+            if len(values) != n_rows:
+                raise SchemaError(f"Column {name} has {len(values)} values, expected {n_rows}")
+            X[:, j] = self._convert(name, values)
+        return self._check_values(X)
+
+    def from_records(self, records: list) -> np.ndarray:
+        """Builds the batch from a list of {name: value} records (DataFrame.to_json(orient='records'))"""
+        if not records:
+            return np.empty((0, self.n_features), dtype=FEATURE_DTYPE)
+        names = self.features if self.features is not None else list(records[0])
+        try:
+            columns = {name: [record[name] for record in records] for name in names}
+        except KeyError as e:
+            raise SchemaError(f"Missing feature {e.args[0]} in some records; expected {names}")
+        except TypeError:
+            raise SchemaError("Records must be JSON objects")
+        return self.from_columns(columns, len(records))
+
+    def from_array(self, X: np.ndarray, names: list = None) -> np.ndarray:
+        """Validates a 2D array whose columns are `names` (the model's order when None)"""
+        if X.ndim != 2:
+            raise SchemaError(f"Expected a 2D array, got {X.ndim} dimensions")
+        if X.dtype.kind not in "biuf":
+            raise SchemaError(f"Expected a numeric array, got dtype {X.dtype}")
+
+        if names is not None and self.features is not None and list(names) != self.features:
+            self._check_names(names, self.features)
+            X = X[:, [list(names).index(name) for name in self.features]]
+        elif X.shape[1] != self.n_features:
+            raise SchemaError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        return self._check_values(np.ascontiguousarray(X, dtype=FEATURE_DTYPE))
+
+    def from_json(self, data) -> np.ndarray:
+        """
+        Builds the batch from a decoded JSON body: a list of records, or a mapping of column name to
+        a list of values or to a {row: value} mapping (DataFrame.to_json() default orient)
+        """
+        if isinstance(data, list):
+            return self.from_records(data)
+        if not isinstance(data, dict):
+            raise SchemaError("Expected a list of records or a mapping of columns")
+        if not all(isinstance(values, (list, dict)) for values in data.values()):
+            raise SchemaError("Columns must be lists of values or {row: value} mappings")
+        columns = {name: list(values.values()) if isinstance(values, dict) else values
+                   for name, values in data.items()}
+        n_rows = len(next(iter(columns.values()))) if columns else 0
+        return self.from_columns(columns, n_rows)
+
+    def _check_names(self, received: list, expected: list):
+        missing = [name for name in expected if name not in received]
+        if missing:
+            raise SchemaError(f"Missing features {missing}; the model expects {expected}")
+        if self.features is None and len(expected) != self.n_features:
+            raise SchemaError(f"Expected {self.n_features} features, got {len(expected)}")
+
+    def _convert(self, name: str, values) -> np.ndarray:
+        try:
+            # None (JSON null) becomes NaN
+            return np.asarray(values, dtype=FEATURE_DTYPE)
+        except (TypeError, ValueError):
+            raise SchemaError(f"Feature {name} is not numeric")
+
+    def _check_values(self, X: np.ndarray) -> np.ndarray:
+        if not self.allow_nan:
+            finite = np.isfinite(X).all(axis=0)
+            if not finite.all():
+                names = self.features or [str(j) for j in range(self.n_features)]
+                invalid = [name for name, ok in zip(names, finite) if not ok]
+                raise SchemaError(f"Features {invalid} have missing or infinite values")
+        return X
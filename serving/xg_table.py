@@ -0,0 +1,161 @@
+"""
+Precomputed goal probabilities of geometry-only models, those whose features are shotDistance and
+optionally shotAngle. Once zoneshoot has normalized the coordinates of a shot (see
+client/features.py), these features only depend on where on the rink it was taken, towards the goal
+at (0, 89). The model is therefore evaluated once, at the centre of each cell of a grid over the
+200 x 85 ft rink, and a batch is then scored by mapping its features back to cells and gathering
+their probabilities. Models of shotDistance alone are instead evaluated at every DISTANCE_STEP feet
+from the goal, the precision shot_features rounds distances to, and their grid is derived from
+these. The same table backs the /heatmap of app.py.
+
+The error of the table against the model is measured when it is built, on shots at random
+locations. Gathering from the table is slower than the dot product of a compiled logistic regression
+(see compiled.py) but much faster than, e.g., a random forest: app.py scores /predict from the tables
+of models that are not compiled, if their error is within XG_TABLE_MAX_ERROR. Tables are built by
+registry.ModelEntry on the first /heatmap, or in the background for the models they would score.
+"""
+import numpy as np
+
+
+RINK_LENGTH = 200.0
+RINK_WIDTH = 85.0
+GOAL_X, GOAL_Y = 0.0, 89.0
+GEOMETRY_FEATURES = ("shotDistance", "shotAngle")
+# Close to the goal, the angle changes too fast across a cell, and the probability with the distance,
+# for the table to be accurate: shots within this many cells of the goal are scored by the model
+NEAR_GOAL_CELLS = 10
+# Distances of shots are rounded to a tenth of a foot; the farthest point of the rink from the goal
+DISTANCE_STEP = 0.1
+MAX_DISTANCE = float(np.hypot(RINK_WIDTH / 2, RINK_LENGTH / 2 + GOAL_Y))
+
+
+def shot_geometry(x: np.ndarray, y: np.ndarray) -> tuple:
+    """shotDistance and shotAngle of shots at normalized coordinates (x, y), as computed by shot_features"""
+    dx, dy = x - GOAL_X, y - GOAL_Y
+    distance = np.sqrt(dx * dx + dy * dy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Angle with the goal axis (0, -89)
+        cos_angle = -dy / distance
+    angle = np.where(distance == 0, 0.0, np.degrees(np.arccos(np.clip(cos_angle, -1.0, 1.0))))
+    return np.round(distance, decimals=1), angle
+
+
+class XGTable:
+    def __init__(self, probabilities: np.ndarray, features: list, resolution: float, error: dict = None,
+                 by_distance: np.ndarray = None):
+        """
+        Args:
+            probabilities (np.ndarray): Goal probability at the centre of each cell, one row per
+                `resolution` feet along the rink from y = -100, one column per `resolution` feet across
+                it from x = -42.5
+            features (list): Features of the model, in its order
+            resolution (float): Side of the cells, in feet
+            error (dict): Absolute error against the model, as measured by `measure_error`
+            by_distance (np.ndarray): For models of shotDistance alone, goal probability at every
+                DISTANCE_STEP feet from the goal, which shots are scored from instead of the cells
+        """
+        self.probabilities = probabilities
+        self.features = list(features)
+        self.resolution = resolution
+        self.error = error
+        self.by_distance = by_distance
+
+    @staticmethod
+    def supports(features: list) -> bool:
+        return bool(features) and "shotDistance" in features and set(features) <= set(GEOMETRY_FEATURES)
+
+    @classmethod
+    def build(cls, predict_proba, features: list, resolution: float = 0.5, error_samples: int = 20000,
+              seed: int = 0) -> "XGTable":
+        """
+        Evaluates a model at the centre of every cell, then measures the error of the table.
+
+        Args:
+            predict_proba (callable): Probabilities of a 2D array of `features`, e.g. model.predict_proba
+            features (list): Features of the model, in its order
+            resolution (float): Side of the cells, in feet
+            error_samples (int): Number of random shots the error is measured on
+            seed (int): Seed of the random shots
+        """
+        n_rows, n_cols = int(np.ceil(RINK_LENGTH / resolution)), int(np.ceil(RINK_WIDTH / resolution))
+        y = -RINK_LENGTH / 2 + resolution * (np.arange(n_rows) + 0.5)
+        x = -RINK_WIDTH / 2 + resolution * (np.arange(n_cols) + 0.5)
+        grid_x, grid_y = np.meshgrid(x, y)
+        if list(features) == ["shotDistance"]:
+            distances = DISTANCE_STEP * np.arange(int(np.ceil(MAX_DISTANCE / DISTANCE_STEP)) + 1)
+            by_distance = predict_proba(distances[:, None])[:, 1].astype(np.float32)
+            grid_distance = shot_geometry(grid_x.ravel(), grid_y.ravel())[0]
+            probabilities = by_distance[np.rint(grid_distance / DISTANCE_STEP).astype(np.intp)]
+        else:
+            by_distance = None
+            probabilities = predict_proba(cls.features_at(grid_x.ravel(), grid_y.ravel(), features))[:, 1]
+
+        table = cls(probabilities.reshape(n_rows, n_cols).astype(np.float32), features, resolution,
+                    by_distance=by_distance)
+        table.error = table.measure_error(predict_proba, error_samples, seed)
+        return table
+
+    @staticmethod
+    def features_at(x: np.ndarray, y: np.ndarray, features: list) -> np.ndarray:
+        distance, angle = shot_geometry(x, y)
+        columns = {"shotDistance": distance, "shotAngle": angle}
+        return np.column_stack([columns[name] for name in features])
+
+    def gather(self, X: np.ndarray) -> tuple:
+        """Goal probability of each shot of X in the table, and whether it can be scored from the table"""
+        distance = X[:, self.features.index("shotDistance")]
+        # Also False for missing distances
+        inside = distance >= NEAR_GOAL_CELLS * self.resolution
+        if self.by_distance is not None:
+            index = np.rint(np.where(inside, distance, 0) / DISTANCE_STEP)
+            inside &= index < len(self.by_distance)
+            return self.by_distance[np.where(inside, index, 0).astype(np.intp)], inside
+
+        angle = np.radians(X[:, self.features.index("shotAngle")])
+        x, y = GOAL_X + distance * np.sin(angle), GOAL_Y - distance * np.cos(angle)
+        inside &= (np.abs(x) <= RINK_WIDTH / 2) & (np.abs(y) <= RINK_LENGTH / 2)
+        n_rows, n_cols = self.probabilities.shape
+        rows = np.minimum(np.where(inside, (y + RINK_LENGTH / 2) // self.resolution, 0).astype(np.intp), n_rows - 1)
+        cols = np.minimum(np.where(inside, (x + RINK_WIDTH / 2) // self.resolution, 0).astype(np.intp), n_cols - 1)
+        return self.probabilities[rows, cols], inside
+
+    def predict_proba(self, X: np.ndarray, fallback) -> np.ndarray:
+        """
+        (n, 2) probabilities of the shots of X (in the model's feature order), gathered from the
+        table; shots off the rink, too close to the goal (see NEAR_GOAL_CELLS) or with missing
+        features are scored with fallback(rows) instead.
+        """
+        goal, inside = self.gather(X)
+        probabilities = np.empty((len(X), 2))
+        probabilities[:, 1] = goal
+        np.subtract(1, probabilities[:, 1], out=probabilities[:, 0])
+        if not inside.all():
+            probabilities[~inside] = fallback(X[~inside])
+        return probabilities
+
+    def measure_error(self, predict_proba, n_samples: int = 20000, seed: int = 0) -> dict:
+        """
+        Maximum, 99th percentile and mean absolute error of the table against `predict_proba`, on shots
+        anywhere on the rink, and the fraction of them scored from the table (`coverage`)
+        """
+        rng = np.random.default_rng(seed)
+        x = rng.uniform(-RINK_WIDTH / 2, RINK_WIDTH / 2, n_samples)
+        y = rng.uniform(-RINK_LENGTH / 2, RINK_LENGTH / 2, n_samples)
+        X = self.features_at(x, y, self.features)
+        error = np.abs(self.predict_proba(X, predict_proba)[:, 1] - predict_proba(X)[:, 1])
+        return {"max": float(error.max()), "p99": float(np.percentile(error, 99)), "mean": float(error.mean()),
+                "samples": n_samples, "coverage": float(self.gather(X)[1].mean())}
+
+    def to_dict(self) -> dict:
+        """Description of the table, without the probabilities"""
+        return {
+            "features": self.features,
+            "resolution": self.resolution,
+            # Step of the distances the shots of models of shotDistance alone are scored at
+            "distance_step": DISTANCE_STEP if self.by_distance is not None else None,
+            "shape": list(self.probabilities.shape),
+            "x": [-RINK_WIDTH / 2, -RINK_WIDTH / 2 + self.resolution * self.probabilities.shape[1]],
+            "y": [-RINK_LENGTH / 2, -RINK_LENGTH / 2 + self.resolution * self.probabilities.shape[0]],
+            "goal": [GOAL_X, GOAL_Y],
+            "error": self.error,
+        }
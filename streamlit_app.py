@@ -1,44 +1,65 @@
+import queue
+
 import streamlit as st
-import pandas as pd
-import requests
 from ift6758.ift6758.client.serving_client import ServingClient
 from ift6758.ift6758.client.game_client import GameClient
+from ift6758.ift6758.client.live import LiveGames
+
+# Seconds between two checks of a session for deltas of its game; only the live game panel re-renders
+REFRESH_SECONDS = 2.0
+# Deltas left unread before a session is unsubscribed (e.g. its browser tab was closed)
+MAX_PENDING_DELTAS = 100
+
+# Set up IP address for clients
+ip = "serving"
+
+
+# The clients and the refresher are shared by every browser session: a game followed by several
+# viewers is fetched, featurized and scored once per poll, and each session only receives its deltas
+@st.cache_resource
+def get_serving_client() -> ServingClient:
+    serving_client = ServingClient(ip=ip)
+    try:
+        # Features of the model currently served
+        serving_client.model_info()
+    except Exception as e:
+        st.warning(f"Could not get the model info: {e}")
+    return serving_client
+
+
+@st.cache_resource
+def get_game_client() -> GameClient:
+    return GameClient(ip)
+
+
+@st.cache_resource
+def get_live_games() -> LiveGames:
+    return LiveGames(get_game_client(), get_serving_client())
+
 
 # Utility function to reset session state
 def reset_session_state():
-    session_keys = [
-        "home_team", "away_team", "period", "period_time_remaining",
-        "home_score", "away_score", "home_xg", "away_xg",
-        "play_by_play", "last_ping_id"
-    ]
+    session_keys = ["game_id", "game", "xg", "updates", "unsubscribe"]
     for key in session_keys:
         st.session_state[key] = None
 
-# Utility function to reset session state for a specific game ID
-def reset_game_state(game_id):
-    st.session_state.play_by_play_data[game_id] = pd.DataFrame()
-
-# Initialize dictionary for storing play_by_play data for each game
-if "play_by_play_data" not in st.session_state:
-    st.session_state.play_by_play_data = {}
 
-# Initialize session state variables
-if "home_team" not in st.session_state:
+# Utility function to follow a game, replacing the one followed so far
+def follow_game(game_id):
+    if st.session_state.unsubscribe is not None:
+        st.session_state.unsubscribe()
     reset_session_state()
-    st.session_state.ping_game_clicked = False
+    st.session_state.game_id = game_id
+    st.session_state.updates = queue.Queue(MAX_PENDING_DELTAS)
+    st.session_state.unsubscribe = live_games.subscribe(game_id, st.session_state.updates.put_nowait)
 
-# Set up IP address for clients
-ip = "serving"
 
-# Initialize ServingClient
-if "serving_client" not in st.session_state:
-    st.session_state.serving_client = ServingClient(ip="serving")
-serving_client = st.session_state.serving_client
+# Initialize session state variables
+if "game_id" not in st.session_state:
+    reset_session_state()
 
-# Initialize GameClient
-if "game_client" not in st.session_state:
-    st.session_state.game_client = GameClient(ip)
-game_client = st.session_state.game_client
+serving_client = get_serving_client()
+live_games = get_live_games()
 
 # App title
 st.title("Hockey Visualization App")
@@ -46,7 +67,7 @@ st.title("Hockey Visualization App")
 # Sidebar: Model Configuration
 with st.sidebar:
     st.header("Model Configuration")
-    
+
     available_workspaces = ["philippe-bergeron-7-universit-de-montr-al-org/wandb-registry-model"]
     available_models = ["Logistic regression"]
     available_versions = ["v6 (distance)", "v5 (distance + angle)"]
@@ -71,93 +92,60 @@ with st.sidebar:
 # Game ID input and logic
 with st.container():
     game_id = st.text_input("Game ID", "")
-    
-    if st.button("Ping Game"):
-        st.session_state.ping_game_clicked = True
-        if game_id:
-            if game_id not in st.session_state.play_by_play_data:
-                reset_game_state(game_id)  # Initialize play_by_play data for new game IDs
-            
-            # Update the last pinged game ID
-            st.session_state.last_ping_id = game_id
 
-            try:
-                nhl_url = f"https://api-web.nhle.com/v1/gamecenter/{game_id}/play-by-play"
-                response = requests.get(nhl_url)
-                if response.status_code == 200:
-                    game_data = response.json()
-                    
-                    # Store game-specific data in session state
-                    st.session_state.home_team = game_data['homeTeam']['commonName']['default']
-                    st.session_state.away_team = game_data['awayTeam']['commonName']['default']
-                    st.session_state.period = game_data['periodDescriptor']['number']
-                    st.session_state.period_time_remaining = game_data['clock']['timeRemaining']
-                    st.session_state.home_score = game_data['homeTeam']['score']
-                    st.session_state.away_score = game_data['awayTeam']['score']
-
-                    st.success("Game data fetched successfully!")
-                else:
-                    st.error("Invalid Game ID or API error.")
-            except Exception as e:
-                st.error(f"Error fetching game data: {e}")
+    if st.button("Follow Game"):
+        if game_id.strip().isdigit():
+            # Shots, probabilities and xG are then pushed as the game goes, see live_game below
+            follow_game(int(game_id))
         else:
             st.warning("Please enter a Game ID.")
 
-# Display game info and predictions
+
+# Display game info and predictions; reruns on its own every REFRESH_SECONDS, without the rest of the page
+@st.fragment(run_every=REFRESH_SECONDS)
+def live_game():
+    current_game_id = st.session_state.game_id
+    if current_game_id is None:
+        st.info("Enter a Game ID and click 'Follow Game' to view game details.")
+        return
+
+    # Deltas pushed since the last run: the latest score, clock and running xG of the game
+    updates = st.session_state.updates
+    while True:
+        try:
+            delta = updates.get_nowait()
+        except queue.Empty:
+            break
+        st.session_state.game = delta["game"]
+        st.session_state.xg = delta["xg"]
+
+    game = st.session_state.game
+    if game is None:
+        st.info(f"Waiting for the play-by-play of game {current_game_id}...")
+        return
+
+    st.subheader(f"Game {current_game_id}: {game['home_team']} vs {game['away_team']}")
+    st.markdown(f"**Period {game['period']} - {game['time_remaining']} left**")
+
+    col1, col2 = st.columns(2)
+    for col, side in ((col1, "home"), (col2, "away")):
+        team, score = game[f"{side}_team"], game[f"{side}_score"]
+        xg = st.session_state.xg.get(team, 0.0)
+        with col:
+            st.subheader(f"{team} xG (Actual)")
+            st.write(f"**{xg:.1f} ({score})**")
+            diff = xg - score
+            arrow = "↑" if diff > 0 else "↓"
+            color = "green" if diff > 0 else "red"
+            st.markdown(f"<span style='color:{color}; font-size:1.5em;'>{arrow}</span> **{abs(diff):.1f}**", unsafe_allow_html=True)
+
+    # Shots of the game, shared by the sessions following it; the frame is only rebuilt after new shots
+    with live_games.lock:
+        shot_store = live_games.store(current_game_id)
+        shots = shot_store.to_frame() if shot_store is not None else None
+    if shots is not None:
+        st.dataframe(shots)
+
+
 with st.container():
-    if st.session_state.last_ping_id:
-        current_game_id = st.session_state.last_ping_id
-        st.subheader(f"Game {current_game_id}: {st.session_state.home_team} vs {st.session_state.away_team}")
-        st.markdown(f"**Period {st.session_state.period} - {st.session_state.period_time_remaining} left**")
-        
-        col1, col2 = st.columns(2)
-
-        # Fetch play-by-play probabilities
-        new_plays = game_client.get_game_and_filter(current_game_id)
-        if new_plays is not None:
-            features = ['shotDistance'] if model_version == "v6 (distance)" else ['shotDistance', 'shotAngle']
-            serving_client.features = features
-
-            pred_and_prob = serving_client.predict(new_plays)
-            new_plays['probability'] = pred_and_prob['probabilities']
-
-            # Update play_by_play dataframe for the current game
-            st.session_state.play_by_play_data[current_game_id] = pd.concat(
-                [st.session_state.play_by_play_data[current_game_id], new_plays], ignore_index=True
-            )
-        
-            # Compute xG values
-            play_by_play_data = st.session_state.play_by_play_data[current_game_id]
-            
-            # Extract the second value (index 1) from probabilities into a new column
-            play_by_play_data['probability'] = play_by_play_data['probability'].apply(lambda x: x[1])
-            # Group by team and compute expected goals
-            expected_goals = (
-                play_by_play_data.groupby('eventOwnerTeam')['probability']
-                .apply(lambda probs: probs.sum())
-            )
-            st.session_state.home_xg = expected_goals[expected_goals.index == st.session_state.home_team].values[0]
-            st.session_state.away_xg = expected_goals[expected_goals.index == st.session_state.away_team].values[0]
-
-        # Home team details
-        with col1:
-            st.subheader(f"{st.session_state.home_team} xG (Actual)")
-            st.write(f"**{st.session_state.home_xg:.1f} ({st.session_state.home_score})**")
-            diff_home = st.session_state.home_xg - st.session_state.home_score
-            arrow_home = "↑" if diff_home > 0 else "↓"
-            color_home = "green" if diff_home > 0 else "red"
-            st.markdown(f"<span style='color:{color_home}; font-size:1.5em;'>{arrow_home}</span> **{abs(diff_home):.1f}**", unsafe_allow_html=True)
-
-        # Away team details
-        with col2:
-            st.subheader(f"{st.session_state.away_team} xG (Actual)")
-            st.write(f"**{st.session_state.away_xg:.1f} ({st.session_state.away_score})**")
-            diff_away = st.session_state.away_xg - st.session_state.away_score
-            arrow_away = "↑" if diff_away > 0 else "↓"
-            color_away = "green" if diff_away > 0 else "red"
-            st.markdown(f"<span style='color:{color_away}; font-size:1.5em;'>{arrow_away}</span> **{abs(diff_away):.1f}**", unsafe_allow_html=True)
-
-        # Display play_by_play data for the current game
-        st.dataframe(st.session_state.play_by_play_data[current_game_id])
-    else:
-        st.info("Enter a Game ID and click 'Ping Game' to view game details.")
\ No newline at end of file
+    live_game()
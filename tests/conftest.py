@@ -0,0 +1,46 @@
+"""
+Tests run offline from the root of the repo with `python -m pytest -q`: the client package is imported
+as `ift6758.ift6758.client`, and the serving modules flat, as in the serving image.
+"""
+from pathlib import Path
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+SERVING_DIR = ROOT / "serving"
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+if str(SERVING_DIR) not in sys.path:
+    # After the standard library, which serving/test.py would otherwise shadow
+    sys.path.append(str(SERVING_DIR))
+
+
+@pytest.fixture(scope="session")
+def serving_app(tmp_path_factory):
+    """
+    serving/app.py, imported once from a scratch directory whose default model is a logistic
+    regression of shotDistance (see benchmarks/serving.py)
+    """
+    from benchmarks.serving import import_app
+    return import_app(["shotDistance"], workdir=str(tmp_path_factory.mktemp("serving")))
+
+
+@pytest.fixture(scope="session")
+def asgi_url(serving_app):
+    """Base URL of serving/asgi.py (sharing `serving_app`), served by uvicorn in a background thread"""
+    import uvicorn
+    import asgi
+
+    server = uvicorn.Server(uvicorn.Config(asgi.app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join()
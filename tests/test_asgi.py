@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+import io
+import threading
+
+import numpy as np
+import pytest
+import requests
+
+
+BODY = [{"shotDistance": 10.0}, {"shotDistance": 50.0}]
+
+
+@pytest.mark.parametrize("accept, npy", [
+    (None, False),
+    ("application/json", False),
+    ("application/x-npy", True),
+    ("application/json, application/x-npy;q=0.1", False),
+    ("application/json;q=0.5, application/x-npy", True),
+    ("*/*", False),
+])
+def test_accept_header_is_negotiated_with_q_values(serving_app, asgi_url, accept, npy):
+    headers = {"Accept": accept} if accept else {}
+    flask_response = serving_app.app.test_client().post("/predict", json=BODY, headers=headers)
+    asgi_response = requests.post(f"{asgi_url}/predict", json=BODY, headers=headers)
+
+    for response, content_type in ((flask_response, flask_response.mimetype),
+                                    (asgi_response, asgi_response.headers["content-type"].split(";")[0])):
+        assert response.status_code == 200
+        assert content_type == ("application/x-npy" if npy else "application/json")
+    if npy:
+        assert np.load(io.BytesIO(asgi_response.content)).shape == (2, 2)
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"[1, 2]", b'"also not an object"'])
+def test_malformed_download_requests(serving_app, asgi_url, body):
+    flask_response = serving_app.app.test_client().post("/download_registry_model", data=body,
+                                                        content_type="application/json")
+    asgi_response = requests.post(f"{asgi_url}/download_registry_model", data=body,
+                                  headers={"Content-Type": "application/json"})
+    assert flask_response.status_code == asgi_response.status_code == 400
+    assert flask_response.get_json() == asgi_response.json()
+    assert asgi_response.json()["status"] == "failure"
+
+
+@pytest.mark.parametrize("query", ["limit=abc", "limit=", "offset=1.5", "before=end", "limit=0", "offset=-1"])
+def test_invalid_log_windows_are_rejected_alike(serving_app, asgi_url, query):
+    flask_response = serving_app.app.test_client().get(f"/logs?{query}")
+    asgi_response = requests.get(f"{asgi_url}/logs?{query}")
+    assert flask_response.status_code == asgi_response.status_code == 400
+    assert flask_response.get_json() == asgi_response.json()
+    assert asgi_response.json()["status"] == "failure"
+
+
+def test_log_windows_are_served_alike(serving_app, asgi_url):
+    flask_response = serving_app.app.test_client().get("/logs?offset=0&limit=1")
+    asgi_response = requests.get(f"{asgi_url}/logs?offset=0&limit=1")
+    assert flask_response.status_code == asgi_response.status_code == 200
+    assert flask_response.get_json()["logs"] == asgi_response.json()["logs"]
+    assert len(asgi_response.json()["logs"]) == 1
+
+
+def counter(metrics_text: str, series: str) -> float:
+    for line in metrics_text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.split()[-1])
+    return 0.0
+
+
+def test_requests_are_counted_and_timed_with_the_labels_of_flask(serving_app, asgi_url):
+    requests_series = 'xg_serving_requests_total{endpoint="/games/<int:game_id>/score",status="400"}'
+    seconds_series = 'xg_serving_request_seconds_count{endpoint="/predict"}'
+    before = requests.get(f"{asgi_url}/metrics").text
+
+    requests.post(f"{asgi_url}/games/1/score", data=b"{", headers={"Content-Type": "application/json"})
+    requests.post(f"{asgi_url}/predict", json=BODY)
+    requests.get(f"{asgi_url}/no-such-route")
+
+    after = requests.get(f"{asgi_url}/metrics").text
+    assert counter(after, requests_series) == counter(before, requests_series) + 1
+    assert counter(after, seconds_series) == counter(before, seconds_series) + 1
+    unmatched = 'xg_serving_requests_total{endpoint="unmatched",status="404"}'
+    assert counter(after, unmatched) == counter(before, unmatched) + 1
+
+
+def test_readiness_probe_does_not_block_the_event_loop(serving_app, asgi_url, monkeypatch):
+    import app
+
+    loading = threading.Event()
+    loaded = threading.Event()
+
+    def slow_readiness():
+        loading.set()
+        loaded.wait(10)
+        return {"status": "ready"}, 200
+
+    monkeypatch.setattr(app, "readiness", slow_readiness)
+    with ThreadPoolExecutor(1) as pool:
+        probe = pool.submit(requests.get, f"{asgi_url}/ready")
+        assert loading.wait(5)
+        try:
+            assert requests.get(f"{asgi_url}/health", timeout=2).json() == {"status": "ok"}
+        finally:
+            loaded.set()
+        assert probe.result(5).status_code == 200
+
+
+def test_readiness_reports_why_the_model_is_missing(serving_app, asgi_url, monkeypatch):
+    sync_error = {"key": ["workspace", "missing", "v1"], "error": "FileNotFoundError: model.pkl"}
+    monkeypatch.setattr(serving_app.registry, "sync_error", sync_error)
+
+    flask_response = serving_app.app.test_client().get("/ready")
+    asgi_response = requests.get(f"{asgi_url}/ready")
+    assert flask_response.status_code == asgi_response.status_code == 200
+    assert flask_response.get_json()["sync_error"] == asgi_response.json()["sync_error"] == sync_error
+
+    monkeypatch.setattr(serving_app.registry, "_current", None)
+    flask_response = serving_app.app.test_client().get("/ready")
+    asgi_response = requests.get(f"{asgi_url}/ready")
+    assert flask_response.status_code == asgi_response.status_code == 503
+    assert flask_response.get_json() == asgi_response.json() == {
+        "status": "loading",
+        "model": None,
+        "reason": "Failed to switch to model ['workspace', 'missing', 'v1'] set by another worker: "
+                  "FileNotFoundError: model.pkl",
+        "sync_error": sync_error,
+    }
+
+    monkeypatch.setattr(serving_app.registry, "sync_error", None)
+    monkeypatch.setattr(serving_app, "startup_error", "Failed to load default model: OSError: disk full")
+    assert serving_app.app.test_client().get("/ready").get_json()["reason"] == \
+        "Failed to load default model: OSError: disk full"
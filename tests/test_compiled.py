@@ -0,0 +1,55 @@
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import RobustScaler, StandardScaler
+
+from compiled import compile_model
+from benchmarks.bench_compiled import FEATURES, make_models
+from benchmarks.serving import make_model, make_shots
+
+
+MODELS = make_models()
+
+
+def sklearn_proba(model, X: np.ndarray) -> np.ndarray:
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        return model.predict_proba(X)
+
+
+@pytest.mark.parametrize("name", list(MODELS))
+def test_compiled_scorer_matches_predict_proba(name):
+    model = MODELS[name]
+    scorer = compile_model(model)
+    assert scorer is not None
+
+    n_features = model.n_features_in_
+    rng = np.random.default_rng(0)
+    # Typical shots, extreme values and the origin
+    X = np.concatenate([
+        make_shots(10_000)[FEATURES[:n_features]].to_numpy(),
+        rng.uniform(-1e4, 1e4, (1000, n_features)),
+        np.zeros((1, n_features)),
+    ])
+    assert np.allclose(scorer.predict_proba(X), sklearn_proba(model, X), rtol=1e-9, atol=1e-12)
+    assert np.array_equal(scorer.classes_, model.classes_)
+
+
+def test_binary_multinomial_model_is_not_compiled():
+    model = make_model()
+    # As unpickled from a release where multi_class could still be set
+    model.multi_class = "multinomial"
+    assert compile_model(model) is None
+    assert compile_model(make_pipeline(StandardScaler(), model)) is None
+
+
+def test_unsupported_models_are_not_compiled():
+    X = make_shots(2000)[FEATURES]
+    y = make_model().predict(X[["shotDistance"]])
+    multiclass = LogisticRegression().fit(X, np.digitize(X["shotDistance"], [20, 40]))
+
+    assert compile_model(multiclass) is None
+    assert compile_model(make_pipeline(RobustScaler(), LogisticRegression()).fit(X, y)) is None
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ift6758.ift6758.client.features import decode_situation, shot_features, situation_features
+from ift6758.ift6758.client.game_client import (SHOT_EVENT_TYPES, df_convert, empty_goal_func, get_player, get_teams,
+                                                goal_situation, ing_plays, ing_shots, zoneshoot)
+from ift6758.ift6758.client.shot_schema import enforce_schema
+from benchmarks.bench_situation import every_situation
+from benchmarks.synthetic import make_game, make_shot_frame
+
+
+def random_situations(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # Goalies are in net (1) or pulled (0); sides have up to 9 skaters
+    digits = rng.integers(0, [2, 10, 10, 2], size=(n, 4)).astype(str)
+    return pd.DataFrame({"situationCode": ["".join(code) for code in digits],
+                         "teamSide": rng.choice(["home", "away"], size=n)})
+
+
+@pytest.mark.parametrize("shots", [every_situation(), random_situations(2000, seed=0)],
+                         ids=["every-situation", "random-codes"])
+def test_situation_features_match_row_wise_functions(shots):
+    empty_net, advantage, strength = situation_features(shots["situationCode"], shots["teamSide"])
+
+    assert np.array_equal(empty_net, empty_goal_func(shots).astype(bool).to_numpy())
+    assert np.array_equal(np.asarray(advantage, dtype=object), goal_situation(shots).to_numpy(dtype=object))
+    home = (shots["teamSide"] == "home").to_numpy()
+    codes = shots["situationCode"]
+    expected = np.where(home, codes.str[2] + "v" + codes.str[1], codes.str[1] + "v" + codes.str[2])
+    assert np.array_equal(np.asarray(strength, dtype=object), expected)
+
+
+def test_decode_situation_round_trips_digits():
+    shots = random_situations(500, seed=1)
+    situation = decode_situation(shots["situationCode"])
+    decoded = np.stack(situation, axis=1).astype(str)
+    assert ["".join(code) for code in decoded] == shots["situationCode"].tolist()
+
+
+@pytest.mark.parametrize("code", ["155", "15510", "", "ab12", "15 1", None, float("nan")])
+def test_invalid_situation_codes_are_missing(code):
+    codes = ["1551", code, "0641"]
+    situation = decode_situation(codes)
+    assert [digit[1] for digit in situation] == [-1] * 4
+
+    empty_net, advantage, strength = situation_features(codes, ["home", "away", "home"])
+    assert empty_net.tolist() == [False, False, True]
+    assert pd.isna(advantage).tolist() == [False, True, False]
+    assert pd.isna(strength).tolist() == [False, True, False]
+    assert strength[0] == "5v5" and strength[2] == "4v6"
+
+
+def test_odd_situation_code_does_not_fail_the_game():
+    game = make_game(2023020003, n_plays=120, seed=3)
+    shot = next(play for play in game["plays"] if play["typeDescKey"] in SHOT_EVENT_TYPES)
+    shot["situationCode"] = "551"
+
+    shots = df_convert(game)
+
+    assert len(shots) == sum(play["typeDescKey"] in SHOT_EVENT_TYPES for play in game["plays"])
+    assert shots["strength"].isna().sum() == 1
+    assert shots["isGoalAdvantage"].isna().sum() == 1
+
+
+def game_shots(seed: int) -> pd.DataFrame:
+    """The shots of a synthetic game as `zoneshoot` receives them"""
+    game = make_game(2023020001 + seed, seed=seed)
+    shots = ing_plays(game["id"], game["plays"])
+    return ing_shots(shots, get_player(game), get_teams(game), legacy=True)
+
+
+@pytest.mark.parametrize("shots", [make_shot_frame(5000, seed=0), game_shots(seed=0), game_shots(seed=1)],
+                         ids=["multi-season", "game-0", "game-1"])
+def test_shot_features_match_row_wise_zoneshoot(shots):
+    expected = zoneshoot(shots.copy(), legacy=True)
+    pd.testing.assert_frame_equal(shot_features(shots.copy()), expected, check_exact=False, rtol=1e-12)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_legacy_df_convert_is_the_original_frame(seed):
+    game = make_game(2023020001 + seed, seed=seed)
+    legacy = df_convert(game, legacy=True)
+
+    assert "strength" not in legacy.columns
+    assert not any(isinstance(dtype, pd.CategoricalDtype) for dtype in legacy.dtypes)
+    assert legacy["emptyGoalNet"].dtype == np.int64 and legacy["isGoal"].dtype == np.int64
+    pd.testing.assert_frame_equal(df_convert(game).drop(columns="strength"), enforce_schema(legacy))
+
@@ -0,0 +1,88 @@
+import json
+
+import pandas as pd
+import pytest
+
+from ift6758.ift6758.data import featurize
+from ift6758.ift6758.data.featurize import featurize_directory
+from benchmarks.synthetic import make_game
+
+
+N_GAMES = 6
+
+
+@pytest.fixture
+def json_dir(tmp_path):
+    json_dir = tmp_path / "json"
+    json_dir.mkdir()
+    for i in range(N_GAMES):
+        game = make_game(2016020001 + i, n_plays=60, seed=i)
+        with open(json_dir / f"{game['id']}.json", "w") as f:
+            json.dump(game, f)
+    return json_dir
+
+
+def read_games(out_dir) -> pd.Series:
+    """Number of rows of each game in the dataset"""
+    return pd.read_parquet(out_dir)["idGame"].value_counts()
+
+
+class Killed(BaseException):
+    """Stands for the process being killed, which nothing catches"""
+
+
+def test_featurize_directory(json_dir, tmp_path):
+    out_dir = tmp_path / "out"
+    stats = featurize_directory(json_dir, out_dir, workers=1, games_per_file=4)
+    assert stats == {"converted": N_GAMES, "skipped": 0, "failed": 0}
+    assert sorted(p.name for p in (out_dir / "season=2016" / "gameType=02").iterdir()) == \
+        ["part-00000.parquet", "part-00001.parquet"]
+    assert len(read_games(out_dir)) == N_GAMES
+
+    assert featurize_directory(json_dir, out_dir, workers=1, games_per_file=4)["skipped"] == N_GAMES
+
+
+@pytest.mark.parametrize("killed", ["before_rename", "after_rename"])
+def test_resumed_runs_write_each_game_once(json_dir, tmp_path, monkeypatch, killed):
+    out_dir = tmp_path / "out"
+    expected = read_games_of_full_run(json_dir, tmp_path / "reference")
+
+    # Killed while committing the second part file: before it is renamed into place, or right after
+    replace = featurize.os.replace
+    calls = []
+
+    def kill_on_second_part(src, dst):
+        calls.append(dst)
+        if len(calls) == 2 and killed == "before_rename":
+            raise Killed()
+        replace(src, dst)
+        if len(calls) == 2:
+            raise Killed()
+
+    monkeypatch.setattr(featurize.os, "replace", kill_on_second_part)
+    with pytest.raises(Killed):
+        featurize_directory(json_dir, out_dir, workers=1, games_per_file=2)
+    monkeypatch.setattr(featurize.os, "replace", replace)
+
+    written = 2 if killed == "before_rename" else 4
+    stats = featurize_directory(json_dir, out_dir, workers=1, games_per_file=2)
+    assert stats == {"converted": N_GAMES - written, "skipped": written, "failed": 0}
+    pd.testing.assert_series_equal(read_games(out_dir).sort_index(), expected.sort_index())
+
+
+def read_games_of_full_run(json_dir, out_dir) -> pd.Series:
+    featurize_directory(json_dir, out_dir, workers=1, games_per_file=2)
+    return read_games(out_dir)
+
+
+def test_new_parts_never_overwrite_existing_ones(json_dir, tmp_path):
+    out_dir = tmp_path / "out"
+    expected = read_games_of_full_run(json_dir, out_dir)
+    partition_dir = out_dir / "season=2016" / "gameType=02"
+    # Deleting a part, e.g. to have its games featurized again, leaves a gap in the numbering
+    (partition_dir / "part-00000.parquet").unlink()
+
+    assert featurize_directory(json_dir, out_dir, workers=1, games_per_file=2)["converted"] == 2
+    assert sorted(p.name for p in partition_dir.iterdir()) == \
+        ["part-00001.parquet", "part-00002.parquet", "part-00003.parquet"]
+    pd.testing.assert_series_equal(read_games(out_dir).sort_index(), expected.sort_index())
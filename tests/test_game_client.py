@@ -0,0 +1,128 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ift6758.ift6758.client.game_client import (SHOT_EVENT_TYPES, GameClient, GameState, df_convert, ing_plays,
+                                                parse_shots)
+from ift6758.ift6758.client.shot_schema import enforce_schema
+from benchmarks.synthetic import AWAY_TEAM_ID, make_game
+
+
+class NoFetcher:
+    """GameClient fetcher for tests that hand the payloads to update_game"""
+    def get(self, game_id):
+        raise AssertionError("update_game should not fetch")
+
+
+def away_first(game: dict, n_shots: int) -> dict:
+    """`game` with its first `n_shots` shots taken by the away team, so the rink sides are unknown until later"""
+    shots = [play for play in game["plays"] if play["typeDescKey"] in SHOT_EVENT_TYPES][:n_shots]
+    for play in shots:
+        play["details"]["eventOwnerTeamId"] = AWAY_TEAM_ID
+    return game
+
+
+def prefixes(n_plays: int, step: int, seed: int) -> list:
+    """Increasing play counts ending with `n_plays`, `step` plays apart on average (0: one at a time)"""
+    if step == 0:
+        return list(range(1, n_plays + 1))
+    rng = np.random.default_rng(seed)
+    cuts = np.cumsum(rng.integers(1, 2 * step, size=n_plays))
+    return [int(cut) for cut in cuts[cuts < n_plays]] + [n_plays]
+
+
+GAMES = {
+    "home-first": lambda: make_game(2023020001, n_plays=120, seed=0),
+    "playoffs": lambda: make_game(2023030001, n_plays=120, seed=1),
+    "away-first": lambda: away_first(make_game(2023020002, n_plays=120, seed=2), n_shots=5),
+    "away-only-first-period": lambda: away_first(make_game(2023020003, n_plays=120, seed=3), n_shots=12),
+}
+
+
+def incremental(update, game: dict, counts: list) -> pd.DataFrame:
+    """Concatenates the shots returned by `update` for each prefix of the plays of `game`"""
+    frames = [update(dict(game, plays=game["plays"][:count])) for count in counts]
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    # Categories differ from call to call, which concat turns back into strings
+    return enforce_schema(pd.concat(frames, ignore_index=True))
+
+
+@pytest.mark.parametrize("step", [0, 4, 30, 120])
+@pytest.mark.parametrize("name", list(GAMES))
+def test_game_client_updates_match_df_convert(name, step):
+    game = GAMES[name]()
+    client = GameClient(fetcher=NoFetcher())
+
+    shots = incremental(client.update_game, game, prefixes(len(game["plays"]), step, seed=step))
+
+    pd.testing.assert_frame_equal(shots, df_convert(game))
+    assert client.pointers[game["id"]] == len(game["plays"])
+
+
+@pytest.mark.parametrize("name", list(GAMES))
+def test_game_state_updates_match_df_convert(name):
+    game = GAMES[name]()
+    state = GameState(game)
+
+    shots = incremental(state.update, game, prefixes(len(game["plays"]), step=10, seed=0))
+
+    pd.testing.assert_frame_equal(shots, df_convert(game))
+
+
+def test_away_shots_are_held_back_until_the_rink_sides_are_known():
+    game = away_first(make_game(2023020002, n_plays=120, seed=2), n_shots=5)
+    plays = game["plays"]
+    shots = [i for i, play in enumerate(plays) if play["typeDescKey"] in SHOT_EVENT_TYPES]
+    state = GameState(game)
+
+    assert state.update(dict(game, plays=plays[:shots[4] + 1])).empty
+    assert state.pointer == 0
+
+    home_offensive = next(i for i in shots[5:] if plays[i]["details"]["eventOwnerTeamId"] != AWAY_TEAM_ID
+                          and plays[i]["details"]["zoneCode"] == "O")
+    new_shots = state.update(dict(game, plays=plays[:home_offensive + 1]))
+    assert len(new_shots) == sum(i <= home_offensive for i in shots)
+    assert state.pointer == home_offensive + 1
+
+
+def with_odd_plays(game: dict, seed: int) -> dict:
+    """
+    `game` with some of its other plays lacking details, or their coordinates, and some of unknown
+    types, as in the payloads of the NHL API (period starts, delayed penalties, new event types)
+    """
+    rnd = random.Random(seed)
+    for play in game["plays"][1:]:
+        if play["typeDescKey"] in SHOT_EVENT_TYPES:
+            continue
+        draw = rnd.random()
+        if draw < 0.1:
+            del play["details"]
+        elif draw < 0.2:
+            play["details"] = {k: v for k, v in play["details"].items() if k not in ("xCoord", "yCoord")}
+        elif draw < 0.3:
+            play["typeDescKey"] = rnd.choice(["period-start", "delayed-penalty", "some-new-event"])
+            del play["details"]
+    return game
+
+
+def multi_pass_shots(game_id: int, plays: list) -> pd.DataFrame:
+    """The shots of the original parse: a frame of every play, then filtered on shots"""
+    plays = ing_plays(game_id, plays)
+    return plays[plays["typeDescKey"].isin(SHOT_EVENT_TYPES)].reset_index(drop=True)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_parse_shots_matches_the_multi_pass_parse(seed):
+    game = with_odd_plays(make_game(2023020001 + seed, n_plays=200, seed=seed), seed)
+    expected = multi_pass_shots(game["id"], game["plays"])
+
+    pd.testing.assert_frame_equal(parse_shots(game["id"], game["plays"]), expected)
+
+    # Given the play before them, later plays have the same context as in the whole game
+    start = len(game["plays"]) // 2
+    later = parse_shots(game["id"], game["plays"][start:], game["plays"][start - 1])
+    n_before = sum(play["typeDescKey"] in SHOT_EVENT_TYPES for play in game["plays"][:start])
+    pd.testing.assert_frame_equal(later, expected.iloc[n_before:].reset_index(drop=True))
+
@@ -0,0 +1,77 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from ift6758.ift6758.client.game_client import SHOT_EVENT_TYPES, GameClient
+from ift6758.ift6758.client.game_tracker import GameTracker
+from benchmarks.synthetic import make_game
+
+
+class SavedGames:
+    """Fetcher of games revealed `step` plays more at each call"""
+    def __init__(self, games: list, step: int):
+        self.games = {game["id"]: game for game in games}
+        self.step = step
+        self.calls = {}
+
+    def get(self, game_id) -> dict:
+        self.calls[game_id] = self.calls.get(game_id, 0) + 1
+        game = self.games[game_id]
+        return dict(game, plays=game["plays"][:self.calls[game_id] * self.step])
+
+
+class FlakyService:
+    """Scores every shot 0.1, failing the calls listed in `failures` (0 being the first)"""
+    def __init__(self, failures: set):
+        self.failures = failures
+        self.calls = []
+
+    def predict(self, X: pd.DataFrame) -> pd.DataFrame:
+        self.calls.append(len(X))
+        if len(self.calls) - 1 in self.failures:
+            raise ConnectionError("service unavailable")
+        return pd.DataFrame({"probability": np.full(len(X), 0.1)})
+
+
+def n_shots(game: dict, n_plays: int) -> int:
+    return sum(play["typeDescKey"] in SHOT_EVENT_TYPES for play in game["plays"][:n_plays])
+
+
+def test_shots_of_a_failed_prediction_are_scored_at_the_next_tick():
+    game = make_game(2023020001, n_plays=200, seed=0)
+    service = FlakyService(failures={0})
+    scored = []
+    tracker = GameTracker([game["id"]], GameClient(fetcher=SavedGames([game], step=100)), service,
+                          poll_intervals={"live": 0.0}, callback=lambda game_id, shots: scored.append(len(shots)))
+
+    assert asyncio.run(tracker.tick()) == {}
+    assert tracker.unscored == {game["id"]: n_shots(game, 100)}
+    assert len(tracker.stores[game["id"]]) == 0
+
+    new_shots = asyncio.run(tracker.tick())
+    shots = new_shots[game["id"]]
+    assert len(shots) == n_shots(game, 200)
+    assert shots["gameSeconds"].is_monotonic_increasing
+    assert tracker.unscored == {}
+    assert service.calls == [n_shots(game, 100), n_shots(game, 200)]
+    assert scored == [n_shots(game, 200)]
+
+    store = tracker.stores[game["id"]]
+    assert len(store) == n_shots(game, 200)
+    assert store.to_frame()["gameSeconds"].is_monotonic_increasing
+    assert np.isclose(sum(tracker.xg[game["id"]].values()), 0.1 * n_shots(game, 200))
+
+
+def test_pending_shots_are_retried_without_new_plays():
+    game = make_game(2023020002, n_plays=100, seed=1)
+    service = FlakyService(failures={0})
+    tracker = GameTracker([game["id"]], GameClient(fetcher=SavedGames([game], step=100)), service,
+                          poll_intervals={"live": 0.0, "final": 0.0})
+
+    asyncio.run(tracker.tick())
+    asyncio.run(tracker.tick())
+    assert tracker.unscored == {}
+    assert service.calls == [n_shots(game, 100)] * 2
+    assert len(tracker.stores[game["id"]]) == n_shots(game, 100)
+    assert np.isclose(sum(tracker.xg[game["id"]].values()), 0.1 * n_shots(game, 100))
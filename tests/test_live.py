@@ -0,0 +1,105 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ift6758.ift6758.client.game_client import SHOT_EVENT_TYPES, GameClient
+from ift6758.ift6758.client.live import LiveGames
+from benchmarks.synthetic import make_game
+
+
+class SavedGames:
+    """Fetcher of games revealed `step` plays more at each call, final once every play is revealed"""
+    def __init__(self, games: list, step: int):
+        self.games = {game["id"]: game for game in games}
+        self.step = step
+        self.calls = {}
+
+    def get(self, game_id) -> dict:
+        self.calls[game_id] = self.calls.get(game_id, 0) + 1
+        game = self.games[game_id]
+        plays = game["plays"][:self.calls[game_id] * self.step]
+        return dict(game, plays=plays, gameState="OFF" if len(plays) == len(game["plays"]) else "LIVE")
+
+
+class ConstantService:
+    def predict(self, X: pd.DataFrame) -> pd.DataFrame:
+        return pd.DataFrame({"probability": np.full(len(X), 0.1)})
+
+
+def n_shots(game: dict) -> int:
+    return sum(play["typeDescKey"] in SHOT_EVENT_TYPES for play in game["plays"])
+
+
+def wait_until(predicate, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def games():
+    return [make_game(2023020001 + i, n_plays=100, seed=i) for i in range(4)]
+
+
+def live_games(games: list, **kwargs) -> tuple:
+    fetcher = SavedGames(games, step=40)
+    live = LiveGames(GameClient(fetcher=fetcher), ConstantService(),
+                     poll_intervals={"live": 0.0, "final": 0.0}, **kwargs)
+    return live, fetcher
+
+
+def test_final_games_are_no_longer_polled(games):
+    game = games[0]
+    live, fetcher = live_games(games)
+    deltas = []
+    try:
+        live.subscribe(game["id"], deltas.append)
+        wait_until(lambda: deltas and deltas[-1]["game"]["status"] == "final")
+        wait_until(lambda: game["id"] not in live.tracker.next_poll)
+        calls = fetcher.calls[game["id"]]
+        time.sleep(0.1)
+        assert fetcher.calls[game["id"]] == calls == 3
+
+        # Only the shots and header are kept, for the snapshots of later subscribers
+        assert live.tracker.game_client.states == {} and live.tracker.games == {}
+        snapshots = []
+        live.subscribe(game["id"], snapshots.append)
+        time.sleep(0.1)
+        assert len(snapshots) == 1
+        assert snapshots[0]["game"] == deltas[-1]["game"]
+        assert len(snapshots[0]["shots"]["gameSeconds"]) == sum(len(d["shots"]["gameSeconds"]) for d in deltas)
+        assert len(live.store(game["id"])) == n_shots(game)
+        assert fetcher.calls[game["id"]] == 3
+    finally:
+        live.close()
+
+
+def test_unfollowed_games_are_dropped(games):
+    game = games[0]
+    live, fetcher = live_games(games)
+    try:
+        live.follow(game["id"])
+        wait_until(lambda: live.store(game["id"]) is not None)
+        live.unfollow(game["id"])
+        wait_until(lambda: live.store(game["id"]) is None)
+        assert game["id"] not in live.tracker.next_poll
+        assert live.tracker.game_client.states == {} and live.tracker.status == {}
+    finally:
+        live.close()
+
+
+def test_games_without_subscribers_are_dropped_beyond_the_cap(games):
+    live, _ = live_games(games, max_games=2)
+    watched, *others = [game["id"] for game in games]
+    try:
+        live.subscribe(watched, lambda delta: None)
+        for game_id in others:
+            live.follow(game_id)
+        wait_until(lambda: list(live._kept) == [watched, others[-1]])
+        wait_until(lambda: set(live.tracker.stores) == {watched, others[-1]})
+        assert set(live._headers) <= {watched, others[-1]}
+    finally:
+        live.close()
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import log_handlers
+from log_handlers import read_logs
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    """Log file of 50 JSON records, whose messages are "record 0" to "record 49" in order"""
+    log_file = tmp_path / "flask.log"
+    with open(log_file, "w") as f:
+        for i in range(50):
+            f.write(json.dumps({"level": "INFO", "message": f"record {i}"}) + "\n")
+    return log_file
+
+
+def messages(window: dict) -> list:
+    return [entry["message"] for entry in window["logs"]]
+
+
+@pytest.mark.parametrize("limit, expected", [(0, 1), (-5, 1), (3, 3), (100, 20)])
+def test_limit_is_clamped(log_file, monkeypatch, limit, expected):
+    monkeypatch.setattr(log_handlers, "MAX_LIMIT", 20)
+    assert len(read_logs(log_file, limit=limit)["logs"]) == expected
+    assert len(read_logs(log_file, limit=limit, offset=0)["logs"]) == expected
+
+
+def test_offsets_are_clamped_to_the_file(log_file):
+    size = log_file.stat().st_size
+    assert messages(read_logs(log_file, limit=2, offset=-10)) == ["record 0", "record 1"]
+    assert read_logs(log_file, offset=size + 10) == {"logs": [], "next_offset": size, "file_size": size}
+    assert read_logs(log_file, before=-10) == {"logs": [], "before_offset": 0, "file_size": size}
+    assert messages(read_logs(log_file, limit=1, before=size + 10)) == ["record 49"]
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=-1", "offset=-1", "before=-100"])
+def test_invalid_windows_are_rejected(serving_app, log_file, monkeypatch, query):
+    monkeypatch.setattr(serving_app, "LOG_FILE", str(log_file))
+    response = serving_app.app.test_client().get(f"/logs?{query}")
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "failure"
+
+
+def test_windows_are_served(serving_app, log_file, monkeypatch):
+    monkeypatch.setattr(serving_app, "LOG_FILE", str(log_file))
+    response = serving_app.app.test_client().get("/logs?limit=2&offset=0")
+    assert response.status_code == 200
+    assert messages(response.get_json()) == ["record 0", "record 1"]
@@ -0,0 +1,107 @@
+import copy
+import threading
+
+from ift6758.ift6758.client.game_client import GameClient
+from ift6758.ift6758.client.metrics import Metrics
+from benchmarks.bench_metrics import client_instrumentation, median_seconds, server_instrumentation
+from benchmarks.serving import make_shots
+from benchmarks.synthetic import make_game
+
+
+# Budget of the instrumentation, in percent of the latency of the call it instruments
+MAX_OVERHEAD = 2.0
+
+
+def test_counters_and_histograms_are_keyed_by_labels():
+    metrics = Metrics("test")
+    metrics.inc("requests_total", endpoint="/predict", status=200)
+    metrics.inc("requests_total", 2, status=200, endpoint="/predict")
+    metrics.inc("requests_total", endpoint="/predict", status=400)
+    for value in (0.001, 0.002, 0.2):
+        metrics.observe("request_seconds", value, endpoint="/predict")
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {'requests_total{endpoint="/predict",status="200"}': 3,
+                                    'requests_total{endpoint="/predict",status="400"}': 1}
+    histogram = snapshot["histograms"]['request_seconds{endpoint="/predict"}']
+    assert histogram["count"] == 3
+    assert histogram["p50"] == 0.0025
+    assert histogram["p99"] == 0.25
+
+
+def test_timers_as_context_managers_and_decorators():
+    metrics = Metrics("test")
+
+    @metrics.timer("fetch")
+    def fetch():
+        pass
+
+    for _ in range(3):
+        fetch()
+    with metrics.timer("decode"):
+        pass
+
+    histograms = metrics.snapshot()["histograms"]
+    assert histograms['stage_seconds{stage="fetch"}']["count"] == 3
+    assert histograms['stage_seconds{stage="decode"}']["count"] == 1
+
+
+def test_render_prometheus_text_format():
+    metrics = Metrics("xg")
+    metrics.inc("predicted_rows_total", 10)
+    metrics.observe("request_seconds", 0.003, endpoint='/a"b')
+
+    lines = metrics.render().splitlines()
+    assert "# TYPE xg_predicted_rows_total counter" in lines
+    assert "xg_predicted_rows_total 10.0" in lines
+    assert "# TYPE xg_request_seconds histogram" in lines
+    assert 'xg_request_seconds_bucket{endpoint="/a\\"b",le="0.0025"} 0' in lines
+    assert 'xg_request_seconds_bucket{endpoint="/a\\"b",le="0.005"} 1' in lines
+    assert 'xg_request_seconds_bucket{endpoint="/a\\"b",le="+Inf"} 1' in lines
+    assert 'xg_request_seconds_count{endpoint="/a\\"b"} 1' in lines
+
+
+def test_concurrent_updates_are_not_lost():
+    metrics = Metrics("test")
+
+    def work():
+        for _ in range(2000):
+            metrics.inc("calls_total")
+            with metrics.timer("work"):
+                pass
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["calls_total"] == 16000
+    assert snapshot["histograms"]['stage_seconds{stage="work"}']["count"] == 16000
+
+
+def test_instrumentation_overhead_of_predict(serving_app):
+    client = serving_app.app.test_client()
+    body = make_shots(10)[["shotDistance"]].to_json(orient="records")
+    predict = lambda: client.post("/predict", data=body, content_type="application/json")
+    metrics = Metrics("test")
+
+    # Best of a few rounds, so a noisy machine does not fail the budget
+    overheads = []
+    for _ in range(3):
+        call = median_seconds(predict, 200)
+        instrumentation = median_seconds(lambda: server_instrumentation(metrics), 5000)
+        overheads.append(100 * instrumentation / call)
+    assert min(overheads) < MAX_OVERHEAD
+
+
+def test_instrumentation_overhead_of_a_game_update():
+    game = make_game(2023020001, seed=0)
+    # A fresh client, so the whole game is featurized
+    update_game = lambda: GameClient().update_game(copy.deepcopy(game))
+    metrics = Metrics("test")
+
+    call = median_seconds(update_game, 10)
+    instrumentation = median_seconds(lambda: client_instrumentation(metrics), 5000)
+    assert 100 * instrumentation / call < MAX_OVERHEAD
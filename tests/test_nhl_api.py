@@ -0,0 +1,164 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from flask import Flask, request
+import pytest
+from werkzeug.serving import make_server
+
+from ift6758.ift6758.client import nhl_api
+from ift6758.ift6758.client.nhl_api import PlayByPlayFetcher
+
+
+class StubNHL:
+    """Local stand-in of the play-by-play endpoint, with an ETag per version of each game"""
+    def __init__(self):
+        self.games = {}
+        self.requests = []
+        self.fail = False
+        self.garble = False
+        self.delay = 0.0
+        app = Flask(__name__)
+        app.add_url_rule("/v1/gamecenter/<int:game_id>/play-by-play", view_func=self.play_by_play)
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def play_by_play(self, game_id: int):
+        self.requests.append((game_id, request.headers.get("If-None-Match")))
+        time.sleep(self.delay)
+        if self.fail:
+            return "", 503
+        if self.garble:
+            return '{"id": 1, "pla', 200, {"Content-Type": "application/json"}
+        if game_id not in self.games:
+            return {"message": "not found"}, 404
+        etag = f'"{game_id}-{len(self.games[game_id]["plays"])}"'
+        if request.headers.get("If-None-Match") == etag:
+            return "", 304, {"ETag": etag}
+        return json.dumps(self.games[game_id]), 200, {"Content-Type": "application/json", "ETag": etag}
+
+    def set_game(self, game_id: int, n_plays: int, state: str = "LIVE"):
+        self.games[game_id] = {"id": game_id, "gameState": state, "plays": [{"eventId": i} for i in range(n_plays)]}
+
+
+@pytest.fixture
+def stub():
+    stub = StubNHL()
+    yield stub
+    stub.server.shutdown()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls time.monotonic() as seen by the fetcher"""
+    now = [1000.0]
+    monkeypatch.setattr(nhl_api, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_fresh_payloads_are_served_without_requests(stub, clock):
+    stub.set_game(1, 3)
+    fetcher = PlayByPlayFetcher(stub.url, ttl=5.0)
+    first = fetcher.get(1)
+    clock[0] += 4.0
+    assert fetcher.get(1) is first
+    assert len(stub.requests) == 1
+    assert fetcher.stats == {"hits": 1, "misses": 1, "not_modified": 0, "errors": 0}
+
+
+def test_expired_payloads_are_revalidated_with_their_etag(stub, clock):
+    stub.set_game(1, 3)
+    fetcher = PlayByPlayFetcher(stub.url, ttl=5.0)
+    first = fetcher.get(1)
+
+    clock[0] += 6.0
+    assert fetcher.get(1) is first
+    assert stub.requests[-1] == (1, '"1-3"')
+    assert fetcher.stats["not_modified"] == 1
+
+    stub.set_game(1, 5)
+    clock[0] += 6.0
+    assert len(fetcher.get(1)["plays"]) == 5
+    assert fetcher.stats["misses"] == 2
+
+
+def test_final_games_are_not_revalidated(stub, clock):
+    stub.set_game(1, 3, state="OFF")
+    fetcher = PlayByPlayFetcher(stub.url, ttl=5.0)
+    fetcher.get(1)
+    clock[0] += 3600.0
+    fetcher.get(1)
+    assert len(stub.requests) == 1
+
+
+def test_errors_are_counted_and_the_cached_payload_kept(stub, clock):
+    stub.set_game(1, 3)
+    fetcher = PlayByPlayFetcher(stub.url, ttl=5.0)
+    first = fetcher.get(1)
+
+    stub.fail = True
+    clock[0] += 6.0
+    assert fetcher.get(1) is first
+    assert fetcher.get(2) is None
+    assert fetcher.stats["errors"] == 2
+
+    fetcher.base_url = "http://127.0.0.1:1/v1"
+    assert fetcher.get(3) is None
+    assert fetcher.stats["errors"] == 3
+
+
+def test_disk_cache_is_revalidated_by_a_new_fetcher(stub, clock, tmp_path):
+    stub.set_game(1, 3)
+    PlayByPlayFetcher(stub.url, ttl=5.0, cache_dir=tmp_path).get(1)
+    assert (tmp_path / "1.json").exists()
+
+    fetcher = PlayByPlayFetcher(stub.url, ttl=5.0, cache_dir=tmp_path)
+    assert len(fetcher.get(1)["plays"]) == 3
+    assert stub.requests[-1] == (1, '"1-3"')
+    assert fetcher.stats["not_modified"] == 1
+
+
+def test_memory_cache_is_bounded(stub, clock, tmp_path):
+    for game_id in range(10):
+        stub.set_game(game_id, 1, state="OFF")
+    fetcher = PlayByPlayFetcher(stub.url, ttl=5.0, cache_dir=tmp_path, max_games=4)
+    for game_id in range(10):
+        fetcher.get(game_id)
+    fetcher.get(6)
+    fetcher.get(10)
+    assert list(fetcher._entries) == ["7", "8", "9", "6"]
+    assert fetcher._locks == {}
+
+    # Evicted games are read back from the disk cache, final ones without any request
+    n_requests = len(stub.requests)
+    assert fetcher.get(0)["id"] == 0
+    assert len(stub.requests) == n_requests
+
+
+def test_undecodable_payloads_fall_back_to_the_disk_cache(stub, clock, tmp_path):
+    stub.set_game(1, 3)
+    PlayByPlayFetcher(stub.url, ttl=5.0, cache_dir=tmp_path).get(1)
+
+    stub.garble = True
+    stub.set_game(1, 5)
+    fetcher = PlayByPlayFetcher(stub.url, ttl=5.0, cache_dir=tmp_path)
+    assert len(fetcher.get(1)["plays"]) == 3
+    assert fetcher.get(2) is None
+    assert fetcher.stats["errors"] == 2
+
+
+def test_concurrent_requests_of_a_game_share_one_fetch_and_release_its_lock(stub):
+    stub.set_game(1, 3)
+    stub.set_game(2, 3)
+    stub.delay = 0.2
+    fetcher = PlayByPlayFetcher(stub.url, ttl=5.0, max_games=1)
+    with ThreadPoolExecutor(8) as pool:
+        payloads = list(pool.map(fetcher.get, [1] * 8 + [2] * 8))
+
+    assert all(payload is payloads[0] for payload in payloads[:8])
+    assert len(stub.requests) == 2
+    assert fetcher._locks == {}
+
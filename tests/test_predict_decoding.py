@@ -0,0 +1,93 @@
+import gzip
+import io
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+
+JSON = "application/json"
+NPY = "application/x-npy"
+ARROW = "application/vnd.apache.arrow.stream"
+
+
+def npy(X) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(X))
+    return buffer.getvalue()
+
+
+def arrow(columns: dict) -> bytes:
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+@pytest.fixture
+def client(serving_app):
+    return serving_app.app.test_client()
+
+
+def post(client, body: bytes, content_type: str, **headers):
+    return client.post("/predict", data=body, content_type=content_type, headers=headers)
+
+
+@pytest.mark.parametrize("content_type, body", [
+    (JSON, b'[{"shotDistance": 10.0}, {"shotDistance": 50.0}]'),
+    (JSON, b'{"shotDistance": {"0": 10.0, "1": 50.0}}'),
+    (NPY, npy([[10.0], [50.0]])),
+    (NPY, npy([10.0, 50.0])),
+    (ARROW, arrow({"shotDistance": [10.0, 50.0]})),
+])
+def test_valid_bodies(client, content_type, body):
+    response = post(client, body, content_type)
+    assert response.status_code == 200
+    assert len(response.get_json()["probabilities"]) == 2
+
+
+@pytest.mark.parametrize("content_type, body", [
+    (JSON, b'[{"shotDistance": 10.0'),
+    (JSON, b"\xff\xfe"),
+    (JSON, b'{"shotDistance": 10.0}'),
+    (JSON, b"42"),
+    (JSON, b'[{"angle": 10.0}]'),
+    (NPY, b"not an array"),
+    (NPY, npy(10.0)),
+    (NPY, npy(np.zeros((2, 1, 1)))),
+    (NPY, npy([["a"], ["b"]])),
+    (ARROW, b"not a stream"),
+    (ARROW, arrow({"shotDistance": ["near", "far"]})),
+], ids=["truncated-json", "undecodable-json", "scalar-column", "scalar-json", "missing-feature",
+        "garbage-npy", "0d-npy", "3d-npy", "string-npy", "garbage-arrow", "string-arrow"])
+def test_malformed_bodies_are_schema_errors(client, content_type, body):
+    response = post(client, body, content_type)
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "failure"
+
+
+@pytest.mark.parametrize("content_type, body", [
+    (JSON, b'[{"shotDistance": 10.0}]'),
+    (NPY, npy([[10.0]])),
+    (ARROW, arrow({"shotDistance": [10.0]})),
+])
+def test_gzip_bodies(client, content_type, body):
+    assert post(client, gzip.compress(body), content_type, **{"Content-Encoding": "gzip"}).status_code == 200
+    assert post(client, body, content_type, **{"Content-Encoding": "gzip"}).status_code == 400
+    assert post(client, body, content_type, **{"Content-Encoding": "br"}).status_code == 400
+
+
+def test_gzip_bodies_are_decompressed_up_to_the_limit(client, serving_app, monkeypatch):
+    body = npy(np.full((1000, 1), 10.0))
+    monkeypatch.setattr(serving_app, "MAX_DECOMPRESSED_BYTES", len(body))
+    assert post(client, gzip.compress(body), NPY, **{"Content-Encoding": "gzip"}).status_code == 200
+
+    # 10 KB that would decompress to 10 MB
+    bomb = gzip.compress(bytes(10 * 2**20))
+    response = post(client, bomb, NPY, **{"Content-Encoding": "gzip"})
+    assert response.status_code == 400
+    assert "decompressed" in response.get_json()["message"]
+
+    truncated = gzip.compress(body)[:-20]
+    assert post(client, truncated, NPY, **{"Content-Encoding": "gzip"}).status_code == 400
@@ -0,0 +1,134 @@
+import json
+import time
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from registry import LocalArtifactSource, ModelRegistry, model_key
+
+
+WORKSPACE = "workspace"
+
+
+def fit_model(n_features: int, seed: int = 0) -> LogisticRegression:
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(200, n_features))
+    return LogisticRegression().fit(X, (X[:, 0] + rng.normal(size=200) > 0).astype(int))
+
+
+class CountingSource(LocalArtifactSource):
+    def __init__(self, root):
+        super().__init__(root)
+        self.downloads = []
+
+    def download(self, workspace: str, model: str, version: str):
+        self.downloads.append((workspace, model, version))
+        return super().download(workspace, model, version)
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    """Local artifacts of models "a", "b" and "c" (v1), each pickle about `size` bytes"""
+    root = tmp_path / "artifacts"
+    sizes = {}
+    for i, name in enumerate("abc"):
+        artifact_dir = root / WORKSPACE / name / "v1"
+        artifact_dir.mkdir(parents=True)
+        joblib.dump(fit_model(3, seed=i), artifact_dir / "model.pkl")
+        sizes[name] = (artifact_dir / "model.pkl").stat().st_size
+    return root, sizes
+
+
+def key(name: str) -> tuple:
+    return model_key(WORKSPACE, name, "v1")
+
+
+def test_loaded_models_are_reused(artifacts):
+    root, _ = artifacts
+    source = CountingSource(root)
+    registry = ModelRegistry(source)
+    first = registry.get(key("a"))
+    assert registry.get(key("a")) is first
+    assert source.downloads == [(WORKSPACE, "a", "1")]
+    assert registry._loading == {}
+
+
+def test_failed_loads_do_not_leak_locks(artifacts):
+    root, _ = artifacts
+    registry = ModelRegistry(LocalArtifactSource(root))
+    with pytest.raises(FileNotFoundError):
+        registry.get(model_key(WORKSPACE, "missing", "v1"))
+    assert registry._loading == {}
+
+
+def test_least_recently_used_models_are_evicted_over_the_budget(artifacts):
+    root, sizes = artifacts
+    registry = ModelRegistry(LocalArtifactSource(root), memory_budget=sizes["a"] + sizes["b"] + 1)
+    registry.swap(key("a"))
+    registry.get(key("b"))
+    registry.get(key("c"))
+    # "b" is the least recently used; the current model "a" is never evicted
+    assert registry.stats()["loaded"] == ["a_v1", "c_v1"]
+
+    registry.get(key("b"))
+    assert registry.stats()["loaded"] == ["a_v1", "b_v1"]
+    assert registry.stats()["bytes"] <= registry.memory_budget
+
+
+def test_swaps_of_another_worker_are_picked_up_in_the_background(artifacts, tmp_path):
+    root, _ = artifacts
+    state_file = tmp_path / "current_model.json"
+    worker1 = ModelRegistry(LocalArtifactSource(root), state_file=state_file)
+    source2 = CountingSource(root)
+    swapped = []
+    worker2 = ModelRegistry(source2, state_file=state_file, sync_interval=0.05, on_swap=swapped.append)
+
+    worker1.swap(key("a"))
+    assert worker2.sync().key == key("a")
+
+    worker1.swap(key("b"))
+    # Requests get the current model without waiting for the new one
+    downloads = len(source2.downloads)
+    assert worker2.current().key == key("a")
+    assert len(source2.downloads) == downloads
+
+    deadline = time.monotonic() + 5.0
+    while worker2.current().key != key("b") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert worker2.current().key == key("b")
+    assert [entry.key for entry in swapped] == [key("a"), key("b")]
+
+
+def test_unloadable_model_in_the_state_file_keeps_the_default_model(artifacts, tmp_path, caplog):
+    root, _ = artifacts
+    state_file = tmp_path / "current_model.json"
+    # Recorded by a worker whose source had the model
+    state_file.write_text(json.dumps({"generation": "run", "key": [WORKSPACE, "missing", "1"]}))
+
+    # As app.py starts a worker: the default model first, then the swaps of the other workers
+    registry = ModelRegistry(LocalArtifactSource(root), state_file=state_file, generation="run")
+    registry.swap(key("a"), record=False)
+    for _ in range(3):
+        assert registry.sync().key == key("a")
+    assert registry.sync_error["key"] == [WORKSPACE, "missing", "1"]
+    assert "FileNotFoundError" in registry.sync_error["error"]
+    assert len([record for record in caplog.records if record.levelname == "ERROR"]) == 1
+
+    time.sleep(0.01)
+    ModelRegistry(LocalArtifactSource(root), state_file=state_file, generation="run").swap(key("b"))
+    assert registry.sync().key == key("b")
+    assert registry.sync_error is None
+
+
+def test_state_file_of_a_previous_run_is_ignored(artifacts, tmp_path):
+    root, _ = artifacts
+    state_file = tmp_path / "current_model.json"
+    ModelRegistry(LocalArtifactSource(root), state_file=state_file, generation="before").swap(key("b"))
+
+    registry = ModelRegistry(LocalArtifactSource(root), state_file=state_file, generation="after")
+    registry.swap(key("a"), record=False)
+    assert registry.sync().key == key("a")
+    assert registry.stats()["loaded"] == ["a_v1"]
+    assert registry.sync_error is None
@@ -0,0 +1,112 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ift6758.ift6758.client.game_client import df_convert
+from ift6758.ift6758.client.shot_schema import (PERIOD_TYPES, SHOT_SCHEMA, STRENGTHS, enforce_schema,
+                                                 load_shots)
+from ift6758.ift6758.data.featurize import featurize_directory
+from benchmarks.synthetic import make_game
+
+
+GAME_IDS = [2016020001, 2016020002, 2016030001]
+
+
+def games() -> list:
+    return [make_game(game_id, n_plays=120, seed=seed) for seed, game_id in enumerate(GAME_IDS)]
+
+
+def assert_declared_dtypes(df: pd.DataFrame):
+    for column, dtype in SHOT_SCHEMA.items():
+        if column not in df:
+            continue
+        if dtype == "category":
+            assert isinstance(df[column].dtype, pd.CategoricalDtype), column
+        else:
+            assert df[column].dtype == dtype, column
+
+
+@pytest.fixture
+def baseline_csv(tmp_path):
+    """Shots of the original df_convert (object strings, 0/1 flags, int64 coordinates) saved as a CSV"""
+    path = tmp_path / "shots.csv"
+    pd.concat([df_convert(game, legacy=True) for game in games()], ignore_index=True).to_csv(path, index=False)
+    return path
+
+
+def test_baseline_csv_is_read_into_the_declared_dtypes(baseline_csv):
+    original = pd.read_csv(baseline_csv)
+
+    shots = load_shots(baseline_csv)
+
+    assert_declared_dtypes(shots)
+    assert list(shots.columns) == list(original.columns)
+    # Same values, whatever their dtype
+    for column in original:
+        if pd.api.types.is_numeric_dtype(original[column]):
+            np.testing.assert_allclose(shots[column].to_numpy(dtype=np.float64, na_value=np.nan),
+                                       original[column].to_numpy(dtype=np.float64), rtol=1e-6, err_msg=column)
+        else:
+            assert shots[column].astype(object).where(shots[column].notna(), None).tolist() == \
+                original[column].astype(object).where(original[column].notna(), None).tolist(), column
+
+
+def test_only_the_requested_columns_are_read(baseline_csv):
+    shots = load_shots(baseline_csv, columns=["idGame", "periodType", "xCoord"])
+
+    assert list(shots.columns) == ["idGame", "periodType", "xCoord"]
+    assert_declared_dtypes(shots)
+
+
+def test_partitioned_parquet_is_read_into_the_declared_dtypes(tmp_path):
+    json_dir = tmp_path / "json"
+    json_dir.mkdir()
+    for game in games():
+        with open(json_dir / f"{game['id']}.json", "w") as f:
+            json.dump(game, f)
+    featurize_directory(json_dir, tmp_path / "out", workers=1, games_per_file=2)
+
+    shots = load_shots(tmp_path / "out")
+
+    assert_declared_dtypes(shots)
+    assert sorted(shots["idGame"].unique()) == GAME_IDS
+    # Categories differ from game to game, which concat turns back into strings
+    expected = enforce_schema(pd.concat([df_convert(game) for game in games()], ignore_index=True))
+    shots = shots.sort_values(["idGame", "gameSeconds"], kind="stable").reset_index(drop=True)
+    pd.testing.assert_frame_equal(shots[list(expected.columns)], expected, check_categorical=False)
+
+
+@pytest.mark.filterwarnings("error")
+def test_unknown_values_of_fixed_categories_become_missing():
+    df = pd.DataFrame({
+        "periodType": ["REG", "OT", "PO"],
+        "strength": ["5v5", "5v4", "not a strength"],
+        "shotType": ["wrist", "slap", "a new shot type"],
+    })
+
+    shots = enforce_schema(df)
+
+    assert shots["periodType"].dtype == PERIOD_TYPES
+    assert shots["periodType"].tolist()[:2] == ["REG", "OT"] and pd.isna(shots["periodType"][2])
+    assert shots["strength"].dtype == STRENGTHS
+    assert pd.isna(shots["strength"][2])
+    # Open categories take any value
+    assert shots["shotType"].tolist() == ["wrist", "slap", "a new shot type"]
+
+
+def test_missing_integers_and_flags_are_kept():
+    df = pd.DataFrame({
+        "gameSeconds": [12.0, np.nan],
+        "isGoal": [True, None],
+        "numberPeriod": [1, 2],
+        "probability": [0.1, 0.2],
+    })
+
+    shots = enforce_schema(df)
+
+    assert shots["gameSeconds"].dtype == np.float32 and shots["gameSeconds"].isna().tolist() == [False, True]
+    assert shots["isGoal"].dtype == "boolean" and shots["isGoal"].isna().tolist() == [False, True]
+    assert shots["numberPeriod"].dtype == np.int8
+    assert shots["probability"].dtype == np.float64
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ift6758.ift6758.client.game_client import df_convert
+from ift6758.ift6758.client.shot_schema import SHOT_SCHEMA
+from ift6758.ift6758.client.shot_store import ShotStore
+from benchmarks.synthetic import make_game
+
+
+def scored_shots(seed: int, n_plays: int = 300) -> pd.DataFrame:
+    """Shots of a synthetic game, as returned by df_convert, with a probability of being a goal"""
+    shots = df_convert(make_game(2023020001 + seed, n_plays=n_plays, seed=seed))
+    shots["probability"] = np.random.default_rng(seed).random(len(shots))
+    return shots
+
+
+def chunks(frame: pd.DataFrame, sizes: list) -> list:
+    bounds = np.cumsum([0] + sizes)
+    return [frame.iloc[start:end] for start, end in zip(bounds, bounds[1:])] + [frame.iloc[bounds[-1]:]]
+
+
+def test_appends_across_growth_keep_every_shot():
+    shots = scored_shots(seed=0)
+    store = ShotStore(capacity=4)
+
+    for chunk in chunks(shots, [1, 3, 5, 0, 17, 40]):
+        store.append(chunk)
+        assert store.capacity >= len(store)
+
+    assert len(store) == len(shots)
+    assert store.capacity == 4 * 2 ** int(np.ceil(np.log2(len(shots) / 4)))
+    pd.testing.assert_frame_equal(store.to_frame(), shots)
+    np.testing.assert_array_equal(store.column("xCoord"), shots["xCoord"].to_numpy())
+
+
+def test_expected_goals_are_running_totals_per_team():
+    shots = scored_shots(seed=1)
+    shots.loc[shots.index[::7], "probability"] = np.nan
+    store = ShotStore(capacity=8)
+
+    for chunk in chunks(shots, [10, 10, 50]):
+        store.append(chunk)
+
+    by_team = shots.groupby("eventOwnerTeam", observed=True)["probability"]
+    assert store.xg == pytest.approx(by_team.sum().to_dict())
+    assert store.shots == by_team.size().to_dict()
+
+
+def test_to_frame_has_the_declared_dtypes():
+    store = ShotStore(capacity=4)
+    for seed in range(3):
+        store.append(scored_shots(seed, n_plays=100))
+
+    frame = store.to_frame()
+
+    for name, dtype in SHOT_SCHEMA.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            # Fixed categories stay as declared, open ones gather those of every game
+            assert frame[name].dtype == dtype
+        elif dtype == "category":
+            assert isinstance(frame[name].dtype, pd.CategoricalDtype)
+        else:
+            assert frame[name].dtype == dtype, name
+    assert set(frame["idGame"]) == {2023020001, 2023020002, 2023020003}
+    assert set(frame["eventOwnerTeam"].cat.categories) == set(frame["eventOwnerTeam"])
+    assert store.to_frame() is frame
+
+
+def test_missing_values_widen_their_column():
+    shots = scored_shots(seed=0, n_plays=50)
+    store = ShotStore(capacity=4)
+    store.append(shots.iloc[:5])
+    store.append(shots.iloc[5:10].drop(columns=["gameSeconds", "rebound"]))
+
+    frame = store.to_frame()
+
+    assert frame["gameSeconds"].dtype == np.float64
+    assert frame["gameSeconds"].iloc[:5].tolist() == shots["gameSeconds"].iloc[:5].tolist()
+    assert frame["gameSeconds"].iloc[5:].isna().all()
+    assert frame["rebound"].dtype == "boolean"
+    assert frame["rebound"].iloc[5:].isna().all()
+
+
+def test_each_game_is_served_from_its_cursor():
+    games = {seed: scored_shots(seed, n_plays=100) for seed in range(2)}
+    stores = {seed: ShotStore(capacity=4) for seed in games}
+    for seed, shots in games.items():
+        for chunk in chunks(shots, [3, 6]):
+            stores[seed].append(chunk)
+
+    for seed, shots in games.items():
+        store = stores[seed]
+        for cursor in [0, 3, len(shots) - 1]:
+            columns = store.to_columns(cursor)
+            assert columns["gameSeconds"] == shots["gameSeconds"].iloc[cursor:].tolist()
+            assert columns["idGame"] == [2023020001 + seed] * (len(shots) - cursor)
+            assert columns["probability"] == pytest.approx(shots["probability"].iloc[cursor:].tolist())
+        assert store.to_columns(len(shots) + 10)["gameSeconds"] == []
+        assert store.to_columns(-1)["gameSeconds"] == shots["gameSeconds"].tolist()
+
+
+def test_columns_are_read_only_views():
+    store = ShotStore(capacity=4)
+    store.append(scored_shots(seed=0, n_plays=50))
+
+    with pytest.raises(ValueError):
+        store.column("xCoord")[0] = 0.0
@@ -0,0 +1,87 @@
+import time
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from compiled import predict_proba
+from xg_table import NEAR_GOAL_CELLS, XGTable
+from benchmarks.bench_xg_table import make_geometry_models
+
+
+MODELS = make_geometry_models()
+
+
+@pytest.fixture(scope="module")
+def distance_forest():
+    rng = np.random.default_rng(1)
+    distance = np.round(rng.uniform(0, 100, 5000), 1)
+    y = (rng.random(5000) < 1 / (1 + np.exp(0.3 + 0.05 * distance))).astype(int)
+    return RandomForestClassifier(30, min_samples_leaf=50, random_state=0).fit(distance[:, None], y)
+
+
+def test_distance_table_is_exact_at_rounded_distances(distance_forest):
+    table = XGTable.build(lambda rows: predict_proba(distance_forest, rows), ["shotDistance"], resolution=0.5)
+
+    assert table.by_distance is not None and table.probabilities.shape == (400, 170)
+    assert table.error["max"] < 1e-6
+    distances = np.round(np.linspace(NEAR_GOAL_CELLS * 0.5, 190, 1000), 1)[:, None]
+    assert np.allclose(table.predict_proba(distances, None), distance_forest.predict_proba(distances), atol=1e-6)
+
+
+@pytest.mark.parametrize("name", ["distance", "distance + angle"])
+def test_shots_near_the_goal_are_scored_by_the_model(name):
+    model = MODELS[name]
+    features = list(model.feature_names_in_)
+    table = XGTable.build(lambda rows: predict_proba(model, rows), features, resolution=0.5)
+    near = XGTable.features_at(np.array([0.0, 1.0, -2.0]), np.array([88.0, 86.0, 85.5]), features)
+    far = XGTable.features_at(np.array([0.0, 10.0]), np.array([60.0, 40.0]), features)
+    fallback_rows = []
+
+    def fallback(rows):
+        fallback_rows.append(rows)
+        return predict_proba(model, rows)
+
+    probabilities = table.predict_proba(np.concatenate([near, far]), fallback)
+
+    assert len(fallback_rows) == 1 and np.array_equal(fallback_rows[0], near)
+    assert np.allclose(probabilities[:len(near)], predict_proba(model, near))
+    assert np.allclose(probabilities[len(near):], predict_proba(model, far), atol=0.01)
+    # Nor are shots with missing features
+    assert not table.gather(np.full((1, len(features)), np.nan))[1].any()
+
+
+def test_tables_are_built_on_the_first_heatmap(serving_app):
+    key = serving_app.model_key("tests", "heatmap distance + angle", "1")
+    entry = serving_app.registry.add(key, MODELS["distance + angle"])
+    assert entry.scorer is not None and entry.xg_table is None
+
+    client = serving_app.app.test_client()
+    query = {"workspace": key[0], "model": key[1], "version": key[2]}
+    client.post("/predict", query_string=query, json=[{"shotDistance": 10.0, "shotAngle": 5.0}])
+    assert entry.xg_table is None
+
+    response = client.get("/heatmap", query_string=query)
+    assert response.status_code == 200
+    assert entry.xg_table is not None and response.get_json()["shape"] == [400, 170]
+    assert client.get("/model_info", query_string=query).get_json()["xg_table"]["used"] is False
+
+
+def test_uncompiled_models_are_scored_from_a_table_built_in_the_background(serving_app, distance_forest):
+    key = serving_app.model_key("tests", "distance forest", "1")
+    model = distance_forest
+    model.feature_names_in_ = np.array(["shotDistance"], dtype=object)
+    entry = serving_app.registry.add(key, model)
+    assert entry.scorer is None and entry.xg_table is None
+
+    query = {"workspace": key[0], "model": key[1], "version": key[2]}
+    body = [{"shotDistance": 2.0}, {"shotDistance": 25.3}, {"shotDistance": 60.0}]
+    client = serving_app.app.test_client()
+    first = client.post("/predict", query_string=query, json=body).get_json()
+
+    deadline = time.monotonic() + 10
+    while entry.xg_table is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert serving_app.uses_xg_table(entry)
+    second = client.post("/predict", query_string=query, json=body).get_json()
+    assert np.allclose(first["probabilities"], second["probabilities"], atol=1e-6)